@@ -0,0 +1,140 @@
+import io
+
+from tle.util import codeforces_common as cf_common
+from tle.util import db
+from tle.util.ranklist import Ranklist
+from tle.util.ranklist.rating_calculator import CodeforcesRatingCalculator
+
+from benchmarks.harness import case, SkipCase
+
+
+# Rating calculator and ranklist
+
+def _calculator_standings(fixtures):
+    _, _, standings = fixtures.standings
+    ratings = fixtures.current_ratings
+    return [(row.party.members[0].handle, row.points, row.penalty,
+             ratings[row.party.members[0].handle])
+            for row in standings]
+
+
+@case('rating_calculator', group='ranklist', setup=_calculator_standings, repeat=3)
+def bench_rating_calculator(standings):
+    CodeforcesRatingCalculator(standings).calculate_rating_changes()
+
+
+@case('ranklist_construction', group='ranklist', setup=lambda f: f.standings)
+def bench_ranklist_construction(standings):
+    contest, problems, rows = standings
+    Ranklist(contest, problems, rows, 0, is_rated=True)
+
+
+def _ranklist(fixtures):
+    contest, problems, rows = fixtures.standings
+    return Ranklist(contest, problems, rows, 0, is_rated=True), fixtures.current_ratings
+
+
+@case('ranklist_predict', group='ranklist', setup=_ranklist, repeat=3)
+def bench_ranklist_predict(state):
+    ranklist, ratings = state
+    ranklist.predict(ratings)
+
+
+# Submission filters and problem pickers
+
+def _subs(fixtures):
+    fixtures.cache_system
+    return fixtures.submissions
+
+
+@case('subfilter_filter_solved', group='filters', setup=_subs)
+def bench_filter_solved(submissions):
+    cf_common.SubFilter.filter_solved(list(submissions))
+
+
+def _subfilter(fixtures):
+    subfilter = cf_common.SubFilter()
+    subfilter.parse(['+dp', '~greedy', 'r>=1200', 'd>=01012015', '+contest', '+virtual'])
+    return subfilter, _subs(fixtures)
+
+
+@case('subfilter_filter_subs', group='filters', setup=_subfilter)
+def bench_filter_subs(state):
+    subfilter, submissions = state
+    subfilter.filter_subs(list(submissions))
+
+
+def _picker(fixtures):
+    fixtures.cache_system
+    solved = {sub.problem.name for sub in fixtures.submissions if sub.verdict == 'OK'}
+    return cf_common.cache2, solved
+
+
+@case('problem_picker_gimme', group='filters', setup=_picker)
+def bench_problem_picker(state):
+    cache, solved = state
+    # Same selection as ;gimme with tags and a rating range
+    problems = [prob for prob in cache.problem_cache.problems_matching_tags(['dp'], ['greedy'])
+                if prob.rating is not None and 1600 <= prob.rating <= 2000 and
+                prob.name not in solved]
+    problems.sort(key=lambda problem: cache.contest_cache.get_contest(
+        problem.contestId).startTimeSeconds)
+
+
+# Cache system
+
+@case('refresh_handle_cache', group='cache', setup=lambda f: f.rating_changes_cache, repeat=1)
+def bench_refresh_handle_cache(rating_changes_cache):
+    rating_changes_cache._refresh_handle_cache()
+
+
+def _distribution(fixtures):
+    return fixtures.rating_changes_cache.rating_distribution
+
+
+@case('rating_distribution_queries', group='cache', setup=_distribution)
+def bench_rating_distribution(distribution):
+    distribution._histograms.clear()
+    distribution.histogram(100, min_contests=5, active_since=0)
+    for rating in range(0, 4000, 10):
+        distribution.centile(rating)
+
+
+def _bulk_rating_changes(fixtures):
+    fixtures.contests
+    return list(fixtures.iter_rating_changes(count=fixtures._size(100_000)))
+
+
+@case('cache_db_save_rating_changes', group='cache', setup=_bulk_rating_changes, repeat=3)
+def bench_save_rating_changes(changes):
+    db.CacheDbConn(':memory:').save_rating_changes(changes)
+
+
+@case('cache_db_cache_problemset', group='cache', setup=lambda f: f.problems, repeat=3)
+def bench_cache_problemset(problems):
+    db.CacheDbConn(':memory:').cache_problemset(problems)
+
+
+# Graph renderers
+
+def _graphs(fixtures):
+    try:
+        from matplotlib import pyplot as plt
+        from tle.cogs import graphs
+    except ImportError as e:
+        raise SkipCase(f'plotting dependencies missing: {e}')
+    changes = list(fixtures.iter_rating_changes(count=fixtures._size(200_000)))
+    histories = {}
+    for change in changes:
+        histories.setdefault(change.handle, []).append(change)
+    resp = sorted(histories.values(), key=len)[-5:]
+    return plt, graphs, resp
+
+
+@case('graph_rating_by_date', group='graphs', setup=_graphs, repeat=3)
+def bench_graph_rating(state):
+    plt, graphs, resp = state
+    plt.clf()
+    graphs._plot_rating_by_date(resp)
+    plt.savefig(io.BytesIO(), format='png')
+    plt.close()
@@ -0,0 +1,167 @@
+"""Fires synthetic command invocations at the bot's cogs, with CF API queries served from an
+archive recorded with CF_API_ARCHIVE_MODE=record, and reports latency and throughput.
+
+    python -m benchmarks.command_driver --archive data/db/api_archive.db \\
+        --cog graphs --command "plot rating" --args tourist Petr -n 100 -c 10
+
+Commands are called directly with a fake context, bypassing converters and checks, so pass
+arguments that do not need to be resolved to Discord members (e.g. raw handles).
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+import discord
+from discord.ext import commands
+
+from tle import constants
+from tle.util import codeforces_common as cf_common
+from tle.util import codeforces_api as cf
+from tle.util import cache_system2
+from tle.util import db
+
+
+class FakeMember:
+    def __init__(self, id_, name):
+        self.id = id_
+        self.name = self.display_name = name
+        self.mention = f'<@{id_}>'
+        self.roles = []
+        self.bot = False
+
+    def __str__(self):
+        return self.name
+
+
+class FakeGuild:
+    def __init__(self, id_, members):
+        self.id = id_
+        self.members = members
+        self._member_by_id = {member.id: member for member in members}
+
+    def get_member(self, user_id):
+        return self._member_by_id.get(user_id)
+
+
+class FakeChannel:
+    def __init__(self, id_, guild):
+        self.id = id_
+        self.guild = guild
+        self.sent = 0
+
+    async def send(self, *args, **kwargs):
+        self.sent += 1
+
+    def typing(self):
+        return _NoopAsyncContext()
+
+
+class _NoopAsyncContext:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeContext:
+    def __init__(self, bot, command, guild, author, channel):
+        self.bot = bot
+        self.command = command
+        self.guild = guild
+        self.author = author
+        self.channel = channel
+        self.message = None
+
+    async def send(self, *args, **kwargs):
+        return await self.channel.send(*args, **kwargs)
+
+    def typing(self):
+        return self.channel.typing()
+
+
+async def setup_bot(cogs, *, archive_path, latency, limit_error_rate, ratelimit, cache_db_path,
+                    user_db_path):
+    await cf.initialize()
+    cf.use_archive(db.ApiArchiveConn(archive_path), replay=True, latency=latency,
+                   limit_error_rate=limit_error_rate, ratelimit=ratelimit)
+    cf_common.user_db = db.UserDbConn(user_db_path)
+    cf_common.cache2 = cache_system2.CacheSystem(db.CacheDbConn(cache_db_path))
+    await cf_common.cache2.run()
+
+    bot = commands.Bot(command_prefix=';', intents=discord.Intents.default())
+    for cog in cogs:
+        await bot.load_extension(f'tle.cogs.{cog}')
+    return bot
+
+
+async def drive(bot, command_name, args, *, count, concurrency, guild_id):
+    command = bot.get_command(command_name)
+    if command is None:
+        raise ValueError(f'Unknown command {command_name}')
+    author = FakeMember(1, 'benchmark')
+    guild = FakeGuild(guild_id, [author])
+    channel = FakeChannel(1, guild)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], []
+
+    async def invoke():
+        async with semaphore:
+            ctx = FakeContext(bot, command, guild, author, channel)
+            begin = time.perf_counter()
+            try:
+                await command.callback(command.cog, ctx, *args)
+            except Exception as e:
+                errors.append(e)
+            latencies.append(time.perf_counter() - begin)
+
+    begin = time.perf_counter()
+    await asyncio.gather(*(invoke() for _ in range(count)))
+    elapsed = time.perf_counter() - begin
+    return latencies, errors, elapsed, channel.sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive synthetic command invocations')
+    parser.add_argument('--archive', required=True, help='API archive to replay from')
+    parser.add_argument('--cache-db', default=constants.CACHE_DB_FILE_PATH)
+    parser.add_argument('--user-db', default=constants.USER_DB_FILE_PATH)
+    parser.add_argument('--cog', action='append', required=True, help='cog module to load')
+    parser.add_argument('--command', required=True, help='qualified command name')
+    parser.add_argument('--args', nargs='*', default=[], help='command arguments')
+    parser.add_argument('--guild-id', type=int, default=0)
+    parser.add_argument('-n', '--count', type=int, default=50)
+    parser.add_argument('-c', '--concurrency', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.1, help='replayed API latency')
+    parser.add_argument('--limit-error-rate', type=float, default=0)
+    parser.add_argument('--ratelimit', action='store_true',
+                        help='space replayed API queries like real ones')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    async def run():
+        bot = await setup_bot(args.cog, archive_path=args.archive, latency=args.latency,
+                              limit_error_rate=args.limit_error_rate, ratelimit=args.ratelimit,
+                              cache_db_path=args.cache_db, user_db_path=args.user_db)
+        try:
+            return await drive(bot, args.command, args.args, count=args.count,
+                               concurrency=args.concurrency, guild_id=args.guild_id)
+        finally:
+            await cf._session.close()
+
+    latencies, errors, elapsed, sent = asyncio.run(run())
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    print(f'{len(latencies)} invocations in {elapsed:.2f}s '
+          f'({len(latencies) / elapsed:.1f}/s), {sent} messages sent, {len(errors)} errors')
+    print(f'latency p50 {statistics.median(latencies) * 1000:.0f}ms '
+          f'p95 {p95 * 1000:.0f}ms max {latencies[-1] * 1000:.0f}ms')
+    for error in errors[:5]:
+        print(f'  {error!r}')
+
+
+if __name__ == '__main__':
+    main()
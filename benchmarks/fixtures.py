@@ -0,0 +1,177 @@
+"""Synthetic but realistically sized data for the benchmarks. Every fixture is built lazily
+from a fixed seed, so runs are reproducible and a benchmark only pays for what it uses.
+Sizes are given at scale 1 and multiplied by the scale passed on the command line.
+"""
+import asyncio
+import functools
+import random
+import string
+
+from tle.util import codeforces_api as cf
+from tle.util import codeforces_common as cf_common
+from tle.util import cache_system2
+from tle.util import db
+
+NUM_CONTESTS = 2000
+NUM_PROBLEMS = 9000
+NUM_STANDINGS_ROWS = 30000
+NUM_SUBMISSIONS = 50000
+NUM_RATING_CHANGES = 10_000_000
+NUM_RATED_HANDLES = 500_000
+
+_FIRST_CONTEST_START = 1262304000  # 2010-01-01
+_CONTEST_SPACING = 3 * 24 * 60 * 60
+_CONTEST_NAMES = (
+    'Codeforces Round #{} (Div. 1)',
+    'Codeforces Round #{} (Div. 2)',
+    'Codeforces Round #{} (Div. 3)',
+    'Educational Codeforces Round {} (Rated for Div. 2)',
+    'Codeforces Global Round {}',
+    'Kotlin Heroes: Episode {}',
+    'April Fools Day Contest {}',
+)
+_TAGS = ('implementation', 'math', 'greedy', 'dp', 'data structures', 'brute force',
+         'constructive algorithms', 'graphs', 'sortings', 'binary search', 'dfs and similar',
+         'trees', 'strings', 'number theory', 'combinatorics', '*special', 'geometry',
+         'bitmasks', 'two pointers', 'dsu', 'shortest paths', 'probabilities', 'games', 'fft')
+_PARTICIPANT_TYPES = ('CONTESTANT', 'PRACTICE', 'VIRTUAL', 'OUT_OF_COMPETITION')
+_RATING_CHANGE_CHUNK = 100_000
+
+
+class Fixtures:
+    def __init__(self, scale=1.0, seed=2020):
+        self.scale = scale
+        self.seed = seed
+
+    def _size(self, size):
+        return max(1, int(size * self.scale))
+
+    def _rng(self, name):
+        return random.Random(f'{self.seed}-{name}')
+
+    @functools.cached_property
+    def contests(self):
+        count = self._size(NUM_CONTESTS)
+        return [cf.Contest(id=i + 1,
+                           name=_CONTEST_NAMES[i % len(_CONTEST_NAMES)].format(i + 1),
+                           startTimeSeconds=_FIRST_CONTEST_START + i * _CONTEST_SPACING,
+                           durationSeconds=2 * 60 * 60,
+                           type='CF',
+                           phase='FINISHED',
+                           preparedBy=None)
+                for i in range(count)]
+
+    @functools.cached_property
+    def problems(self):
+        rng = self._rng('problems')
+        count = self._size(NUM_PROBLEMS)
+        problems = []
+        for i in range(count):
+            contest = self.contests[i % len(self.contests)]
+            index = string.ascii_uppercase[i // len(self.contests) % 8]
+            rating = None if rng.random() < 0.05 else rng.randrange(800, 3600, 100)
+            tags = rng.sample(_TAGS, rng.randint(0, 4))
+            problems.append(cf.Problem(contestId=contest.id,
+                                       problemsetName=None,
+                                       index=index,
+                                       name=f'Problem {contest.id}{index}',
+                                       type='PROGRAMMING',
+                                       points=None,
+                                       rating=rating,
+                                       tags=tags))
+        return problems
+
+    @functools.cached_property
+    def standings(self):
+        """(contest, problems, ranklist rows) of a single large contest."""
+        rng = self._rng('standings')
+        contest = self.contests[-1]
+        problems = [p for p in self.problems if p.contestId == contest.id]
+        rows = []
+        for i in range(self._size(NUM_STANDINGS_ROWS)):
+            party = cf.Party(contestId=contest.id, members=[cf.Member(f'user{i}')],
+                             participantType='CONTESTANT', teamId=None, teamName=None,
+                             ghost=False, room=None, startTimeSeconds=contest.startTimeSeconds)
+            rows.append([party, rng.randrange(0, 6000, 50), rng.randrange(0, 300)])
+        rows.sort(key=lambda row: (-row[1], row[2]))
+        standings = [cf.RanklistRow(party=party, rank=rank, points=points, penalty=penalty,
+                                    problemResults=[])
+                     for rank, (party, points, penalty) in enumerate(rows, start=1)]
+        return contest, problems, standings
+
+    @functools.cached_property
+    def current_ratings(self):
+        """Handle -> rating for every contestant in `standings`."""
+        rng = self._rng('current_ratings')
+        _, _, standings = self.standings
+        return {row.party.members[0].handle: int(rng.gauss(1500, 350)) for row in standings}
+
+    @functools.cached_property
+    def submissions(self):
+        rng = self._rng('submissions')
+        author_types = [cf.Party(contestId=None, members=[cf.Member('user0')], participantType=t,
+                                 teamId=None, teamName=None, ghost=False, room=None,
+                                 startTimeSeconds=None)
+                        for t in _PARTICIPANT_TYPES]
+        t = _FIRST_CONTEST_START
+        submissions = []
+        for i in range(self._size(NUM_SUBMISSIONS)):
+            problem = rng.choice(self.problems)
+            t += rng.randrange(1, 3 * 60 * 60)
+            submissions.append(cf.Submission(id=i, contestId=problem.contestId, problem=problem,
+                                             author=rng.choice(author_types),
+                                             programmingLanguage='GNU C++17',
+                                             verdict='OK' if rng.random() < 0.4 else 'WRONG_ANSWER',
+                                             creationTimeSeconds=t, relativeTimeSeconds=0))
+        return submissions
+
+    def iter_rating_changes(self, count=None):
+        """Yields rating changes contest by contest, with handles drawn from a fixed pool."""
+        rng = self._rng('rating_changes')
+        count = self._size(NUM_RATING_CHANGES) if count is None else count
+        num_handles = self._size(NUM_RATED_HANDLES)
+        per_contest = max(1, min(num_handles, count // len(self.contests)))
+        ratings = [1500] * num_handles
+        produced = 0
+        for contest in self.contests:
+            for rank, handle_id in enumerate(rng.sample(range(num_handles), per_contest), start=1):
+                old = ratings[handle_id]
+                new = ratings[handle_id] = max(0, old + rng.randint(-120, 120))
+                yield cf.RatingChange(contestId=contest.id, contestName=contest.name,
+                                      handle=f'user{handle_id}', rank=rank,
+                                      ratingUpdateTimeSeconds=contest.end_time,
+                                      oldRating=old, newRating=new)
+                produced += 1
+                if produced == count:
+                    return
+
+    @functools.cached_property
+    def cache_system(self):
+        """A CacheSystem over an in-memory cache db holding the contests and problems, installed
+        as `cf_common.cache2`."""
+        cache = cache_system2.CacheSystem(db.CacheDbConn(':memory:'))
+        cf_common.cache2 = cache
+
+        async def load():
+            await cache.contest_cache._update(list(self.contests))
+            cache.conn.cache_problems(self.problems)
+            await cache.problem_cache._try_disk()
+            cache.conn.cache_problemset(self.problems)
+            cache.problemset_cache._update_from_disk()
+
+        asyncio.run(load())
+        return cache
+
+    @functools.cached_property
+    def rating_changes_cache(self):
+        """The cache system's RatingChangesCache with the full rating_change table saved."""
+        cache = self.cache_system
+        chunk = []
+        for change in self.iter_rating_changes():
+            chunk.append(change)
+            if len(chunk) == _RATING_CHANGE_CHUNK:
+                cache.conn.save_rating_changes(chunk)
+                chunk = []
+        if chunk:
+            cache.conn.save_rating_changes(chunk)
+        return cache.rating_changes_cache
@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+import statistics
+import subprocess
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+RESULTS_FILE_PATH = os.path.join(os.path.dirname(__file__), 'results.jsonl')
+
+Case = namedtuple('Case', 'name group setup run repeat')
+Result = namedtuple('Result', 'name best median repeat')
+
+_cases = []
+
+
+class SkipCase(Exception):
+    """Raised by a benchmark setup when the benchmark cannot run in this environment."""
+
+
+def case(name, *, group, setup=None, repeat=5):
+    """Registers a benchmark. `setup(fixtures)` runs once untimed and its return value is passed
+    to every timed call of the decorated function."""
+    def decorator(fun):
+        _cases.append(Case(name, group, setup, fun, repeat))
+        return fun
+    return decorator
+
+
+def get_cases(only=None):
+    if not only:
+        return list(_cases)
+    return [c for c in _cases if any(key in c.name or key == c.group for key in only)]
+
+
+def run_case(bench_case, fixtures):
+    """Returns the Result of running `bench_case`, or raises SkipCase."""
+    state = bench_case.setup(fixtures) if bench_case.setup else fixtures
+    timings = []
+    for _ in range(bench_case.repeat):
+        begin = time.perf_counter()
+        bench_case.run(state)
+        timings.append(time.perf_counter() - begin)
+    return Result(bench_case.name, min(timings), statistics.median(timings), bench_case.repeat)
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def save_results(results, scale):
+    record = {
+        'commit': current_commit(),
+        'time': int(time.time()),
+        'scale': scale,
+        'results': {r.name: r.best for r in results},
+    }
+    with open(RESULTS_FILE_PATH, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+def load_baseline(commit, scale):
+    """Returns the latest saved {name: best time} for `commit` at the same scale, or None."""
+    try:
+        with open(RESULTS_FILE_PATH) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return None
+    records = [r for r in records if r['commit'] == commit and r['scale'] == scale]
+    return records[-1]['results'] if records else None
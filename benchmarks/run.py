@@ -0,0 +1,55 @@
+"""Runs the benchmarks and optionally records the results against the current commit.
+
+    python -m benchmarks.run --scale 0.1                     # quick run on smaller fixtures
+    python -m benchmarks.run --save                          # full size, append to results.jsonl
+    python -m benchmarks.run --only ranklist --compare abc123  # compare with a saved commit
+"""
+import argparse
+import logging
+
+from tle.util import codeforces_common  # noqa: F401, must be imported before tle.util.db
+
+from benchmarks import cases  # noqa: F401, registers the benchmarks
+from benchmarks import harness
+from benchmarks.fixtures import Fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run TLE benchmarks')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiplier for fixture sizes (default: 1.0)')
+    parser.add_argument('--only', nargs='*', help='benchmark names or groups to run')
+    parser.add_argument('--save', action='store_true',
+                        help=f'append results to {harness.RESULTS_FILE_PATH}')
+    parser.add_argument('--compare', metavar='COMMIT',
+                        help='show the change relative to results saved for COMMIT')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    baseline = None
+    if args.compare:
+        baseline = harness.load_baseline(args.compare, args.scale)
+        if baseline is None:
+            parser.error(f'no saved results for {args.compare} at scale {args.scale}')
+
+    fixtures = Fixtures(args.scale)
+    results = []
+    print(f'{"benchmark":32} {"best":>10} {"median":>10}' + (f' {"change":>8}' if baseline else ''))
+    for bench_case in harness.get_cases(args.only):
+        try:
+            result = harness.run_case(bench_case, fixtures)
+        except harness.SkipCase as e:
+            print(f'{bench_case.name:32} skipped: {e}')
+            continue
+        results.append(result)
+        line = f'{result.name:32} {result.best * 1000:8.1f}ms {result.median * 1000:8.1f}ms'
+        if baseline and result.name in baseline:
+            line += f' {100 * (result.best / baseline[result.name] - 1):+7.1f}%'
+        print(line, flush=True)
+
+    if args.save:
+        harness.save_results(results, args.scale)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import json
+import sqlite3
+
+# codeforces_common must be imported before the db package to avoid a circular import.
+from tle.util import codeforces_common  # noqa: F401
+from tle.util.db.cache_db_conn import CacheDbConn
+
+
+def _make_old_db(dbfile):
+    # Tables as they were when tags were stored as a JSON list.
+    conn = sqlite3.connect(dbfile)
+    conn.execute('CREATE TABLE problem (contest_id INTEGER, problemset_name TEXT, [index] TEXT, '
+                 'name TEXT NOT NULL, type TEXT, points REAL, rating INTEGER, tags TEXT, '
+                 'PRIMARY KEY (name))')
+    conn.execute('CREATE TABLE problem2 (contest_id INTEGER, problemset_name TEXT, '
+                 '[index] TEXT, name TEXT NOT NULL, type TEXT, points REAL, rating INTEGER, '
+                 'tags TEXT, PRIMARY KEY (contest_id, [index]))')
+    conn.executemany('INSERT INTO problem VALUES (?, NULL, ?, ?, \'PROGRAMMING\', NULL, ?, ?)',
+                     [(1, 'A', 'Apples', 800, json.dumps(['greedy', 'math'])),
+                      (1, 'B', 'Bananas', 1200, json.dumps([]))])
+    conn.executemany('INSERT INTO problem2 VALUES (?, NULL, ?, ?, \'PROGRAMMING\', NULL, ?, ?)',
+                     [(1, 'A', 'Apples', 800, json.dumps(['greedy', 'math'])),
+                      (2, 'A', 'Apples', 800, json.dumps(['math', 'greedy']))])
+    conn.commit()
+    conn.close()
+
+
+def test_tags_migrated_from_json(tmp_path):
+    dbfile = str(tmp_path / 'cache.db')
+    _make_old_db(dbfile)
+    conn = CacheDbConn(dbfile)
+
+    tags = {problem.name: problem.tags for problem in conn.fetch_problems()}
+    assert tags == {'Apples': ('greedy', 'math'), 'Bananas': ()}
+    tags = {(problem.contestId, problem.index): problem.tags
+            for problem in conn.fetch_problems2()}
+    assert tags == {(1, 'A'): ('greedy', 'math'), (2, 'A'): ('math', 'greedy')}
+
+    for table in ('problem', 'problem2'):
+        assert conn.conn.execute(f'SELECT COUNT(*) FROM {table} WHERE tags IS NOT NULL'
+                                 ).fetchone()[0] == 0
+    assert (conn.conn.execute('PRAGMA user_version').fetchone()[0] ==
+            CacheDbConn._SCHEMA_VERSION)
+
+
+def test_tags_migrated_once(tmp_path):
+    dbfile = str(tmp_path / 'cache.db')
+    _make_old_db(dbfile)
+    CacheDbConn(dbfile).conn.close()
+    conn = CacheDbConn(dbfile)
+    assert conn.conn.execute('SELECT COUNT(*) FROM problem_tag').fetchone()[0] == 2
+    assert conn.conn.execute('SELECT COUNT(*) FROM tag').fetchone()[0] == 2
+
+
+def test_new_db_has_no_tag_id_indexes():
+    conn = CacheDbConn(':memory:')
+    indexes = {name for name, in conn.conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert not indexes & {'ix_problem_tag_tag_id', 'ix_problem2_tag_tag_id'}
+
+
+def test_tag_id_indexes_dropped(tmp_path):
+    dbfile = str(tmp_path / 'cache.db')
+    conn = CacheDbConn(dbfile).conn
+    conn.execute('CREATE INDEX ix_problem_tag_tag_id ON problem_tag (tag_id)')
+    conn.execute('PRAGMA user_version = 1')
+    conn.commit()
+    conn.close()
+    conn = CacheDbConn(dbfile)
+    assert conn.conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND "
+                             "name = 'ix_problem_tag_tag_id'").fetchone()[0] == 0
@@ -0,0 +1,109 @@
+import asyncio
+
+import discord
+import pytest
+
+from tle.util.outbox import Outbox, Priority, pack_embeds
+
+
+class FakeChannel:
+    def __init__(self, id=1, fail_on=None):
+        self.id = id
+        self.fail_on = fail_on
+        self.sent = []
+        self.gate = None
+
+    async def send(self, content=None, **kwargs):
+        if self.gate is not None:
+            await self.gate.wait()
+        if content is not None and content == self.fail_on:
+            raise discord.DiscordException(content)
+        message = (content, [embed.description for embed in kwargs.get('embeds', ())])
+        self.sent.append(message)
+        return message
+
+
+def _embeds(count, size=10):
+    return [discord.Embed(description=f'{i}'.ljust(size, '.')) for i in range(count)]
+
+
+def test_pack_embeds_count_limit():
+    assert [len(chunk) for chunk in pack_embeds(_embeds(23))] == [10, 10, 3]
+
+
+def test_pack_embeds_char_limit():
+    assert [len(chunk) for chunk in pack_embeds(_embeds(5, size=2500))] == [2, 2, 1]
+
+
+def test_pack_embeds_oversized_embed_alone():
+    embeds = _embeds(1) + _embeds(1, size=7000) + _embeds(1)
+    assert [len(chunk) for chunk in pack_embeds(embeds)] == [1, 1, 1]
+
+
+def test_send_many_puts_content_with_first_embeds():
+    async def main():
+        channel = FakeChannel()
+        messages = await Outbox().send_many(channel, 'update', _embeds(12))
+        return channel, messages
+
+    channel, messages = asyncio.run(main())
+    assert [(content, len(embeds)) for content, embeds in channel.sent] == [('update', 10),
+                                                                            (None, 2)]
+    assert messages == channel.sent
+
+
+def test_separate_sends_are_not_merged():
+    async def main():
+        channel = FakeChannel()
+        outbox = Outbox()
+        await asyncio.gather(outbox.send(channel, 'ping'),
+                             outbox.send(channel, embed=discord.Embed(description='rankup')))
+        return channel
+
+    channel = asyncio.run(main())
+    assert channel.sent == [('ping', []), (None, ['rankup'])]
+
+
+def test_interactive_sent_before_broadcast():
+    async def main():
+        channel = FakeChannel()
+        channel.gate = asyncio.Event()
+        outbox = Outbox()
+        first = asyncio.create_task(outbox.send(channel, 'first'))
+        await asyncio.sleep(0)
+        broadcast = asyncio.create_task(outbox.send(channel, 'broadcast'))
+        reply = asyncio.create_task(outbox.send(channel, 'reply', priority=Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        assert outbox.queued(channel) == 2
+        channel.gate.set()
+        await asyncio.gather(first, broadcast, reply)
+        return channel, outbox
+
+    channel, outbox = asyncio.run(main())
+    assert [content for content, _ in channel.sent] == ['first', 'reply', 'broadcast']
+    assert outbox.queued(channel) == 0
+
+
+def test_send_error_propagates_to_its_caller_only():
+    async def main():
+        channel = FakeChannel(fail_on='bad')
+        outbox = Outbox()
+        return channel, await asyncio.gather(outbox.send(channel, 'bad'),
+                                             outbox.send(channel, 'good'),
+                                             return_exceptions=True)
+
+    channel, (bad, good) = asyncio.run(main())
+    assert isinstance(bad, discord.DiscordException)
+    assert good == ('good', [])
+    assert channel.sent == [('good', [])]
+
+
+def test_send_many_error_propagates():
+    async def main():
+        channel = FakeChannel(fail_on='bad')
+        with pytest.raises(discord.DiscordException):
+            await Outbox().send_many(channel, 'bad', _embeds(11))
+        return channel
+
+    # Only the first message fails, the rest of the embeds are still sent.
+    assert [len(embeds) for _, embeds in asyncio.run(main()).sent] == [1]
@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+
+from tle.util.paginator import PaginatorRegistry
+
+
+class FakeMessage:
+    def __init__(self, id):
+        self.id = id
+
+    async def remove_reaction(self, emoji, member):
+        pass
+
+
+class FakePaginated:
+    def __init__(self, id):
+        self.message = FakeMessage(id)
+        self.closed = False
+        self.turns = 0
+        self.reaction_map = {'>': self.next_page}
+
+    async def next_page(self):
+        self.turns += 1
+
+    async def close(self):
+        self.closed = True
+
+
+def _registry(max_size=10):
+    return PaginatorRegistry(SimpleNamespace(user=SimpleNamespace(id=0)), max_size=max_size)
+
+
+def _react(message_id, emoji='>', user_id=1):
+    return SimpleNamespace(message_id=message_id, emoji=emoji, user_id=user_id)
+
+
+def test_paginator_expires():
+    async def main():
+        registry = _registry()
+        paginated = FakePaginated(1)
+        registry.add(paginated, 0.05)
+        assert 1 in registry
+        await asyncio.sleep(0.1)
+        return registry, paginated
+
+    registry, paginated = asyncio.run(main())
+    assert 1 not in registry
+    assert paginated.closed
+
+
+def test_reaction_turns_page_and_extends_expiry():
+    async def main():
+        registry = _registry()
+        paginated = FakePaginated(1)
+        registry.add(paginated, 0.1)
+        await asyncio.sleep(0.06)
+        await registry.on_raw_reaction_add(_react(1))
+        # Reactions of the bot itself and unknown emojis are ignored.
+        await registry.on_raw_reaction_add(_react(1, user_id=0))
+        await registry.on_raw_reaction_add(_react(1, emoji='?'))
+        await asyncio.sleep(0.06)
+        alive = 1 in registry
+        await asyncio.sleep(0.1)
+        return registry, paginated, alive
+
+    registry, paginated, alive = asyncio.run(main())
+    assert paginated.turns == 1
+    assert alive
+    assert 1 not in registry and paginated.closed
+
+
+def test_earliest_expiring_paginator_is_evicted():
+    async def main():
+        registry = _registry(max_size=2)
+        paginated = [FakePaginated(i) for i in range(3)]
+        registry.add(paginated[0], 10)
+        registry.add(paginated[1], 5)
+        registry.add(paginated[2], 10)
+        await asyncio.sleep(0)
+        return registry, paginated
+
+    registry, paginated = asyncio.run(main())
+    assert len(registry) == 2
+    assert 1 not in registry and paginated[1].closed
+    assert not paginated[0].closed and not paginated[2].closed
@@ -0,0 +1,37 @@
+import sqlite3
+
+# codeforces_common must be imported before the db package to avoid a circular import.
+from tle.util import codeforces_common  # noqa: F401
+from tle.util.db.user_db_conn import UserDbConn
+
+
+def _make_conn():
+    return UserDbConn(':memory:')
+
+
+def test_hot_queries_do_not_scan_tables():
+    assert _make_conn().find_table_scans() == []
+
+
+def test_all_migrations_applied():
+    conn = _make_conn()
+    version = conn.conn.execute('PRAGMA user_version').fetchone()[0]
+    assert version == len(UserDbConn._MIGRATIONS) == 2
+
+
+def test_migrate_is_idempotent():
+    conn = _make_conn()
+    conn.migrate()
+    assert conn.conn.execute('PRAGMA user_version').fetchone()[0] == 2
+
+
+def test_table_scan_detected_without_index(tmp_path):
+    dbfile = str(tmp_path / 'user.db')
+    UserDbConn(dbfile).conn.close()
+    # Drop the indexes from another connection, cached statements keep their old plans.
+    conn = sqlite3.connect(dbfile)
+    for index in ('ix_challenge_user_finish', 'ix_challenge_user_status', 'ix_challenge_finish'):
+        conn.execute(f'DROP INDEX {index}')
+    conn.commit()
+    conn.close()
+    assert ('howgud', 'SCAN challenge') in UserDbConn(dbfile).find_table_scans()
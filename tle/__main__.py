@@ -1,3 +1,7 @@
+import time
+
+_START_TIME = time.perf_counter()
+
 import argparse
 import asyncio
 import distutils.util
@@ -8,15 +12,17 @@ from logging.handlers import TimedRotatingFileHandler
 from os import environ
 from pathlib import Path
 
-import seaborn as sns
 from discord.ext import commands
-from matplotlib import pyplot as plt
 
 from tle import constants
 from tle.api import run_verification_api
 from tle.util import codeforces_common as cf_common
-from tle.util import discord_common, font_downloader
+from tle.util import discord_common, font_downloader, lazy, metrics
 
+# Cogs with heavy imports. They are loaded in the background once the bot is ready, or earlier
+# when one of their commands is used. matplotlib and seaborn alone take about 1.2s to import,
+# numpy about 0.13s. numpy is not deferred since the caches build arrays before the bot is ready.
+_DEFERRED_COGS = {'ai', 'graphs', 'handles', 'training', 'verify'}
 
 
 def setup():
@@ -31,16 +37,6 @@ def setup():
                                   TimedRotatingFileHandler(constants.LOG_FILE_PATH, when='D',
                                                            backupCount=3, utc=True)])
 
-    # matplotlib and seaborn
-    plt.rcParams['figure.figsize'] = 7.0, 3.5
-    sns.set()
-    options = {
-        'axes.edgecolor': '#A0A0C5',
-        'axes.spines.top': False,
-        'axes.spines.right': False,
-    }
-    sns.set_style('darkgrid', options)
-
     # Download fonts if necessary
     font_downloader.maybe_download()
 
@@ -54,19 +50,25 @@ async def main():
         logging.error('Token required')
         return
 
+    logging.info(f'Imports took {time.perf_counter() - _START_TIME:.2f}s')
     setup()
-    
+
     intents = discord.Intents.default()
     intents.members = True
     intents.message_content = True
 
     bot = commands.Bot(command_prefix=commands.when_mentioned_or(discord_common._BOT_PREFIX), intents=intents)
     bot.help_command = discord_common.TleHelp()
-    cogs = [file.stem for file in Path('tle', 'cogs').glob('*.py')]
-    for extension in cogs:
-        await bot.load_extension(f'tle.cogs.{extension}')
-    await bot.load_extension("jishaku")
-    logging.info(f'Cogs loaded: {", ".join(bot.cogs)}')
+    cog_loader = lazy.LazyCogLoader(bot)
+    for file in Path('tle', 'cogs').glob('*.py'):
+        if file.stem in _DEFERRED_COGS:
+            cog_loader.defer(f'tle.cogs.{file.stem}', file)
+        else:
+            await cog_loader.load(f'tle.cogs.{file.stem}')
+    await cog_loader.load('jishaku')
+    logging.info(f'Cogs loaded: {", ".join(bot.cogs)}, deferred: {", ".join(sorted(_DEFERRED_COGS))}')
+    logging.info(f'Startup took {time.perf_counter() - _START_TIME:.2f}s, '
+                 f'extensions: {cog_loader.report()}')
 
     def no_dm_check(ctx):
         if ctx.guild is None:
@@ -75,6 +77,7 @@ async def main():
 
     # Restrict bot usage to inside guild channels only.
     bot.add_check(no_dm_check)
+    metrics.instrument_bot(bot)
 
     # cf_common.initialize needs to run first, so it must be set as the bot's
     # on_ready event handler rather than an on_ready listener.
@@ -82,6 +85,9 @@ async def main():
     async def init():
         await cf_common.initialize(args.nodb)
         asyncio.create_task(discord_common.presence(bot))
+        logging.info(f'Ready {time.perf_counter() - _START_TIME:.2f}s after start')
+        await cog_loader.start()
+        logging.info(f'Deferred cogs loaded, extensions: {cog_loader.report()}')
 
     bot.add_listener(discord_common.bot_error_handler, name='on_command_error')
     await asyncio.gather(
@@ -1,11 +1,18 @@
 from discord.ext import commands
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
 from uvicorn import Config, Server, run
+import hmac
 import json
 from os import path, environ
 
+from tle.util import metrics
+
 GID = int(environ.get("SPOI_GUILD_ID", "0"))
 VRID = int(environ.get("VERIFIED_ROLE_ID", "0"))
+# Metrics expose command names, usage and internal latencies, so they are only served to
+# scrapers which send this token as a bearer token.
+METRICS_TOKEN = environ.get("METRICS_TOKEN", "")
 
 verification_api = FastAPI()
 verification_api.bot = None # type: ignore
@@ -15,6 +22,13 @@ def is_verified(id: int):
     mem = verification_api.bot.get_guild(GID).get_member(id) # type: ignore
     return {"verified": bool(mem and mem.get_role(VRID))}
 
+@verification_api.get("/metrics", response_class=PlainTextResponse)
+def get_metrics(authorization: str = Header(default="")):
+    expected = f"Bearer {METRICS_TOKEN}"
+    if not METRICS_TOKEN or not hmac.compare_digest(authorization.encode(), expected.encode()):
+        raise HTTPException(status_code=404)
+    return metrics.render()
+
 async def run_verification_api(bot: commands.Bot):
     verification_api.bot = bot # type: ignore
     kwargs = {}
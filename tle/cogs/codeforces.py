@@ -168,11 +168,9 @@ class Codeforces(commands.Cog):
         submissions = await cf.user.status(handle=handle)
         solved = {sub.problem.name for sub in submissions if sub.verdict == 'OK'}
 
-        problems = [prob for prob in cf_common.cache2.problem_cache.problems
+        problems = [prob for prob in cf_common.cache2.problem_cache.problems_matching_tags(tags, bantags)
                     if prob.rating >= srating and prob.rating <= erating and prob.name not in solved
-                    and not cf_common.is_contest_writer(prob.contestId, handle)
-                    and prob.matches_all_tags(tags)
-                    and not prob.matches_any_tag(bantags)]
+                    and not cf_common.is_contest_writer(prob.contestId, handle)]
 
         if not problems:
             raise CodeforcesCogError('Problems not found within the search parameters')
@@ -204,7 +202,7 @@ class Codeforces(commands.Cog):
         args = filt.parse(args)
         handles = args or ('!' + str(ctx.author),)
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        submissions = [await cf.user.status(handle=handle) for handle in handles]
+        submissions = await cf.fetch_for_handles(cf.user.status, handles)
         submissions = [sub for subs in submissions for sub in subs]
         submissions = filt.filter_subs(submissions)
 
@@ -232,7 +230,7 @@ class Codeforces(commands.Cog):
             embed = discord_common.cf_color_embed(description=hist_str)
             return title, embed
 
-        pages = [make_page(chunk) for chunk in paginator.chunkify(submissions[:100], 10)]
+        pages = paginator.LazyPages.from_chunks(submissions[:100], 10, make_page)
         paginator.paginate(self.bot, ctx.channel, pages, wait_time=5 * 60, set_pagenum_footers=True)
 
     @commands.command(brief='Create a mashup', usage='[handles] [+tag..] [~tag..] [+divX] [~divX] [?[-]delta]')
@@ -256,7 +254,7 @@ class Codeforces(commands.Cog):
 
         handles = handles or ('!' + str(ctx.author),)
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        resp = [await cf.user.status(handle=handle) for handle in handles]
+        resp = await cf.fetch_for_handles(cf.user.status, handles)
         submissions = [sub for user in resp for sub in user]
         solved = {sub.problem.name for sub in submissions}
         info = await cf.user.info(handles=handles)
@@ -264,12 +262,10 @@ class Codeforces(commands.Cog):
         rating += delta
         rating = max(800, rating)
         rating = min(3500, rating)
-        problems = [prob for prob in cf_common.cache2.problem_cache.problems
+        problems = [prob for prob in cf_common.cache2.problem_cache.problems_matching_tags(tags, bantags)
                     if abs(prob.rating - rating) <= 300 and prob.name not in solved
                     and not any(cf_common.is_contest_writer(prob.contestId, handle) for handle in handles)
-                    and not cf_common.is_nonstandard_problem(prob)
-                    and prob.matches_all_tags(tags)
-                    and not prob.matches_any_tag(bantags)]
+                    and not cf_common.is_nonstandard_problem(prob)]
 
         if len(problems) < 4:
             raise CodeforcesCogError('Problems not found within the search parameters')
@@ -338,12 +334,10 @@ class Codeforces(commands.Cog):
 
         await self._validate_gitgud_status(ctx, delta)
         
-        problems = [prob for prob in cf_common.cache2.problem_cache.problems
+        problems = [prob for prob in cf_common.cache2.problem_cache.problems_matching_tags(tags, bantags)
                     if (prob.rating == rating + delta 
                     and prob.name not in solved 
-                    and prob.name not in noguds)
-                    and prob.matches_all_tags(tags)
-                    and not prob.matches_any_tag(bantags)]
+                    and prob.name not in noguds)]
                         
 
         def check(problem):
@@ -399,7 +393,7 @@ class Codeforces(commands.Cog):
                 score+=_calculateGitgudScoreForDelta(delta)
      
 
-        pages = [make_page(chunk, score) for chunk in paginator.chunkify(data, 10)]
+        pages = paginator.LazyPages.from_chunks(data, 10, lambda chunk: make_page(chunk, score))
         paginator.paginate(self.bot, ctx.channel, pages, wait_time=5 * 60, set_pagenum_footers=True)
 
     @commands.command(brief='Print user nogud history')
@@ -429,7 +423,7 @@ class Codeforces(commands.Cog):
 
         data = [entry for entry in data if entry[1] is None]                
 
-        pages = [make_page(chunk) for chunk in paginator.chunkify(data, 10)]
+        pages = paginator.LazyPages.from_chunks(data, 10, make_page)
         paginator.paginate(self.bot, ctx.channel, pages, wait_time=5 * 60, set_pagenum_footers=True)
 
     @commands.command(brief='Report challenge completion', aliases=['gotbad'])
@@ -501,15 +495,14 @@ class Codeforces(commands.Cog):
         handles = [x for x in args if x[0] != '+'] or ('!' + str(ctx.author),)
         handles = await cf_common.resolve_handles(ctx, self.converter, handles, maxcnt=25)
         info = await cf.user.info(handles=handles)
-        contests = cf_common.cache2.contest_cache.get_contests_in_phase('FINISHED')
 
         if not markers:
             divr = sum(user.effective_rating for user in info) / len(handles)
             div1_indicators = ['div1', 'global', 'avito', 'goodbye', 'hello']
             markers = ['div3'] if divr < 1600 else ['div2'] if divr < 2100 else div1_indicators
 
+        contests = cf_common.cache2.contest_cache.get_finished_contests_matching(markers)
         recommendations = {contest.id for contest in contests if
-                           contest.matches(markers) and
                            not cf_common.is_nonstandard_contest(contest) and
                            not any(cf_common.is_contest_writer(contest.id, handle)
                                        for handle in handles)}
@@ -546,8 +539,10 @@ class Codeforces(commands.Cog):
         tags = [x for x in args if x[0] == '+']
 
         problem_to_contests = cf_common.cache2.problemset_cache.problem_to_contests
-        contests = [contest for contest in cf_common.cache2.contest_cache.get_contests_in_phase('FINISHED')
-                    if (not tags or contest.matches(tags)) and not cf_common.is_nonstandard_contest(contest)]
+        contest_cache = cf_common.cache2.contest_cache
+        contests = (contest_cache.get_finished_contests_matching(tags) if tags
+                    else contest_cache.finished_by_start)
+        contests = [contest for contest in contests if not cf_common.is_nonstandard_contest(contest)]
 
         # subs_by_contest_id contains contest_id mapped to [list of problem.name]
         subs_by_contest_id = defaultdict(set)
@@ -565,7 +560,7 @@ class Codeforces(commands.Cog):
         for contest in contests:
             num_solved = len(subs_by_contest_id[contest.id])
             try:
-                num_problems = len(cf_common.cache2.problemset_cache.get_problemset(contest.id))
+                num_problems = cf_common.cache2.problemset_cache.get_problem_count(contest.id)
                 if 0 < num_solved < num_problems:
                     contest_unsolved_pairs.append((contest, num_solved, num_problems))
             except cache_system2.ProblemsetNotCached:
@@ -8,7 +8,6 @@ from collections import defaultdict, namedtuple
 
 import discord
 from discord.ext import commands
-from matplotlib import pyplot as plt
 
 from tle import constants
 from tle.util import codeforces_common as cf_common
@@ -21,7 +20,11 @@ from tle.util import paginator
 from tle.util import ranklist as rl
 from tle.util import table
 from tle.util import tasks
-from tle.util import graph_common as gc
+from tle.util import lazy
+
+# Imported on first use to keep startup fast.
+gc = lazy.lazy_import('tle.util.graph_common')
+plt = lazy.lazy_import('matplotlib.pyplot', after=['tle.util.graph_common'])
 
 _CONTESTS_PER_PAGE = 5
 _CONTEST_PAGINATE_WAIT_TIME = 5 * 60
@@ -132,13 +135,12 @@ class Contests(commands.Cog):
         self.active_contests = (contest_cache.get_contests_in_phase('CODING') +
                                 contest_cache.get_contests_in_phase('PENDING_SYSTEM_TEST') +
                                 contest_cache.get_contests_in_phase('SYSTEM_TEST'))
-        self.finished_contests = contest_cache.get_contests_in_phase('FINISHED')
+        # Keep most recent _FINISHED_LIMIT
+        self.finished_contests = list(
+            contest_cache.get_most_recently_finished(_FINISHED_CONTESTS_LIMIT))
 
         # Future contests already sorted by start time.
         self.active_contests.sort(key=lambda contest: contest.startTimeSeconds)
-        self.finished_contests.sort(key=lambda contest: contest.end_time, reverse=True)
-        # Keep most recent _FINISHED_LIMIT
-        self.finished_contests = self.finished_contests[:_FINISHED_CONTESTS_LIMIT]
 
         self.logger.info(f'Refreshed cache')
         self.start_time_map.clear()
@@ -452,16 +454,15 @@ class Contests(commands.Cog):
         current_rank = 0
         last_rank = 0
         last_score = (-1, -1)
-        for contestant in ranklist.standings:
-            handle = contestant.party.teamName or contestant.party.members[0].handle
+        standings = ranklist.standings
+        for ix, handle in enumerate(standings.keys):
             if handle in ranklist.delta_by_handle:
-                current_score = (contestant.points, contestant.penalty)
+                current_score = (standings.points[ix], standings.penalties[ix])
                 current_rank += 1
-                dict = ranklist.standing_by_id[handle]._asdict()
-                dict['rank'] = current_rank if current_score != last_score else last_rank
-                last_rank = dict['rank']
+                rank = current_rank if current_score != last_score else last_rank
+                standings.ranks[ix] = rank
+                last_rank = rank
                 last_score = current_score
-                ranklist.standing_by_id[handle] = cf.make_from_dict(cf.RanklistRow, dict)
 
         return rated_contestants, ranklist
 
@@ -620,7 +621,7 @@ class Contests(commands.Cog):
             raise ContestCogError('No Rated VC channel')
         channel = self.bot.get_channel(int(channel_id))
         member_ids = cf_common.user_db.get_rated_vc_user_ids(vc_id)
-        handles = [cf_common.user_db.get_handle(member_id, channel.guild.id) for member_id in member_ids]
+        handles = cf_common.user_db.get_handles(member_ids, channel.guild.id)
         handle_to_member_id = {handle : member_id for handle, member_id in zip(handles, member_ids)}
         now = time.time()
         ranklist = await cf_common.cache2.ranklist_cache.generate_vc_ranklist(vc.contest_id, handle_to_member_id)
@@ -697,13 +698,12 @@ class Contests(commands.Cog):
 
     @commands.command(brief='Show vc ratings')
     async def vcratings(self, ctx):
-        users = [(await self.member_converter.convert(ctx, str(member_id)), handle, cf_common.user_db.get_vc_rating(member_id, default_if_not_exist=False))
-                 for member_id, handle in cf_common.user_db.get_handles_for_guild(ctx.guild.id)]
-        # Filter only rated users. (Those who entered at least one rated vc.)
+        # Only rated users, i.e. those who entered at least one rated vc, are on the leaderboard.
+        users = [(ctx.guild.get_member(entry.user_id), entry.handle, entry.score)
+                 for entry in cf_common.user_db.get_leaderboard(db.Leaderboard.VC, ctx.guild.id)]
         users = [(member, handle, rating)
                  for member, handle, rating in users
-                 if rating is not None]
-        users.sort(key=lambda user: -user[2])
+                 if member is not None]
 
         _PER_PAGE = 10
 
@@ -714,7 +714,8 @@ class Contests(commands.Cog):
             t += table.Line()
             for index, (member, handle, rating) in enumerate(chunk):
                 rating_str = f'{rating} ({cf.rating2rank(rating).title_abbr})'
-                t += table.Data(_PER_PAGE * page_num + index, f'{member.display_name}', handle, rating_str)
+                t += table.Data(_PER_PAGE * page_num + index, f'{member.display_name}',
+                                handle or 'Unknown', rating_str)
 
             table_str = f'```\n{t}\n```'
             embed = discord_common.cf_color_embed(description=table_str)
@@ -723,8 +724,12 @@ class Contests(commands.Cog):
         if not users:
             raise ContestCogError('There are no active VCers.')
 
-        pages = [make_page(chunk, k) for k, chunk in enumerate(paginator.chunkify(users, _PER_PAGE))]
-        paginator.paginate(self.bot, ctx.channel, pages, wait_time=5 * 60, set_pagenum_footers=True)
+        def page_factory(k):
+            return make_page(users[_PER_PAGE * k: _PER_PAGE * (k + 1)], k)
+
+        paginator.paginate(self.bot, ctx.channel, page_factory=page_factory,
+                           num_pages=paginator.num_chunks(len(users), _PER_PAGE),
+                           wait_time=5 * 60, set_pagenum_footers=True)
 
     @commands.command(brief='Plot vc rating for a list of at most 5 users', usage='@user1 @user2 ..')
     async def vcrating(self, ctx, *members: discord.Member):
@@ -876,14 +881,10 @@ class Contests(commands.Cog):
                 # get rating of contestants from cache
                 # we want to have the rating before the contest we query for
                 from_cache = True
-                cached_ratings = await cf_common.cache2.rating_changes_cache.get_all_ratings_before_timestamp(reqcontest[0].startTimeSeconds)
-                for row in ranklist:
-                    member = row.party.members[0].handle
-                    # members not in cache are considered new (Unrated)
-                    if member in cached_ratings:
-                        rating_cache[member] = cached_ratings[member].newRating
-                    else:
-                        rating_cache[member] = 0
+                # members not in cache are considered new (Unrated)
+                handles = [row.party.members[0].handle for row in ranklist]
+                rating_cache.update(cf_common.cache2.rating_changes_cache.get_ratings_at(
+                    handles, reqcontest[0].startTimeSeconds, default=0))
             else:
                 for change in rating_change:
                     rating_cache[change.handle] = change.oldRating
@@ -7,18 +7,21 @@ import itertools
 
 from discord.ext import commands
 from collections import defaultdict, namedtuple
-from matplotlib import pyplot as plt
 
 from tle import constants
-from tle.util.db.user_db_conn import Duel, DuelType, Winner
+from tle.util.db.user_db_conn import Duel, DuelType, Winner, Leaderboard
 from tle.util import codeforces_api as cf
 from tle.util import codeforces_common as cf_common
 from tle.util import paginator
 from tle.util import discord_common
 from tle.util import table
-from tle.util import graph_common as gc
+from tle.util import lazy
 from tle.util.elo import _ELO_CONSTANT
 
+# Imported on first use to keep startup fast.
+gc = lazy.lazy_import('tle.util.graph_common')
+plt = lazy.lazy_import('matplotlib.pyplot', after=['tle.util.graph_common'])
+
 logger = logging.getLogger(__name__)
 
 _DUEL_INVALIDATE_TIME = 2 * 60
@@ -217,9 +220,8 @@ class Dueling(commands.Cog):
 
         await cf_common.resolve_handles(ctx, self.converter, ('!' + str(ctx.author), '!' + str(opponent)))
         userids = [challenger_id, challengee_id]
-        handles = [cf_common.user_db.get_handle(
-            userid, ctx.guild.id) for userid in userids]
-        submissions = [await cf.user.status(handle=handle) for handle in handles]
+        handles = cf_common.user_db.get_handles(userids, ctx.guild.id)
+        submissions = await cf.fetch_for_handles(cf.user.status, handles)
 
         if not cf_common.user_db.is_duelist(challenger_id, ctx.guild.id):
             cf_common.user_db.register_duelist(challenger_id, ctx.guild.id)
@@ -256,12 +258,10 @@ class Dueling(commands.Cog):
                 in cf_common.user_db.get_duel_problem_names(userid, ctx.guild.id)} # maybe guild id is not needed here
 
         def get_problems(rating):
-            return [prob for prob in cf_common.cache2.problem_cache.problems
+            return [prob for prob in cf_common.cache2.problem_cache.problems_matching_tags(tags, bantags)
                     if prob.rating == rating and prob.name not in solved and prob.name not in seen
                     and not any(cf_common.is_contest_writer(prob.contestId, handle) for handle in handles)
-                    and not cf_common.is_nonstandard_problem(prob)
-                    and prob.matches_all_tags(tags)
-                    and not prob.matches_any_tag(bantags)]
+                    and not cf_common.is_nonstandard_problem(prob)]
 
         for problems in map(get_problems, range(rating, 400, -100)):
             if problems:
@@ -285,8 +285,7 @@ class Dueling(commands.Cog):
         if not nohandicap:
             # get cf handles and cf.Users
             userids = [challenger_id, challengee_id]
-            handles = [cf_common.user_db.get_handle(
-                userid, ctx.guild.id) for userid in userids]
+            handles = cf_common.user_db.get_handles(userids, ctx.guild.id)
             users = [cf_common.user_db.fetch_cf_user(handle) for handle in handles] 
      
             # get discord member
@@ -402,8 +401,7 @@ class Dueling(commands.Cog):
 
          # get cf handles and cf.Users
         userids = [challenger_id, challengee_id]
-        handles = [cf_common.user_db.get_handle(
-            userid, ctx.guild.id) for userid in userids]
+        handles = cf_common.user_db.get_handles(userids, ctx.guild.id)
         users = [cf_common.user_db.fetch_cf_user(handle) for handle in handles] 
         
         highrated_user = users[0] if users[0].effective_rating > users[1].effective_rating else users[1]
@@ -449,8 +447,7 @@ class Dueling(commands.Cog):
 
          # get cf handles and cf.Users
         userids = [challenger_id, challengee_id]
-        handles = [cf_common.user_db.get_handle(
-            userid, guild.id) for userid in userids]
+        handles = cf_common.user_db.get_handles(userids, guild.id)
         users = [cf_common.user_db.fetch_cf_user(handle) for handle in handles] 
         
         highrated_user = users[0] if users[0].effective_rating > users[1].effective_rating else users[1]
@@ -636,7 +633,7 @@ class Dueling(commands.Cog):
         embed.set_thumbnail(url=f'{user.titlePhoto}')
         await ctx.send(embed=embed)
 
-    def _paginate_duels(self, data, message, guild_id, show_id):
+    def _make_duel_page(self, message, guild_id, show_id):
         def make_line(entry):
             duelid, start_time, finish_time, name, challenger, challengee, winner = entry
             duel_time = cf_common.pretty_time_format(
@@ -672,10 +669,13 @@ class Dueling(commands.Cog):
             embed = discord_common.cf_color_embed(description=log_str)
             return message, embed
 
+        return make_page
+
+    def _paginate_duels(self, data, message, guild_id, show_id):
         if not data:
             raise DuelCogError('There are no duels to show.')
 
-        return [make_page(chunk) for chunk in paginator.chunkify(data, 7)]
+        return paginator.LazyPages.from_chunks(data, 7, self._make_duel_page(message, guild_id, show_id))
 
     @duel.command(brief='Print head to head dueling history',
                   aliases=['versushistory'])
@@ -705,10 +705,16 @@ class Dueling(commands.Cog):
     @duel.command(brief='Print user dueling history')
     async def history(self, ctx, member: discord.Member = None):
         member = member or ctx.author
-        data = cf_common.user_db.get_duels(member.id, ctx.guild.id)
+        num_duels = cf_common.user_db.get_num_duel_completed(member.id, ctx.guild.id)
+        if not num_duels:
+            raise DuelCogError('There are no duels to show.')
+
+        def fetch(limit, offset):
+            return cf_common.user_db.get_duels(member.id, ctx.guild.id, limit=limit, offset=offset)
+
         message = discord.utils.escape_mentions(f'dueling history of `{member.display_name}`')
-        pages = self._paginate_duels(
-            data, message, ctx.guild.id, False)
+        pages = paginator.LazyPages.from_query(
+            fetch, num_duels, 7, self._make_duel_page(message, ctx.guild.id, False))
         paginator.paginate(self.bot, ctx.channel, pages,
                            wait_time=5 * 60, set_pagenum_footers=True)
 
@@ -743,18 +749,18 @@ class Dueling(commands.Cog):
         if not data:
             raise DuelCogError('There are no ongoing duels.')
 
-        pages = [make_page(chunk) for chunk in paginator.chunkify(data, 7)]
+        pages = paginator.LazyPages.from_chunks(data, 7, make_page)
         paginator.paginate(self.bot, ctx.channel, pages,
                            wait_time=5 * 60, set_pagenum_footers=True)
 
     @duel.command(brief="Show duelists")
     async def ranklist(self, ctx):
         """Show the list of duelists with their duel rating."""
-        users = [(ctx.guild.get_member(user_id), rating)
-                 for user_id, rating in cf_common.user_db.get_duelists(ctx.guild.id)]
-        users = [(member, cf_common.user_db.get_handle(member.id, ctx.guild.id), rating)
-                 for member, rating in users
-                 if member is not None and cf_common.user_db.get_num_duel_completed(member.id, ctx.guild.id) > 0]
+        users = [(ctx.guild.get_member(entry.user_id), entry.handle, entry.score)
+                 for entry in cf_common.user_db.get_leaderboard(Leaderboard.DUEL, ctx.guild.id)]
+        users = [(member, handle, rating)
+                 for member, handle, rating in users
+                 if member is not None]
 
         _PER_PAGE = 10
 
@@ -779,9 +785,11 @@ class Dueling(commands.Cog):
         if not users:
             raise DuelCogError('There are no active duelists.')
 
-        pages = [make_page(chunk, k) for k, chunk in enumerate(
-            paginator.chunkify(users, _PER_PAGE))]
-        paginator.paginate(self.bot, ctx.channel, pages,
+        def page_factory(k):
+            return make_page(users[_PER_PAGE * k: _PER_PAGE * (k + 1)], k)
+
+        paginator.paginate(self.bot, ctx.channel, page_factory=page_factory,
+                           num_pages=paginator.num_chunks(len(users), _PER_PAGE),
                            wait_time=5 * 60, set_pagenum_footers=True)
 
     async def invalidate_duel(self, ctx, duelid, challenger_id, challengee_id): 
@@ -1,4 +1,3 @@
-import bisect
 import collections
 import datetime as dt
 import time
@@ -240,7 +239,7 @@ class Graphs(commands.Cog):
         args = filt.parse(args)
         handles = args or ('!' + str(ctx.author),)
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        resp = [await cf.user.rating(handle=handle) for handle in handles]
+        resp = await cf.fetch_for_handles(cf.user.rating, handles)
         resp = [filt.filter_rating_changes(rating_changes) for rating_changes in resp]
 
         if not any(resp):
@@ -301,7 +300,7 @@ class Graphs(commands.Cog):
         args = filt.parse(args)
         handles = args or ('!' + str(ctx.author),)
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        resp = [await cf.user.rating(handle=handle) for handle in handles]
+        resp = await cf.fetch_for_handles(cf.user.rating, handles)
         # extract last rating before corrections
         current_ratings = [rating_changes[-1].newRating if rating_changes else 'Unrated' for rating_changes in resp]
         resp = cf.user.correct_rating_changes(resp=resp)
@@ -404,7 +403,7 @@ class Graphs(commands.Cog):
         args = filt.parse(args)
         handles = args or ('!' + str(ctx.author),)
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        resp = [await cf.user.status(handle=handle) for handle in handles]
+        resp = await cf.fetch_for_handles(cf.user.status, handles)
         all_solved_subs = [filt.filter_subs(submissions) for submissions in resp]
 
         if not any(all_solved_subs):
@@ -467,7 +466,7 @@ class Graphs(commands.Cog):
 
         handles = handles or ['!' + str(ctx.author)]
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        resp = [await cf.user.status(handle=handle) for handle in handles]
+        resp = await cf.fetch_for_handles(cf.user.status, handles)
         all_solved_subs = [filt.filter_subs(submissions) for submissions in resp]
 
         if not any(all_solved_subs):
@@ -537,7 +536,7 @@ class Graphs(commands.Cog):
         args = filt.parse(args)
         handles = args or ('!' + str(ctx.author),)
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        resp = [await cf.user.status(handle=handle) for handle in handles]
+        resp = await cf.fetch_for_handles(cf.user.status, handles)
         all_solved_subs = [filt.filter_subs(submissions) for submissions in resp]
 
         if not any(all_solved_subs):
@@ -632,16 +631,18 @@ class Graphs(commands.Cog):
         discord_common.set_author_footer(embed, ctx.author)
         await ctx.send(embed=embed, file=discord_file)
 
-    async def _rating_hist(self, ctx, ratings, mode, binsize, title):
+    async def _rating_hist(self, ctx, height, cumulative, mode, binsize, title):
+        """Plots a histogram of ratings given the user count of each bin of `binsize` starting
+        at rating 0 and its cumulative sum."""
         if mode not in ('log', 'normal'):
             raise GraphCogError('Mode should be either `log` or `normal`')
 
-        ratings = [r for r in ratings if r >= 0]
-        assert ratings, 'Cannot histogram plot empty list of ratings'
+        height = np.trim_zeros(height, 'b')
+        assert len(height), 'Cannot histogram plot empty list of ratings'
 
         assert 100%binsize == 0 # because bins is semi-hardcoded
 
-        bins = 1 + max(ratings) // binsize
+        bins = len(height)
 
         colors = []
         low, high = 0, binsize * bins
@@ -650,16 +651,8 @@ class Graphs(commands.Cog):
                 colors.append('#' + '%06x' % rank.color_embed)
         assert len(colors) == bins, f'Expected {bins} colors, got {len(colors)}'
 
-        height = [0] * bins
-        for r in ratings:
-            height[r // binsize] += 1
-
-        csum = 0
-        cent = [0]
-        users = sum(height)
-        for h in height:
-            csum += h
-            cent.append(round(100 * csum / users))
+        users = cumulative[-1]
+        cent = [0] + [round(100 * csum / users) for csum in cumulative[:bins]]
 
         x = [k * binsize for k in range(bins)]
         label = [f'{r} ({c})' for r,c in zip(x, cent)]
@@ -698,10 +691,16 @@ class Graphs(commands.Cog):
             return not member or 'Purgatory' in {role.name for role in member.roles}
 
         res = cf_common.user_db.get_cf_users_for_guild(ctx.guild.id)
-        ratings = [cf_user.rating for user_id, cf_user in res
-                   if cf_user.rating is not None and not in_purgatory(user_id)]
+        ratings = np.array([cf_user.rating for user_id, cf_user in res
+                            if cf_user.rating is not None and not in_purgatory(user_id)],
+                           dtype=int)
+        ratings = ratings[ratings >= 0]
+        if not len(ratings):
+            raise GraphCogError('No rated users in this server')
+        height = np.bincount(ratings // 100)
         await self._rating_hist(ctx,
-                                ratings,
+                                height,
+                                np.cumsum(height),
                                 'normal',
                                 binsize=100,
                                 title='Rating distribution of server members')
@@ -716,14 +715,16 @@ class Graphs(commands.Cog):
             raise GraphCogError('Activity should be either `active` or `all`')
 
         time_cutoff = int(time.time()) - CONTEST_ACTIVE_TIME_CUTOFF if activity == 'active' else 0
-        handles = cf_common.cache2.rating_changes_cache.get_users_with_more_than_n_contests(time_cutoff, contest_cutoff)
-        if not handles:
+        distribution = cf_common.cache2.rating_changes_cache.rating_distribution
+        height, cumulative = distribution.histogram(100, min_contests=contest_cutoff,
+                                                    active_since=time_cutoff)
+        if not height.any():
             raise GraphCogError('No Codeforces users meet the specified criteria')
 
-        ratings = [cf_common.cache2.rating_changes_cache.get_current_rating(handle) for handle in handles]
         title = f'Rating distribution of {activity} Codeforces users ({mode} scale)'
         await self._rating_hist(ctx,
-                                ratings,
+                                height,
+                                cumulative,
                                 mode,
                                 binsize=100,
                                 title=title)
@@ -736,8 +737,10 @@ class Graphs(commands.Cog):
         intervals = [(rank.low, rank.high) for rank in cf.RATED_RANKS]
         colors = [rank.color_graph for rank in cf.RATED_RANKS]
 
-        ratings = cf_common.cache2.rating_changes_cache.get_all_ratings()
-        ratings = np.array(sorted(ratings))
+        distribution = cf_common.cache2.rating_changes_cache.rating_distribution
+        if not len(distribution):
+            raise GraphCogError('Rating changes cache is empty')
+        ratings = distribution.sorted_ratings
         n = len(ratings)
         perc = 100*np.arange(n)/n
 
@@ -754,8 +757,7 @@ class Graphs(commands.Cog):
             for info in infos:
                 if info.rating is None:
                     raise GraphCogError(f'User `{info.handle}` is not rated')
-                ix = bisect.bisect_left(ratings, info.rating)
-                cent = 100*ix/len(ratings)
+                cent = distribution.centile(info.rating)
                 users_to_mark[info.handle] = info.rating,cent
 
         # Plot
@@ -1052,7 +1054,7 @@ class Graphs(commands.Cog):
 
         handles = handles or ['!' + str(ctx.author)]
         handles = await cf_common.resolve_handles(ctx, self.converter, handles)
-        resp = [await cf.user.status(handle=handle) for handle in handles]
+        resp = await cf.fetch_for_handles(cf.user.status, handles)
         all_solved_subs = [filt.filter_subs(submissions) for submissions in resp]
 
         plt.clf()
@@ -9,6 +9,7 @@ from tle import constants
 from tle.util import codeforces_common as cf_common
 from tle.util import discord_common
 from tle.util import paginator
+from tle.util.outbox import outbox
 
 import zoneinfo
 import dateutil.parser
@@ -411,7 +412,7 @@ class Gym(commands.Cog):
             channel, role = guild
             channel = i.get_channel(channel)
             if channel:
-                await channel.send(content="<@&"+str(role)+">",embed=embed)
+                await outbox.send(channel, content="<@&"+str(role)+">",embed=embed)
     # gym session skip <date> <time> <reason>
     @session.command(help='Skip gym sessions\nAllows you to skip a session taking place on a certain date and time.\nIf the session is generated by a weekly recurring session, it automatically generates the next session (use `gym recurring skip` to specify the number of sessions to skip as well)\nWARNING: This command will lead to a shame message being sent to all the guilds which have this bot set up which you are in\ndate: The date of the session (2025/05/11, 30/11/2025, ...)\ntime: The time at which the session takes place (4:00PM, 5:00AM, etc.)\nreason: The reason for the session skip, will be sent in the shame message', name="skip", usage="<date> <time> <reason>")
     async def session_skip(self, ctx, date: str, time: str, *reason):
@@ -769,14 +770,16 @@ class Gym(commands.Cog):
             await asyncio.sleep(60)
             for i in cf_common.user_db.get_incomplete_sessions():
                 await self.shame(self.bot.get_user(i[0]), "Skipped Session", "Did not respond in time")
+            dms = []
             for i in cf_common.user_db.get_close_sessions():
                 if not self.bot.get_user(i[0]):
                     continue
-                await self.bot.get_user(i[0]).send("Reminder! Your gym session starts <t:"+str(i[1])+":R>")
+                dms.append(outbox.send(self.bot.get_user(i[0]), "Reminder! Your gym session starts <t:"+str(i[1])+":R>"))
             for i in cf_common.user_db.get_open_sessions():
                 if not self.bot.get_user(i[0]):
                     continue
-                await self.bot.get_user(i[0]).send("Your session was auto-completed for being in progress longer than 3 days")
+                dms.append(outbox.send(self.bot.get_user(i[0]), "Your session was auto-completed for being in progress longer than 3 days"))
+            await asyncio.gather(*dms)
             cf_common.user_db.fix_recurring_sessions()
 
 async def setup(bot):
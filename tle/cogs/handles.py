@@ -7,6 +7,7 @@ import html
 import cairo
 import gi
 import datetime
+import time
 gi.require_version('Pango', '1.0')
 gi.require_version('PangoCairo', '1.0')
 from gi.repository import Pango, PangoCairo
@@ -21,10 +22,12 @@ from tle.util import codeforces_api as cf
 from tle.util import codeforces_common as cf_common
 from tle.util import discord_common
 from tle.util import events
+from tle.util.outbox import outbox
 from tle.util import paginator
 from tle.util import table
 from tle.util import tasks
 from tle.util import db
+from tle.util.handledict import handle_registry
 from tle import constants
 from tle.cogs import codeforces as cfc
 
@@ -35,6 +38,7 @@ from PIL import Image, ImageFont, ImageDraw
 _HANDLES_PER_PAGE = 15
 _NAME_MAX_LEN = 20
 _PAGINATE_WAIT_TIME = 5 * 60  # 5 minutes
+_UNMAGIC_PROGRESS_INTERVAL = 5  # seconds
 _PRETTY_HANDLES_PER_PAGE = 10
 _TOP_DELTAS_COUNT = 10
 _MAX_RATING_CHANGES_PER_EMBED = 15
@@ -232,12 +236,11 @@ def _make_profile_embed(member, user, *, mode):
 
 
 def _make_pages(users, title):
-    chunks = paginator.chunkify(users, _HANDLES_PER_PAGE)
-    pages = []
-    done = 0
-
     style = table.Style('{:>}  {:<}  {:<}  {:<}')
-    for chunk in chunks:
+
+    def make_page(page_index):
+        done = page_index * _HANDLES_PER_PAGE
+        chunk = users[done: done + _HANDLES_PER_PAGE]
         t = table.Table(style)
         t += table.Header('#', 'Name', 'Handle', 'Rating')
         t += table.Line()
@@ -250,9 +253,9 @@ def _make_pages(users, title):
             t += table.Data(i + done, name, handle, f'{rating_str} ({rank.title_abbr})')
         table_str = '```\n'+str(t)+'\n```'
         embed = discord_common.cf_color_embed(description=table_str)
-        pages.append((title, embed))
-        done += len(chunk)
-    return pages
+        return title, embed
+
+    return paginator.LazyPages(make_page, paginator.num_chunks(len(users), _HANDLES_PER_PAGE))
 
 
 def parse_date(arg):
@@ -318,19 +321,49 @@ class Handles(commands.Cog):
         contest, changes = event.contest, event.rating_changes
         change_by_handle = {change.handle: change for change in changes}
 
-        async def update_for_guild(guild):
-            if cf_common.user_db.has_auto_role_update_enabled(guild.id):
+        # Read the settings and members of every guild first, so that the users of all guilds
+        # with auto role updates can be fetched together.
+        guild_updates = []
+        handle_by_id = {}
+        for guild in self.bot.guilds:
+            auto_role_update = cf_common.user_db.has_auto_role_update_enabled(guild.id)
+            channel = guild.get_channel(cf_common.user_db.get_rankup_channel(guild.id))
+            if not auto_role_update and channel is None:
+                continue
+            member_handles = self._get_member_handles(guild)
+            if auto_role_update:
+                for _, handle in member_handles:
+                    handle_by_id.setdefault(handle_registry.intern(handle), handle)
+            guild_updates.append((guild, member_handles, auto_role_update, channel))
+
+        user_by_id = {}
+        if handle_by_id:
+            try:
+                users = await cf.fetch_users_by_handle(handle_by_id.values())
+            except cf.CodeforcesApiError as e:
+                # Rank updates are still published, only roles are not updated.
+                self.logger.warning(f'Could not fetch users for role updates: {e!r}')
+                users = {}
+            user_by_id = {handle_registry.intern(handle): user
+                          for handle, user in users.items() if user is not None}
+            cf_common.user_db.cache_cf_users(user_by_id.values())
+            self.logger.info(f'Fetched {len(user_by_id)} users for role updates of contest '
+                             f'{contest.id}.')
+
+        async def update_for_guild(guild, member_handles, auto_role_update, channel):
+            if auto_role_update:
+                member_users = [(member, user_by_id.get(handle_registry.get_id(handle)))
+                                for member, handle in member_handles]
                 with contextlib.suppress(HandleCogError):
-                    await self._update_ranks_all(guild)
-            channel_id = cf_common.user_db.get_rankup_channel(guild.id)
-            channel = guild.get_channel(channel_id)
+                    await self._assign_rank_roles(
+                        guild, [(member, user) for member, user in member_users if user is not None])
             if channel is not None:
                 with contextlib.suppress(HandleCogError):
-                    embeds = self._make_rankup_embeds(guild, contest, change_by_handle)
-                    for embed in embeds:
-                        await channel.send(embed=embed)
+                    embeds = self._make_rankup_embeds(guild, contest, change_by_handle,
+                                                      member_handles)
+                    await outbox.send_many(channel, embeds=embeds)
 
-        await asyncio.gather(*(update_for_guild(guild) for guild in self.bot.guilds),
+        await asyncio.gather(*(update_for_guild(*update) for update in guild_updates),
                              return_exceptions=True)
         self.logger.info(f'All guilds updated for contest {contest.id}.')
 
@@ -480,10 +513,27 @@ class Handles(commands.Cog):
             member = ctx.guild.get_member(user_id)
             handles.append(handle)
             rev_lookup[handle] = member
-        await self._unmagic_handles(ctx, handles, rev_lookup)
+        await self._unmagic_handles(ctx, handles, rev_lookup, show_progress=True)
+
+    async def _unmagic_handles(self, ctx, handles, rev_lookup, *, show_progress=False):
+        progress = None
+        if show_progress:
+            status_msg = None
+            last_update = 0
+
+            async def progress(done, total):
+                nonlocal status_msg, last_update
+                now = time.time()
+                if done < total and now - last_update < _UNMAGIC_PROGRESS_INTERVAL:
+                    return
+                last_update = now
+                content = f'Resolving redirects: {done}/{total} handles checked'
+                if status_msg is None:
+                    status_msg = await ctx.send(content)
+                else:
+                    await status_msg.edit(content=content)
 
-    async def _unmagic_handles(self, ctx, handles, rev_lookup):
-        handle_cf_user_mapping = await cf.resolve_redirects(handles)
+        handle_cf_user_mapping = await cf.resolve_redirects(handles, progress=progress)
         mapping = {(rev_lookup[handle], handle): cf_user
                    for handle, cf_user in handle_cf_user_mapping.items()}
         summary_embed = await self._fix_and_report(ctx, mapping)
@@ -514,9 +564,6 @@ class Handles(commands.Cog):
     @commands.command(brief="Show gudgitters", aliases=["gitgudders", "gitbadders"], usage="[div1|div2|div3] [+all]")
     async def gudgitters(self, ctx, *args):
         """Show the list of users of gitgud with their scores."""
-        res = cf_common.user_db.get_gudgitters()
-        res.sort(key=lambda r: r[1], reverse=True)
-        
         division = None
         showall = False
         for arg in args:
@@ -530,18 +577,17 @@ class Handles(commands.Cog):
             if arg == "+all":
                 showall = True
 
+        res = cf_common.user_db.get_leaderboard(db.Leaderboard.GITGUD, ctx.guild.id,
+                                                active_only=not showall)
         rankings = []
         index = 0
-        for user_id, score in res:
-            member = ctx.guild.get_member(int(user_id))
+        for user_id, handle, score, rating, cf_user_cached in res:
+            member = ctx.guild.get_member(user_id)
             if not showall and member is None:
                 continue
             if score > 0:
-                handle = cf_common.user_db.get_handle(user_id, ctx.guild.id)
-                user = cf_common.user_db.fetch_cf_user(handle)
-                if user is None:
+                if not cf_user_cached:
                     continue
-                rating = user.rating
 
                 discord_handle = ""
                 if member is not None: 
@@ -721,16 +767,28 @@ class Handles(commands.Cog):
         res = cf_common.user_db.get_handles_for_guild(guild.id)
         await self._update_ranks(guild, res)
 
-    async def _update_ranks(self, guild, res):
+    @staticmethod
+    def _get_member_handles(guild, res=None):
+        """Returns (member, handle) pairs for the members of the guild with a handle."""
+        if res is None:
+            res = cf_common.user_db.get_handles_for_guild(guild.id)
         member_handles = [(guild.get_member(user_id), handle) for user_id, handle in res]
-        member_handles = [(member, handle) for member, handle in member_handles if member is not None]
+        return [(member, handle) for member, handle in member_handles if member is not None]
+
+    async def _update_ranks(self, guild, res):
+        member_handles = self._get_member_handles(guild, res)
         if not member_handles:
             raise HandleCogError('Handles not set for any user')
         members, handles = zip(*member_handles)
         users = await cf.user.info(handles=handles)
-        for user in users:
-            cf_common.user_db.cache_cf_user(user)
+        cf_common.user_db.cache_cf_users(users)
+        await self._assign_rank_roles(guild, list(zip(members, users)))
 
+    async def _assign_rank_roles(self, guild, member_users):
+        """Gives each member the role of the rank of their Codeforces user."""
+        if not member_users:
+            raise HandleCogError('Handles not set for any user')
+        users = [user for _, user in member_users]
         required_roles = {user.rank.title for user in users}
         rank2role = {role.name: role for role in guild.roles if role.name in required_roles}
         missing_roles = required_roles - rank2role.keys()
@@ -739,19 +797,20 @@ class Handles(commands.Cog):
             plural = 's' if len(missing_roles) > 1 else ''
             raise HandleCogError(f'Role{plural} for rank{plural} {roles_str} not present in the server')
 
-        for member, user in zip(members, users):
+        for member, user in member_users:
             role_to_assign = rank2role[user.rank.title]
             await self.update_member_rank_role(member, role_to_assign,
                                                reason='Codeforces rank update')
 
     @staticmethod
-    def _make_rankup_embeds(guild, contest, change_by_handle):
+    def _make_rankup_embeds(guild, contest, change_by_handle, member_handle_pairs=None):
         """Make an embed containing a list of rank changes and top rating increases for the members
         of this guild.
         """
-        user_id_handle_pairs = cf_common.user_db.get_handles_for_guild(guild.id)
-        member_handle_pairs = [(guild.get_member(user_id), handle)
-                               for user_id, handle in user_id_handle_pairs]
+        if member_handle_pairs is None:
+            user_id_handle_pairs = cf_common.user_db.get_handles_for_guild(guild.id)
+            member_handle_pairs = [(guild.get_member(user_id), handle)
+                                   for user_id, handle in user_id_handle_pairs]
         def ispurg(member):
             # TODO: temporary code, todo properly later
             return any(role.name == 'Purgatory' for role in member.roles)
@@ -17,6 +17,7 @@ from tle.util import codeforces_api as cf
 from tle.util import discord_common
 from tle.util import elo
 from tle.util import paginator
+from tle.util.outbox import outbox
 
 logger = logging.getLogger(__name__)
 
@@ -304,7 +305,7 @@ class Round(commands.Cog):
         repeat = await self._get_time_response(self.bot, ctx, f"{ctx.author.mention} do you want a new problem to appear when someone solves a problem (type 1 for yes and 0 for no)", 30, ctx.author, [0, 1])
 
         # pick problems
-        submissions = [await cf.user.status(handle=handle) for handle in handles]        
+        submissions = await cf.fetch_for_handles(cf.user.status, handles)        
         solved = {sub.problem.name for subs in submissions for sub in subs if sub.verdict != 'COMPILATION_ERROR'} 
         selected = []
         for rating in ratings:
@@ -388,11 +389,11 @@ class Round(commands.Cog):
         embed.add_field(name="Rating changes", value=ratingChange)
         embed.set_author(name=f"Round over! Final standings")
 
-        await channel.send(embed=embed)    
+        await outbox.send(channel, embed=embed)    
 
     async def _update_round(self, round_info):
         user_ids = list(map(int, round_info.users.split()))
-        handles = [cf_common.user_db.get_handle(user_id, round_info.guild) for user_id in user_ids]
+        handles = cf_common.user_db.get_handles(user_ids, round_info.guild)
         rating = list(map(int, round_info.rating.split()))
         enter_time = time.time()
         points = list(map(int, round_info.points.split()))
@@ -403,7 +404,7 @@ class Round(commands.Cog):
         judging, over, updated = False, False, False
 
         updates = []
-        recent_subs = [await cf.user.status(handle=handle, count=RECENT_SUBS_LIMIT) for handle in handles]
+        recent_subs = await cf.fetch_for_handles(cf.user.status, handles, count=RECENT_SUBS_LIMIT)
         for i in range(len(problems)):
             # Problem was solved before and no replacement -> skip
             if problems[i] == '0':
@@ -433,7 +434,7 @@ class Round(commands.Cog):
             # Get new problem if repeat is set to 1
             if len(solved) > 0 and round_info.repeat == 1:
                 try: 
-                    submissions = [await cf.user.status(handle=handle) for handle in handles]        
+                    submissions = await cf.fetch_for_handles(cf.user.status, handles)        
                     solved = {sub.problem.name for subs in submissions for sub in subs if sub.verdict != 'COMPILATION_ERROR'} 
                     problem = await self._pick_problem(handles, solved, rating[i], [])
                     problems[i] = f'{problem.contestId}/{problem.index}'
@@ -452,18 +453,22 @@ class Round(commands.Cog):
     async def _check_round_complete(self, guild, channel, round, isAutomaticRun = False):
         updates, over, updated = await self._update_round(round)
 
+        # Queue the messages together so that the embeds are sent along with the first message.
+        content = None
         if updated or over:
-            await channel.send(f"{' '.join([(guild.get_member(int(m))).mention for m in round.users.split()])} there is an update in standings")
+            content = f"{' '.join([(guild.get_member(int(m))).mention for m in round.users.split()])} there is an update in standings"
 
+        embeds = []
         for i in range(len(updates)):
             if len(updates[i]):
-                await channel.send(embed=discord.Embed(
+                embeds.append(discord.Embed(
                     description=f"{' '.join([(guild.get_member(m)).mention for m in updates[i]])} has solved problem worth **{round.points.split()[i]}** points",
                     color=discord.Color.blue()))
 
         if not over and updated:
             round_info = cf_common.user_db.get_round_info(round.guild, round.users)
-            await channel.send(embed=self._round_problems_embed(round_info))
+            embeds.append(self._round_problems_embed(round_info))
+        await outbox.send_many(channel, content, embeds)
 
         # round ended -> make rating changes, change db, show results
         if over:
@@ -504,60 +509,53 @@ class Round(commands.Cog):
         if not data:
             raise RoundCogError(f"No ongoing rounds")
 
-        def _make_pages(data, title):
-            chunks = paginator.chunkify(data, ROUNDS_PER_PAGE)
-            pages = []
-
-            for chunk in chunks:
-                msg = ''
-                for round in chunk:
-                    ranklist = _calc_round_score(list(map(int, round.users.split())), list(map(int, round.status.split())),
-                                                    list(map(int, round.times.split())))
-                    msg += ' vs '.join([f"[{cf_common.user_db.get_handle(user.id, round.guild) }](https://codeforces.com/profile/{cf_common.user_db.get_handle(user.id, round.guild) }) `Rank {user.rank}` `{user.points} Points`"
-                                    for user in ranklist])
-                    msg += f"\n**Problem ratings:** {round.rating}"
-                    msg += f"\n**Score distribution** {round.points}"
-                    timestr = cf_common.pretty_time_format(((round.time + 60 * round.duration) - int(time.time())), shorten=True, always_seconds=True)
-                    msg += f"\n**Time left:** {timestr}\n\n"
-                embed = discord_common.cf_color_embed(description=msg)
-                pages.append((title, embed))
-
-            return pages
+        def _make_page(chunk, title):
+            msg = ''
+            for round in chunk:
+                ranklist = _calc_round_score(list(map(int, round.users.split())), list(map(int, round.status.split())),
+                                                list(map(int, round.times.split())))
+                msg += ' vs '.join([f"[{cf_common.user_db.get_handle(user.id, round.guild) }](https://codeforces.com/profile/{cf_common.user_db.get_handle(user.id, round.guild) }) `Rank {user.rank}` `{user.points} Points`"
+                                for user in ranklist])
+                msg += f"\n**Problem ratings:** {round.rating}"
+                msg += f"\n**Score distribution** {round.points}"
+                timestr = cf_common.pretty_time_format(((round.time + 60 * round.duration) - int(time.time())), shorten=True, always_seconds=True)
+                msg += f"\n**Time left:** {timestr}\n\n"
+            embed = discord_common.cf_color_embed(description=msg)
+            return title, embed
 
         title = 'List of ongoing lockout rounds'
-        pages = _make_pages(data, title)
+        pages = paginator.LazyPages.from_chunks(data, ROUNDS_PER_PAGE, lambda chunk: _make_page(chunk, title))
         paginator.paginate(self.bot, ctx.channel, pages, wait_time=_PAGINATE_WAIT_TIME,
                            set_pagenum_footers=True)
 
     @round.command(name="recent", brief="Show recent rounds")
     async def recent(self, ctx, user: discord.Member=None):
-        data = cf_common.user_db.get_recent_rounds(ctx.guild.id, str(user.id) if user else None)
+        user_filter = str(user.id) if user else None
+        num_rounds = cf_common.user_db.get_num_recent_rounds(ctx.guild.id, user_filter)
         
-        if not data:
+        if not num_rounds:
             raise RoundCogError(f"No recent rounds")
 
-        def _make_pages(data, title):
-            chunks = paginator.chunkify(data, ROUNDS_PER_PAGE)
-            pages = []
-
-            for chunk in chunks:
-                msg = ''
-                for round in chunk:
-                    ranklist = _calc_round_score(list(map(int, round.users.split())), list(map(int, round.status.split())),
-                                                    list(map(int, round.times.split())))
-                    msg += ' vs '.join([f"[{cf_common.user_db.get_handle(user.id, round.guild) }](https://codeforces.com/profile/{cf_common.user_db.get_handle(user.id, round.guild) }) `Rank {user.rank}` `{user.points} Points`"
-                                    for user in ranklist])
-                    msg += f"\n**Problem ratings:** {round.rating}"
-                    msg += f"\n**Score distribution** {round.points}"
-                    timestr = cf_common.pretty_time_format(min(60*round.duration, round.end_time-round.time), shorten=True, always_seconds=True)
-                    msg += f"\n**Duration:** {timestr}\n\n"
-                embed = discord_common.cf_color_embed(description=msg)
-                pages.append((title, embed))
-
-            return pages
+        def _fetch(limit, offset):
+            return cf_common.user_db.get_recent_rounds(ctx.guild.id, user_filter, limit=limit, offset=offset)
+
+        def _make_page(chunk, title):
+            msg = ''
+            for round in chunk:
+                ranklist = _calc_round_score(list(map(int, round.users.split())), list(map(int, round.status.split())),
+                                                list(map(int, round.times.split())))
+                msg += ' vs '.join([f"[{cf_common.user_db.get_handle(user.id, round.guild) }](https://codeforces.com/profile/{cf_common.user_db.get_handle(user.id, round.guild) }) `Rank {user.rank}` `{user.points} Points`"
+                                for user in ranklist])
+                msg += f"\n**Problem ratings:** {round.rating}"
+                msg += f"\n**Score distribution** {round.points}"
+                timestr = cf_common.pretty_time_format(min(60*round.duration, round.end_time-round.time), shorten=True, always_seconds=True)
+                msg += f"\n**Duration:** {timestr}\n\n"
+            embed = discord_common.cf_color_embed(description=msg)
+            return title, embed
 
         title = 'List of recent lockout rounds'
-        pages = _make_pages(data, title)
+        pages = paginator.LazyPages.from_query(_fetch, num_rounds, ROUNDS_PER_PAGE,
+                                               lambda chunk: _make_page(chunk, title))
         paginator.paginate(self.bot, ctx.channel, pages, wait_time=_PAGINATE_WAIT_TIME,
                            set_pagenum_footers=True)
 
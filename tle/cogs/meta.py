@@ -7,9 +7,13 @@ import textwrap
 from discord.ext import commands
 
 from tle import constants
+from tle.util import metrics
+from tle.util import table
 from tle.util.codeforces_common import pretty_time_format
 
 RESTART = 42
+_STATS_ROWS_PER_SECTION = 5
+_STATS_NAME_MAX_LEN = 28
 
 
 # Adapted from numpy sources.
@@ -90,6 +94,31 @@ class Meta(commands.Cog):
         await ctx.send('TLE has been running for ' +
                        pretty_time_format(time.time() - self.start_time))
 
+    @meta.command(brief='Show timing statistics')
+    @commands.has_role(constants.TLE_ADMIN)
+    async def stats(self, ctx):
+        """Shows where the bot spends its time since startup: the busiest commands, Codeforces
+        API endpoints, database methods and tasks by total time."""
+        sections = [
+            ('Command', metrics.command_seconds, 'command'),
+            ('API endpoint', metrics.api_seconds, 'endpoint'),
+            ('DB method', metrics.db_query_seconds, 'method'),
+            ('Task', metrics.task_seconds, 'task'),
+        ]
+        style = table.Style('{:<}  {:>}  {:>}  {:>}')
+        t = table.Table(style)
+        for title, histogram, label in sections:
+            rows = metrics.summarize(histogram, label, limit=_STATS_ROWS_PER_SECTION)
+            if not rows:
+                continue
+            t += table.Header(title, 'Count', 'Mean', 'Max')
+            t += table.Line()
+            for value, count, mean, max_ in rows:
+                t += table.Data(value[:_STATS_NAME_MAX_LEN], count, f'{mean * 1000:.0f}ms',
+                                f'{max_ * 1000:.0f}ms')
+            t += table.Line()
+        await ctx.send('```\n' + str(t) + '\n```' if t.rows else 'No statistics recorded yet')
+
     @meta.command(brief='Print bot guilds')
     @commands.has_role(constants.TLE_ADMIN)
     async def guilds(self, ctx):
@@ -0,0 +1,53 @@
+"""Snapshots of the derived in-memory state of the caches in cache_system2, so that a restart can
+skip rebuilding them from the cache database. Each cache is stored in its own file together with
+the generations of the tables it was built from, and is only used if none of them has changed
+since.
+"""
+import asyncio
+import logging
+import os
+import pickle
+
+logger = logging.getLogger(__name__)
+
+# Bump when the state stored by any cache changes shape.
+SNAPSHOT_VERSION = 6
+
+
+class SnapshotStore:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, name):
+        return os.path.join(self.directory, f'{name}.snapshot')
+
+    def load(self, name, generations):
+        """Returns the state saved for `name` if it was saved at `generations`, a dict from
+        table name to generation, else None."""
+        try:
+            with open(self._path(name), 'rb') as f:
+                version, saved_generations, state = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f'Ignoring unreadable snapshot {name}: {e!r}')
+            return None
+        if version != SNAPSHOT_VERSION or saved_generations != generations:
+            logger.info(f'Snapshot {name} is stale')
+            return None
+        return state
+
+    async def save(self, name, generations, state):
+        # Serialize on the event loop, the state may be modified by other tasks.
+        data = pickle.dumps((SNAPSHOT_VERSION, generations, state), pickle.HIGHEST_PROTOCOL)
+        await asyncio.to_thread(self._write, self._path(name), data)
+        logger.info(f'Saved snapshot {name} at generations {generations} ({len(data)} bytes)')
+
+    @staticmethod
+    def _write(path, data):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
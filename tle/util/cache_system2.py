@@ -1,6 +1,8 @@
 import asyncio
+import bisect
 import logging
 import time
+import numpy as np
 from aiocache import cached
 
 from collections import defaultdict
@@ -8,9 +10,11 @@ from discord.ext import commands
 
 from tle.util import codeforces_common as cf_common
 from tle.util import codeforces_api as cf
+from tle.util import cache_snapshot
 from tle.util import events
 from tle.util import tasks
 from tle.util import paginator
+from tle.util.handledict import handle_registry
 from tle.util.ranklist import Ranklist
 
 logger = logging.getLogger(__name__)
@@ -53,14 +57,30 @@ class ContestCache:
         self.contests_by_phase['_RUNNING'] = []
         self.contests_last_cache = 0
 
+        # Immutable views of finished contests, pre-sorted for bisect range queries.
+        self.finished_by_start = ()
+        self.finished_by_end = ()
+        self._finished_start_keys = []
+        self._finished_end_keys = []
+        # Contest id -> ContestAttributes, computed once per contest at load.
+        self.contest_attrs = {}
+        # Normalized marker -> frozenset of ids of contests matching it.
+        self._marker_index = {}
+        self._generation = None
+
         self.reload_lock = asyncio.Lock()
         self.reload_exception = None
         self.next_delay = None
 
         self.logger = logging.getLogger(self.__class__.__name__)
 
-    async def run(self):
-        await self._try_disk()
+    async def run(self, snapshot=None):
+        if snapshot is None:
+            await self._try_disk()
+        else:
+            async with self.reload_lock:
+                contests, contest_attrs = snapshot
+                await self._update(contests, from_api=False, contest_attrs=contest_attrs)
         self._update_task.start()
 
     async def reload_now(self):
@@ -89,6 +109,69 @@ class ContestCache:
     def get_contests_in_phase(self, phase):
         return self.contests_by_phase[phase]
 
+    def get_contest_attributes(self, contest):
+        attrs = self.contest_attrs.get(contest.id)
+        if attrs is None:
+            # Contest not in the cache, e.g. a gym contest fetched directly from the API.
+            attrs = cf_common.classify_contest(contest)
+        return attrs
+
+    def with_contest_info(self, problem, contest=None):
+        """Returns `problem` with the division tags of its contest added to its tags and the
+        fields derived from its contest filled in. `contest` defaults to the cached contest of
+        the problem, and the problem is returned as is if there is none."""
+        contest = contest or self.contest_by_id.get(problem.contestId)
+        if contest is None:
+            return problem
+        attrs = self.get_contest_attributes(contest)
+        tags = tuple(problem.tags)
+        tags += tuple(tag for tag in attrs.div_tags if tag not in tags)
+        nonstandard = (attrs.nonstandard or
+                       cf.tag_dictionary.mask_matches_all(cf.tag_dictionary.mask_of(tags),
+                                                          ['*special']))
+        return problem._replace(tags=tags, div_tags=attrs.div_tags,
+                                contest_start=contest.startTimeSeconds, nonstandard=nonstandard)
+
+    def get_finished_contests_in_window(self, begin=None, end=None, *, by_end_time=False):
+        """Returns finished contests with start time (or end time if `by_end_time`) in the
+        half-open interval [begin, end), sorted by that time."""
+        if by_end_time:
+            contests, keys = self.finished_by_end, self._finished_end_keys
+        else:
+            contests, keys = self.finished_by_start, self._finished_start_keys
+        lo = 0 if begin is None else bisect.bisect_left(keys, begin)
+        hi = len(keys) if end is None else bisect.bisect_left(keys, end)
+        return contests[lo:hi]
+
+    def get_most_recently_finished(self, count):
+        """Returns the last `count` finished contests, most recently ended first."""
+        if count <= 0:
+            return ()
+        # Slices backwards so that only `count` contests are copied.
+        return self.finished_by_end[:-count - 1:-1]
+
+    def get_contest_ids_matching(self, markers):
+        """Returns the set of ids of contests whose name matches any of the markers, with the
+        same semantics as `Contest.matches`."""
+        ids = set()
+        for marker in markers:
+            ids |= self._ids_matching_marker(marker)
+        return ids
+
+    def get_finished_contests_matching(self, markers):
+        """Returns finished contests matching any of the markers, sorted by start time."""
+        ids = self.get_contest_ids_matching(markers)
+        return [contest for contest in self.finished_by_start if contest.id in ids]
+
+    def _ids_matching_marker(self, marker):
+        key = cf.normalize_contest_name(marker)
+        ids = self._marker_index.get(key)
+        if ids is None:
+            ids = frozenset(contest_id for contest_id, attrs in self.contest_attrs.items()
+                            if key in attrs.normalized_name)
+            self._marker_index[key] = ids
+        return ids
+
     async def _try_disk(self):
         async with self.reload_lock:
             contests = self.cache_master.conn.fetch_contests()
@@ -117,7 +200,7 @@ class ContestCache:
         delay = await self._update(contests)
         return delay
 
-    async def _update(self, contests, from_api=True):
+    async def _update(self, contests, from_api=True, contest_attrs=None):
         self.logger.info(f'{len(contests)} contests fetched from {"API" if from_api else "disk"}')
         contests.sort(key=lambda contest: (contest.startTimeSeconds, contest.id))
 
@@ -151,15 +234,33 @@ class ContestCache:
             # If any contest is running, reload at an increased rate to detect FINISHED
             delay = min(delay, self._ACTIVE_CONTEST_RELOAD_DELAY)
 
+        finished = contests_by_phase['FINISHED']
+        finished_by_end = sorted(finished, key=lambda contest: (contest.end_time, contest.id))
+
         self.contests = contests
         self.contests_by_phase = contests_by_phase
         self.contest_by_id = contest_by_id
+        self.finished_by_start = tuple(finished)
+        self.finished_by_end = tuple(finished_by_end)
+        self._finished_start_keys = [contest.startTimeSeconds for contest in finished]
+        self._finished_end_keys = [contest.end_time for contest in finished_by_end]
+        if contest_attrs is None:
+            contest_attrs = {contest.id: cf_common.classify_contest(contest)
+                             for contest in contests}
+        self.contest_attrs = contest_attrs
+        self._marker_index = {}
         self.contests_last_cache = time.time()
+        self._generation = self.cache_master.conn.get_generation('contest')
+        if from_api:
+            self.cache_master.schedule_snapshot('contest')
 
         cf_common.event_sys.dispatch(events.ContestListRefresh, self.contests.copy())
 
         return delay
 
+    def _get_snapshot(self):
+        return {'contest': self._generation}, (self.contests, self.contest_attrs)
+
 
 class ProblemCache:
     _RELOAD_INTERVAL = 6 * 60 * 60
@@ -171,15 +272,25 @@ class ProblemCache:
 
         self.problems = []
         self.problem_by_name = {}
+        # Tag bitmask of each problem, parallel to self.problems.
+        self.problem_tag_masks = []
         self.problems_last_cache = 0
+        # Generations of the tables self.problems is built from. Problems carry fields derived
+        # from their contests.
+        self._generations = None
 
         self.reload_lock = asyncio.Lock()
         self.reload_exception = None
 
         self.logger = logging.getLogger(self.__class__.__name__)
 
-    async def run(self):
-        await self._try_disk()
+    async def run(self, snapshot=None):
+        if snapshot is None:
+            await self._try_disk()
+        else:
+            self._set_problems(snapshot)
+            self._record_generations()
+            self.logger.info(f'{len(self.problems)} problems loaded from snapshot')
         self._update_task.start()
 
     async def reload_now(self):
@@ -202,10 +313,37 @@ class ProblemCache:
             if not problems:
                 self.logger.info('Problem cache on disk is empty.')
                 return
-            self.problems = problems
-            self.problem_by_name = {problem.name: problem for problem in problems}
+            contest_cache = self.cache_master.contest_cache
+            self._set_problems([contest_cache.with_contest_info(problem) for problem in problems])
+            self._record_generations()
             self.logger.info(f'{len(self.problems)} problems fetched from disk')
 
+    def _set_problems(self, problems):
+        self.problems = problems
+        self.problem_by_name = {problem.name: problem for problem in problems}
+        self._build_tag_masks()
+
+    def _build_tag_masks(self):
+        self.problem_tag_masks = [cf.tag_dictionary.mask_of(problem.tags)
+                                  for problem in self.problems]
+
+    def _record_generations(self):
+        self._generations = {'problem': self.cache_master.conn.get_generation('problem'),
+                             'contest': self.cache_master.contest_cache._generation}
+
+    def _get_snapshot(self):
+        return self._generations, self.problems
+
+    def problems_matching_tags(self, tags, bantags=()):
+        """Returns the cached problems that match all of `tags` and none of `bantags`."""
+        tag_dictionary = cf.tag_dictionary
+        required = [tag_dictionary.fragment_mask(tag) for tag in set(tags)]
+        banned = 0
+        for tag in bantags:
+            banned |= tag_dictionary.fragment_mask(tag)
+        return [problem for problem, mask in zip(self.problems, self.problem_tag_masks)
+                if not mask & banned and all(mask & req for req in required)]
+
     @tasks.task_spec(name='ProblemCacheUpdate',
                      waiter=tasks.Waiter.fixed_delay(_RELOAD_INTERVAL))
     async def _update_task(self, _):
@@ -237,20 +375,15 @@ class ProblemCache:
         }
         self.logger.info(f'Keeping {len(problem_by_name)} problems')
 
-        self.problems = list(problem_by_name.values())
-        self.problem_by_name = problem_by_name
+        contest_cache = self.cache_master.contest_cache
+        self._set_problems([contest_cache.with_contest_info(problem, contest_map[problem.contestId])
+                            for problem in problem_by_name.values()])
         self.problems_last_cache = time.time()
 
-        for problem in self.problems:
-            problem_contest = self.cache_master.contest_cache.contest_by_id.get(problem.contestId)
-
-            divisions = [div_tag for div_tag in _DIV_TAGS if problem_contest.matches([div_tag])] 
-
-            for division in divisions:
-                problem.tags.append(division) 
-        
         rc = self.cache_master.conn.cache_problems(self.problems)
         self.logger.info(f'{rc} problems stored in database')
+        self._record_generations()
+        self.cache_master.schedule_snapshot('problem')
 
 
 class ProblemsetCacheError(CacheError):
@@ -267,18 +400,31 @@ class ProblemsetCache:
     _RELOAD_DELAY = 60 * 60
 
     def __init__(self, cache_master):
-        self.problems = []
         # problem -> list of contests in which it appears
         self.problem_to_contests = defaultdict(list)
+        # contest id -> {problem index: (problem name, problem key in problem_to_contests, or
+        # None if the contest is not in the contest cache)}
+        self._problems_by_contest = defaultdict(dict)
+        # Generations of the tables the index is built from. Problems are keyed on the start
+        # times of their contests.
+        self._generations = None
         self.cache_master = cache_master
         self.update_lock = asyncio.Lock()
         self.logger = logging.getLogger(self.__class__.__name__)
 
-    async def run(self):
+    async def run(self, snapshot=None):
         if self.cache_master.conn.problemset_empty():
             self.logger.warning('Problemset cache on disk is empty. This must be populated '
                                 'manually before use.')
+        if snapshot is None:
+            self._update_from_disk()
+        else:
+            self.problem_to_contests, self._problems_by_contest = snapshot
+            self._record_generations()
+            self.logger.info(f'Problemsets of {len(self._problems_by_contest)} contests loaded '
+                             'from snapshot')
         self._update_task.start()
+        self._reindex_task.start()
 
     async def update_for_contest(self, contest_id):
         """Update problemset for a particular contest. Intended for manual trigger."""
@@ -286,6 +432,7 @@ class ProblemsetCache:
             contest = self.cache_master.contest_cache.get_contest(contest_id)
             problemset, _ = await self._fetch_problemsets([contest], force_fetch=True)
             self.cache_master.conn.clear_problemset(contest_id)
+            self._forget_contests([contest_id])
             self._save_problems(problemset)
             return len(problemset)
 
@@ -295,6 +442,7 @@ class ProblemsetCache:
             contests = self.cache_master.contest_cache.contests_by_phase['FINISHED']
             problemsets, _ = await self._fetch_problemsets(contests, force_fetch=True)
             self.cache_master.conn.clear_problemset()
+            self._forget_contests(list(self._problems_by_contest))
             self._save_problems(problemsets)
             return len(problemsets)
 
@@ -302,10 +450,11 @@ class ProblemsetCache:
                      waiter=tasks.Waiter.fixed_delay(_RELOAD_DELAY))
     async def _update_task(self, _):
         async with self.update_lock:
-            contests = self.cache_master.contest_cache.contests_by_phase['FINISHED']
+            since = time.time() - self._MONITOR_PERIOD_SINCE_CONTEST_END
+            contests = self.cache_master.contest_cache.get_finished_contests_in_window(
+                since, by_end_time=True)
             new_problems, updated_problems = await self._fetch_problemsets(contests)
             self._save_problems(new_problems + updated_problems)
-            self._update_from_disk()
             self.logger.info(f'{len(new_problems)} new problems saved and {len(updated_problems)} '
                              'saved problems updated.')
 
@@ -317,11 +466,8 @@ class ProblemsetCache:
         if force_fetch:
             new_contest_ids = [contest.id for contest in contests]
         else:
-            now = time.time()
+            # Contests are expected to be limited to the monitoring period by the caller.
             for contest in contests:
-                if now > contest.end_time + self._MONITOR_PERIOD_SINCE_CONTEST_END:
-                    # Contest too old, we do not want to check it.
-                    continue
                 problemset = self.cache_master.conn.fetch_problemset(contest.id)
                 if not problemset:
                     new_contest_ids.append(contest.id)
@@ -343,13 +489,9 @@ class ProblemsetCache:
         try:
             contest, problemset, _ = await cf.contest.standings(contest_id=contest_id, from_=1,
                                                           count=1)
-            
-            divisions = [div_tag for div_tag in _DIV_TAGS if contest.matches([div_tag])] 
-
-            for problem in problemset:
-                for division in divisions:
-                    problem.tags.append(division) 
-
+            contest_cache = self.cache_master.contest_cache
+            problemset = [contest_cache.with_contest_info(problem, contest)
+                          for problem in problemset]
 
         except cf.CodeforcesApiError as er:
             self.logger.warning(f'Problemset fetch failed for contest {contest_id}. {er!r}')
@@ -360,6 +502,10 @@ class ProblemsetCache:
     def _save_problems(self, problems):
         rc = self.cache_master.conn.cache_problemset(problems)
         self.logger.info(f'Saved {rc} problems to database.')
+        self._index_problems(problems)
+        self._record_generations()
+        if rc:
+            self.cache_master.schedule_snapshot('problem2')
 
     def get_problemset(self, contest_id):
         problemset = self.cache_master.conn.fetch_problemset(contest_id)
@@ -367,16 +513,173 @@ class ProblemsetCache:
             raise ProblemsetNotCached(contest_id)
         return problemset
 
+    def get_problem_count(self, contest_id):
+        contest_problems = self._problems_by_contest.get(contest_id)
+        if not contest_problems:
+            raise ProblemsetNotCached(contest_id)
+        return len(contest_problems)
+
+    @tasks.task_spec(name='ProblemsetCacheReindex',
+                     waiter=tasks.Waiter.for_event(events.ContestListRefresh))
+    async def _reindex_task(self, _):
+        async with self.update_lock:
+            generations = self._generations
+            changed = self._reindex_contests()
+            self._record_generations()
+            if changed or generations != self._generations:
+                self.cache_master.schedule_snapshot('problem2')
+
+    def _reindex_contests(self):
+        """Re-resolves the keys of indexed problems against the contest cache, for contests
+        which were missing from it or were rescheduled. Returns the number of changed keys."""
+        contest_by_id = self.cache_master.contest_cache.contest_by_id
+        changed = 0
+        for contest_id, contest_problems in self._problems_by_contest.items():
+            contest = contest_by_id.get(contest_id)
+            for index, (name, problem_id) in contest_problems.items():
+                new_id = None if contest is None else (name, contest.startTimeSeconds)
+                if new_id != problem_id:
+                    self._unlink(problem_id, contest_id)
+                    self._link(new_id, contest_id)
+                    contest_problems[index] = (name, new_id)
+                    changed += 1
+        if changed:
+            self.logger.info(f'{changed} problems reindexed after contest list refresh')
+        return changed
+
+    def _link(self, problem_id, contest_id):
+        if problem_id is not None:
+            self.problem_to_contests[problem_id].append(contest_id)
+
+    def _unlink(self, problem_id, contest_id):
+        if problem_id is None:
+            return
+        contest_ids = self.problem_to_contests[problem_id]
+        contest_ids.remove(contest_id)
+        if not contest_ids:
+            del self.problem_to_contests[problem_id]
+
+    def _index_problems(self, problems):
+        contest_by_id = self.cache_master.contest_cache.contest_by_id
+        for problem in problems:
+            contest = contest_by_id.get(problem.contestId)
+            problem_id = None if contest is None else (problem.name, contest.startTimeSeconds)
+            entry = (problem.name, problem_id)
+            contest_problems = self._problems_by_contest[problem.contestId]
+            old_entry = contest_problems.get(problem.index)
+            if old_entry == entry:
+                # Already indexed, the problem is only being updated.
+                continue
+            if old_entry is not None:
+                self._unlink(old_entry[1], problem.contestId)
+            self._link(entry[1], problem.contestId)
+            contest_problems[problem.index] = entry
+
+    def _forget_contests(self, contest_ids):
+        for contest_id in contest_ids:
+            for _, problem_id in self._problems_by_contest.pop(contest_id, {}).values():
+                self._unlink(problem_id, contest_id)
+        self._record_generations()
+        if contest_ids:
+            self.cache_master.schedule_snapshot('problem2')
+
     def _update_from_disk(self):
-        self.problems = self.cache_master.conn.fetch_problems2()
         self.problem_to_contests = defaultdict(list)
-        for problem in self.problems:
-            try:
-                contest = cf_common.cache2.contest_cache.get_contest(problem.contestId)
-                problem_id = (problem.name, contest.startTimeSeconds)
-                self.problem_to_contests[problem_id].append(contest.id)
-            except ContestNotFound:
-                pass
+        self._problems_by_contest = defaultdict(dict)
+        self._index_problems(self.cache_master.conn.fetch_problems2())
+        self._record_generations()
+        self.logger.info(f'Problemsets of {len(self._problems_by_contest)} contests indexed')
+
+    def _record_generations(self):
+        self._generations = {'problem2': self.cache_master.conn.get_generation('problem2'),
+                             'contest': self.cache_master.contest_cache._generation}
+
+    def _get_snapshot(self):
+        return self._generations, (self.problem_to_contests, self._problems_by_contest)
+
+
+class RatingDistribution:
+    """Columnar snapshot of the latest rating, number of rated contests and last rating update
+    time of every handle in the rating changes cache. Histograms are cached per
+    (binsize, min_contests, active_since) and the snapshot is rebuilt whenever new rating
+    changes are saved.
+    """
+    _ACTIVITY_GRANULARITY = 24 * 60 * 60
+
+    def __init__(self, handle_stats=()):
+        ratings, num_contests, last_update = [], [], []
+        for rating, contests, update_time in handle_stats:
+            ratings.append(rating)
+            num_contests.append(contests)
+            last_update.append(update_time)
+        self.ratings = np.array(ratings, dtype=np.int64)
+        self.num_contests = np.array(num_contests, dtype=np.int64)
+        self.last_update = np.array(last_update, dtype=np.int64)
+        self.sorted_ratings = np.sort(self.ratings)
+        self._histograms = {}
+
+    def __len__(self):
+        return len(self.sorted_ratings)
+
+    def centile(self, rating):
+        """Percentage of handles rated strictly below `rating`."""
+        return 100 * np.searchsorted(self.sorted_ratings, rating, side='left') / len(self)
+
+    def histogram(self, binsize, *, min_contests=0, active_since=0):
+        """Returns (counts, cumulative) arrays over bins of `binsize` starting at rating 0 for
+        handles with at least `min_contests` rated contests and a rating update at or after
+        `active_since`. Negative ratings are ignored. `active_since` is rounded down to a day so
+        that repeated queries hit the cache.
+        """
+        active_since -= active_since % self._ACTIVITY_GRANULARITY
+        key = binsize, min_contests, active_since
+        if key not in self._histograms:
+            mask = ((self.num_contests >= min_contests) & (self.last_update >= active_since) &
+                    (self.ratings >= 0))
+            counts = np.bincount(self.ratings[mask] // binsize)
+            self._histograms[key] = counts, np.cumsum(counts)
+        return self._histograms[key]
+
+
+class RatingHistory:
+    """Point-in-time rating index over the rating changes cache. The rating update times and new
+    ratings of all handles are stored as arrays sorted by handle id and time, with the offsets of
+    the rows of each handle id, so the rating of a handle at any time is a binary search.
+    """
+
+    def __init__(self, handle_ids=(), times=(), ratings=()):
+        """`handle_ids` are ids in handle_registry. Changes of a handle with equal times keep their
+        order."""
+        handle_ids = np.asarray(handle_ids, dtype=np.int64)
+        order = np.lexsort((np.asarray(times, dtype=np.int64), handle_ids))
+        self._times = np.asarray(times, dtype=np.int64)[order]
+        self._ratings = np.asarray(ratings, dtype=np.int64)[order]
+        self._offsets = np.concatenate(([0], np.cumsum(np.bincount(handle_ids))))
+
+    def rating_at(self, handle, timestamp, default=None):
+        """Rating of `handle` after its last rating update strictly before `timestamp`."""
+        handle_id = handle_registry.get_id(handle)
+        if handle_id is None or handle_id + 1 >= len(self._offsets):
+            return default
+        lo, hi = self._offsets[handle_id], self._offsets[handle_id + 1]
+        ix = np.searchsorted(self._times[lo:hi], timestamp)
+        return int(self._ratings[lo + ix - 1]) if ix else default
+
+    # Handle ids are only valid within a process, pickle the handles instead.
+    def __getstate__(self):
+        counts = np.diff(self._offsets)
+        handle_ids = np.flatnonzero(counts)
+        return {'handles': [handle_registry.handle(handle_id) for handle_id in handle_ids.tolist()],
+                'counts': counts[handle_ids],
+                'times': self._times,
+                'ratings': self._ratings}
+
+    def __setstate__(self, state):
+        handle_ids = [handle_registry.intern(handle) for handle in state['handles']]
+        self.__init__(np.repeat(handle_ids, state['counts']), state['times'], state['ratings'])
+
+    def ratings_at(self, handles, timestamp, default=None):
+        return {handle: self.rating_at(handle, timestamp, default) for handle in handles}
 
 
 class RatingChangesCache:
@@ -386,11 +689,23 @@ class RatingChangesCache:
     def __init__(self, cache_master):
         self.cache_master = cache_master
         self.monitored_contests = []
+        # handle id in handle_registry -> current rating
         self.handle_rating_cache = {}
+        self.rating_distribution = RatingDistribution()
+        self.rating_history = RatingHistory()
+        self._generation = None
         self.logger = logging.getLogger(self.__class__.__name__)
 
-    async def run(self):
-        self._refresh_handle_cache()
+    async def run(self, snapshot=None):
+        if snapshot is None:
+            self._refresh_handle_cache()
+        else:
+            ratings, self.rating_history, self.rating_distribution = snapshot
+            self.handle_rating_cache = {handle_registry.intern(handle): rating
+                                        for handle, rating in ratings.items()}
+            self._generation = self.cache_master.conn.get_generation('rating_change')
+            self.logger.info(f'Ratings for {len(self.handle_rating_cache)} handles loaded from '
+                             'snapshot')
         if not self.handle_rating_cache:
             self.logger.warning('Rating changes cache on disk is empty. This must be populated '
                                 'manually before use.')
@@ -498,15 +813,36 @@ class RatingChangesCache:
         rc = self.cache_master.conn.save_rating_changes(flattened)
         self.logger.info(f'Saved {rc} changes to database.')
         self._refresh_handle_cache()
+        self.cache_master.schedule_snapshot('rating_change')
 
     def _refresh_handle_cache(self):
+        self._generation = self.cache_master.conn.get_generation('rating_change')
         changes = self.cache_master.conn.get_all_rating_changes()
         handle_rating_cache = {}
+        num_contests = defaultdict(int)
+        last_update = {}
+        handle_ids, times, ratings = [], [], []
         for change in changes:
-            handle_rating_cache[change.handle] = change.newRating
+            handle_id = handle_registry.intern(change.handle)
+            handle_rating_cache[handle_id] = change.newRating
+            handle_ids.append(handle_id)
+            times.append(change.ratingUpdateTimeSeconds)
+            ratings.append(change.newRating)
+            num_contests[handle_id] += 1
+            last_update[handle_id] = change.ratingUpdateTimeSeconds
         self.handle_rating_cache = handle_rating_cache
+        self.rating_history = RatingHistory(handle_ids, times, ratings)
+        self.rating_distribution = RatingDistribution(
+            (rating, num_contests[handle_id], last_update[handle_id])
+            for handle_id, rating in handle_rating_cache.items())
         self.logger.info(f'Ratings for {len(handle_rating_cache)} handles cached')
 
+    def _get_snapshot(self):
+        ratings = {handle_registry.handle(handle_id): rating
+                   for handle_id, rating in self.handle_rating_cache.items()}
+        return ({'rating_change': self._generation},
+                (ratings, self.rating_history, self.rating_distribution))
+
     def get_users_with_more_than_n_contests(self, time_cutoff, n):
         return self.cache_master.conn.get_users_with_more_than_n_contests(time_cutoff, n)
 
@@ -520,12 +856,13 @@ class RatingChangesCache:
         return self.cache_master.conn.get_rating_changes_for_handle(handle)
 
     def get_current_rating(self, handle, default_if_absent=False):
-        return self.handle_rating_cache.get(handle,
+        return self.handle_rating_cache.get(handle_registry.get_id(handle),
                                             cf.DEFAULT_RATING if default_if_absent else None)
 
-    async def get_all_ratings_before_timestamp(self, timestamp):
-        res = self.cache_master.conn.get_all_ratings_before_timestamp(timestamp)
-        return {ratingchange.handle: ratingchange for ratingchange in res}
+    def get_ratings_at(self, handles, timestamp, default=None):
+        """Returns a dict mapping each handle to its rating just before `timestamp`, or to
+        `default` if it had not been rated by then."""
+        return self.rating_history.ratings_at(handles, timestamp, default)
 
     def get_all_ratings(self):
         return list(self.handle_rating_cache.values())
@@ -656,9 +993,15 @@ class RanklistCache:
             # The contest is not traditionally rated
             ranklist = Ranklist(contest, problems, standings, now, is_rated=False)
         else:
-            current_rating = await CacheSystem.getUsersEffectiveRating(activeOnly=False)
-            current_rating = {row.party.members[0].handle: current_rating.get(row.party.members[0].handle, 1500)
-                              for row in standings_official}
+            handles = [row.party.members[0].handle for row in standings_official]
+            try:
+                current_rating = await CacheSystem.getUsersEffectiveRating(activeOnly=False)
+                current_rating = {handle: current_rating.get(handle, 1500) for handle in handles}
+            except cf.CodeforcesApiError as er:
+                self.logger.warning(f'user.ratedList unavailable, predicting contest {contest_id} '
+                                    f'from cached rating changes. {er!r}')
+                current_rating = self.cache_master.rating_changes_cache.get_ratings_at(
+                    handles, contest.startTimeSeconds, default=1500)
             if 'Educational' in contest.name:
                 # For some reason educational contests return all contestants in ranklist even
                 # when unofficial contestants are not requested.
@@ -731,7 +1074,10 @@ class RanklistCache:
 
 
 class CacheSystem:
-    def __init__(self, conn):
+    # Snapshots are saved this long after an update, so that bursts of updates are saved once.
+    _SNAPSHOT_DELAY = 60
+
+    def __init__(self, conn, snapshot_dir=None):
         self.conn = conn
         self.contest_cache = ContestCache(self)
         self.problem_cache = ProblemCache(self)
@@ -739,12 +1085,59 @@ class CacheSystem:
         self.ranklist_cache = RanklistCache(self)
         self.problemset_cache = ProblemsetCache(self)
 
+        self.snapshot_store = snapshot_dir and cache_snapshot.SnapshotStore(snapshot_dir)
+        # Caches with snapshots, by the table they are built from.
+        self._snapshot_caches = {
+            'contest': self.contest_cache,
+            'problem': self.problem_cache,
+            'rating_change': self.rating_changes_cache,
+            'problem2': self.problemset_cache,
+        }
+        # Tables each snapshot depends on, see _record_generations of the caches.
+        self._snapshot_tables = {
+            'contest': ('contest',),
+            'problem': ('problem', 'contest'),
+            'rating_change': ('rating_change',),
+            'problem2': ('problem2', 'contest'),
+        }
+        self._pending_snapshots = set()
+        # Keep references to the snapshot tasks so that they are not garbage collected.
+        self._snapshot_tasks = set()
+
     async def run(self):
-        await self.rating_changes_cache.run()
+        await self.rating_changes_cache.run(self._load_snapshot('rating_change'))
         await self.ranklist_cache.run()
-        await self.contest_cache.run()
-        await self.problem_cache.run()
-        await self.problemset_cache.run()
+        await self.contest_cache.run(self._load_snapshot('contest'))
+        await self.problem_cache.run(self._load_snapshot('problem'))
+        await self.problemset_cache.run(self._load_snapshot('problem2'))
+
+    def _load_snapshot(self, table):
+        if not self.snapshot_store:
+            return None
+        generations = {name: self.conn.get_generation(name)
+                       for name in self._snapshot_tables[table]}
+        state = self.snapshot_store.load(table, generations)
+        if state is None:
+            self.schedule_snapshot(table)
+        return state
+
+    def schedule_snapshot(self, table):
+        """Schedules saving a snapshot of the cache built from `table`."""
+        if not self.snapshot_store or table in self._pending_snapshots:
+            return
+        self._pending_snapshots.add(table)
+        task = asyncio.create_task(self._save_snapshot(table))
+        self._snapshot_tasks.add(task)
+        task.add_done_callback(self._snapshot_tasks.discard)
+
+    async def _save_snapshot(self, table):
+        await asyncio.sleep(self._SNAPSHOT_DELAY)
+        self._pending_snapshots.discard(table)
+        generations, state = self._snapshot_caches[table]._get_snapshot()
+        try:
+            await self.snapshot_store.save(table, generations, state)
+        except Exception:
+            logger.exception(f'Failed to save snapshot {table}')
 
     @staticmethod
     @cached(ttl=30 * 60)
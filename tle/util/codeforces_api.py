@@ -3,17 +3,19 @@ import logging
 import os
 import time
 import functools
-from collections import namedtuple, deque, defaultdict
+from collections import namedtuple, deque, OrderedDict
 from hashlib import sha512
-from random import randint
+from random import randint, random, uniform
 from urllib.parse import urlencode
 
 import aiohttp
 
 from discord.ext import commands
 from tle.util import codeforces_common as cf_common
+from tle.util import metrics
+from tle.util.handledict import handle_registry
 
-API_BASE_URL = 'https://codeforces.com/api/'
+API_BASE_URL = os.environ.get('CF_API_BASE_URL', 'https://codeforces.com/api/')
 CONTEST_BASE_URL = 'https://codeforces.com/contest/'
 CONTESTS_BASE_URL = 'https://codeforces.com/contests/'
 GYM_BASE_URL = 'https://codeforces.com/gym/'
@@ -21,6 +23,8 @@ PROFILE_BASE_URL = 'https://codeforces.com/profile/'
 ACMSGURU_BASE_URL = 'https://codeforces.com/problemsets/acmsguru/'
 GYM_ID_THRESHOLD = 100000
 DEFAULT_RATING = 800
+# Number of tag query fragments whose masks are cached by TagDictionary.
+_MAX_FRAGMENT_MASKS = 256
 API_KEY = os.environ.get("API_KEY")
 API_SECRET = os.environ.get("API_SECRET")
 
@@ -92,9 +96,14 @@ class Contest(namedtuple('Contest', 'id name startTimeSeconds durationSeconds ty
         return f'{CONTESTS_BASE_URL}{self.id}'
 
     def matches(self, markers):
-        def strfilt(s):
-            return ''.join(x for x in s.lower() if x.isalnum())
-        return any(strfilt(marker) in strfilt(self.name) for marker in markers)
+        name = normalize_contest_name(self.name)
+        return any(normalize_contest_name(marker) in name for marker in markers)
+
+
+@functools.lru_cache(maxsize=8192)
+def normalize_contest_name(s):
+    return ''.join(x for x in s.lower() if x.isalnum())
+
 
 class Party(namedtuple('Party', ('contestId members participantType teamId teamName ghost room '
                                  'startTimeSeconds'))):
@@ -105,7 +114,14 @@ class Party(namedtuple('Party', ('contestId members participantType teamId teamN
 Member = namedtuple('Member', 'handle')
 
 
-class Problem(namedtuple('Problem', 'contestId problemsetName index name type points rating tags')):
+class Problem(namedtuple('Problem', 'contestId problemsetName index name type points rating tags '
+                                     'div_tags contest_start nonstandard',
+                         defaults=((), None, None))):
+    """A problem. `tags` is a tuple. For problems held by the caches, `tags` includes the
+    division tags of the contest and the fields derived from the contest (`div_tags`,
+    `contest_start` and `nonstandard`) are filled in. They are left at their defaults for
+    problems straight from the API.
+    """
     __slots__ = ()
 
     @property
@@ -123,29 +139,78 @@ class Problem(namedtuple('Problem', 'contestId problemsetName index name type po
     def has_metadata(self):
         return self.contestId is not None and self.rating is not None
 
-    def _matching_tags_dict(self, match_tags):
-        """Returns a dict with matching tags."""
-        tags = defaultdict(list)
-        for match_tag in match_tags:
-            for tag in self.tags:
-                if match_tag in tag:
-                    tags[match_tag].append(tag)
-        return dict(tags)
+    @property
+    def tag_mask(self):
+        return tag_dictionary.mask_of(self.tags)
 
     def matches_all_tags(self, match_tags):
-        match_tags = set(match_tags)
-        return len(self._matching_tags_dict(match_tags)) == len(match_tags)
+        return tag_dictionary.mask_matches_all(self.tag_mask, match_tags)
 
     def matches_any_tag(self, match_tags):
-        match_tags = set(match_tags)
-        return len(self._matching_tags_dict(match_tags)) > 0
+        return tag_dictionary.mask_matches_any(self.tag_mask, match_tags)
 
     def get_matched_tags(self, match_tags):
         return [
-            tag for tags in self._matching_tags_dict(match_tags).values()
-            for tag in tags
+            tag for match_tag in dict.fromkeys(match_tags)
+            for tag in self.tags if match_tag in tag
         ]
 
+
+class TagDictionary:
+    """Interns problem tags to small integer ids so that a set of tags is a bitmask and a tag
+    query fragment, which matches every tag containing it as a substring, is a bitmask too.
+    Fragments come from user input, so only the most recently used fragment masks are kept.
+    """
+
+    def __init__(self, max_fragments=_MAX_FRAGMENT_MASKS):
+        self._tag_to_id = {}
+        self.max_fragments = max_fragments
+        self._fragment_masks = OrderedDict()
+        self._masks_by_tags = {}
+
+    def intern(self, tag):
+        tag_id = self._tag_to_id.get(tag)
+        if tag_id is None:
+            tag_id = len(self._tag_to_id)
+            self._tag_to_id[tag] = tag_id
+            # New tags are rare, recompute the fragment masks on demand.
+            self._fragment_masks.clear()
+        return tag_id
+
+    def mask_of(self, tags):
+        key = tuple(tags)
+        mask = self._masks_by_tags.get(key)
+        if mask is None:
+            mask = 0
+            for tag in key:
+                mask |= 1 << self.intern(tag)
+            self._masks_by_tags[key] = mask
+        return mask
+
+    def fragment_mask(self, fragment):
+        try:
+            self._fragment_masks.move_to_end(fragment)
+            return self._fragment_masks[fragment]
+        except KeyError:
+            pass
+        mask = 0
+        for tag, tag_id in self._tag_to_id.items():
+            if fragment in tag:
+                mask |= 1 << tag_id
+        self._fragment_masks[fragment] = mask
+        if len(self._fragment_masks) > self.max_fragments:
+            self._fragment_masks.popitem(last=False)
+        return mask
+
+    def mask_matches_all(self, mask, match_tags):
+        return all(mask & self.fragment_mask(match_tag) for match_tag in match_tags)
+
+    def mask_matches_any(self, mask, match_tags):
+        return any(mask & self.fragment_mask(match_tag) for match_tag in match_tags)
+
+
+tag_dictionary = TagDictionary()
+
 ProblemStatistics = namedtuple('ProblemStatistics', 'contestId index solvedCount')
 
 Submission = namedtuple('Submissions',
@@ -162,6 +227,13 @@ def make_from_dict(namedtuple_cls, dict_):
     return namedtuple_cls._make(field_vals)
 
 
+def _make_problem(problem_dict):
+    return Problem(problem_dict.get('contestId'), problem_dict.get('problemsetName'),
+                   problem_dict.get('index'), problem_dict.get('name'), problem_dict.get('type'),
+                   problem_dict.get('points'), problem_dict.get('rating'),
+                   tuple(problem_dict.get('tags', ())))
+
+
 # Error classes
 
 class CodeforcesApiError(commands.CommandError):
@@ -214,11 +286,67 @@ class RatingChangesUnavailableError(TrueApiError):
 
 _session = None
 
+# Archive of API responses, see `use_archive`.
+_archive = None
+_archive_replay = False
+_replay_latency = 0
+_replay_jitter = 0
+_replay_limit_error_rate = 0
+_replay_ratelimit = False
+
 
 async def initialize():
     global _session
     _session = aiohttp.ClientSession()
 
+    archive_path = os.environ.get('CF_API_ARCHIVE')
+    if archive_path:
+        from tle.util.db.api_archive_conn import ApiArchiveConn
+        mode = os.environ.get('CF_API_ARCHIVE_MODE', 'replay')
+        if mode not in ('record', 'replay'):
+            raise ValueError(f'CF_API_ARCHIVE_MODE should be record or replay, got {mode}')
+        use_archive(ApiArchiveConn(archive_path),
+                    replay=mode == 'replay',
+                    latency=float(os.environ.get('CF_API_REPLAY_LATENCY', '0')),
+                    jitter=float(os.environ.get('CF_API_REPLAY_JITTER', '0')),
+                    limit_error_rate=float(os.environ.get('CF_API_REPLAY_LIMIT_ERROR_RATE', '0')),
+                    ratelimit=os.environ.get('CF_API_REPLAY_RATELIMIT') == '1')
+
+
+def use_archive(archive, *, replay, latency=0, jitter=0, limit_error_rate=0, ratelimit=False):
+    """Records every API response to `archive`, or if `replay` is set serves API queries from
+    `archive` without touching the network. Replayed queries take `latency` +- `jitter` seconds
+    and fail with a call limit error with probability `limit_error_rate`. They skip the wait for
+    a `cf_ratelimit` slot unless `ratelimit` is set. Pass None to go back to plain API queries.
+    """
+    global _archive, _archive_replay, _replay_latency, _replay_jitter, _replay_limit_error_rate
+    global _replay_ratelimit
+    _archive = archive
+    _archive_replay = archive is not None and replay
+    _replay_latency = latency
+    _replay_jitter = jitter
+    _replay_limit_error_rate = limit_error_rate
+    _replay_ratelimit = ratelimit
+    if archive is not None:
+        logger.info(f'{"Replaying" if replay else "Recording"} CF API queries using an archive '
+                    f'of {archive.count()} responses')
+
+
+async def _replay_query(path, data):
+    with metrics.api_seconds.time(endpoint=path, status='replay'):
+        delay = max(0, _replay_latency + uniform(-_replay_jitter, _replay_jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        if random() < _replay_limit_error_rate:
+            raise CallLimitExceededError('Call limit exceeded (replayed)')
+        archived = _archive.lookup(path, data)
+    if archived is None:
+        raise TrueApiError(f'Query {path} with {data} is missing from the API archive')
+    ok, payload = archived
+    if not ok:
+        raise TrueApiError(payload)
+    return payload
+
 
 def _bool_to_str(value):
     if type(value) is bool:
@@ -234,17 +362,20 @@ def cf_ratelimit(f):
     @functools.wraps(f)
     async def wrapped(*args, **kwargs):
         for i in range(tries):
-            now = time.time()
+            # Replayed queries do not reach Codeforces, so they are only limited if asked to.
+            if not _archive_replay or _replay_ratelimit:
+                now = time.time()
 
-            # Next valid slot is 1s after the `per_second`th last request
-            next_valid = max(now, 1 + last[0])
-            last.append(next_valid)
-            last.popleft()
+                # Next valid slot is 1s after the `per_second`th last request
+                next_valid = max(now, 1 + last[0])
+                last.append(next_valid)
+                last.popleft()
 
-            # Delay as needed
-            delay = next_valid - now
-            if delay > 0:
-                await asyncio.sleep(delay)
+                # Delay as needed
+                delay = next_valid - now
+                metrics.api_ratelimit_wait_seconds.observe(max(delay, 0))
+                if delay > 0:
+                    await asyncio.sleep(delay)
 
             try:
                 return await f(*args, **kwargs)
@@ -261,6 +392,9 @@ def cf_ratelimit(f):
 
 @cf_ratelimit
 async def _query_api(path, data=None, *, public=True):
+    if _archive_replay:
+        return await _replay_query(path, data)
+
     url = API_BASE_URL + path
     if not public:
         if data is None:
@@ -272,25 +406,35 @@ async def _query_api(path, data=None, *, public=True):
         encoded = urlencode([(k, data[k]) for k in sorted(data.keys())])
         url +=  "?apiSig=" + rand + sha512(f"{rand}/{path}?{encoded}#{API_SECRET}".encode()).hexdigest()
 
+    begin = time.perf_counter()
+    status = 'client_error'
     try:
         logger.info(f'Querying CF API at {url} with {data}')
         # Explicitly state encoding (though aiohttp accepts gzip by default)
         headers = {'Accept-Encoding': 'gzip'}
         async with _session.post(url, data=data, headers=headers) as resp:
+            status = resp.status
             try:
                 respjson = await resp.json()
             except aiohttp.ContentTypeError:
                 logger.warning(f'CF API did not respond with JSON, status {resp.status}.')
                 raise CodeforcesApiError
+            metrics.api_response_bytes.inc(len(await resp.read()), endpoint=path)
             if resp.status == 200:
+                if _archive is not None:
+                    _archive.save_result(path, data, respjson['result'], time.time())
                 return respjson['result']
             comment = f'HTTP Error {resp.status}, {respjson.get("comment")}'
     except aiohttp.ClientError as e:
         logger.error(f'Request to CF API encountered error: {e!r}')
         raise ClientError from e
+    finally:
+        metrics.api_seconds.observe(time.perf_counter() - begin, endpoint=path, status=status)
     logger.warning(f'Query to CF API failed: {comment}')
     if 'limit exceeded' in comment:
         raise CallLimitExceededError(comment)
+    if _archive is not None:
+        _archive.save_failure(path, data, comment, time.time())
     raise TrueApiError(comment)
 
 
@@ -341,7 +485,7 @@ class contest:
                 raise ContestNotFoundError(e.comment, contest_id)
             raise
         contest_ = make_from_dict(Contest, resp['contest'])
-        problems = [make_from_dict(Problem, problem_dict) for problem_dict in resp['problems']]
+        problems = [_make_problem(problem_dict) for problem_dict in resp['problems']]
         for row in resp['rows']:
             row['party']['members'] = [make_from_dict(Member, member)
                                        for member in row['party']['members']]
@@ -361,7 +505,7 @@ class problemset:
         if problemset_name is not None:
             params['problemsetName'] = problemset_name
         resp = await _query_api('problemset.problems', params)
-        problems = [make_from_dict(Problem, problem_dict) for problem_dict in resp['problems']]
+        problems = [_make_problem(problem_dict) for problem_dict in resp['problems']]
         problemstats = [make_from_dict(ProblemStatistics, problemstat_dict) for problemstat_dict in
                         resp['problemStatistics']]
         return problems, problemstats
@@ -463,36 +607,99 @@ class user:
                 raise HandleInvalidError(e.comment, handle)
             raise
         for submission in resp:
-            submission['problem'] = make_from_dict(Problem, submission['problem'])
+            submission['problem'] = _make_problem(submission['problem'])
             submission['author']['members'] = [make_from_dict(Member, member)
                                                for member in submission['author']['members']]
             submission['author'] = make_from_dict(Party, submission['author'])
         return [make_from_dict(Submission, submission_dict) for submission_dict in resp]
 
 
-async def _needs_fixing(handles):
-    to_fix = []
-    chunks = user_info_chunkify(handles)
-    for handle_chunk in chunks:
+async def iter_for_handles(fetch, handles, **kwargs):
+    """Runs `fetch(handle=handle, **kwargs)` concurrently for all handles and yields
+    (handle, result) pairs as they complete. Requests are still spaced out by the shared
+    `cf_ratelimit` slots, but their round trips overlap. Pending requests are cancelled if the
+    consumer stops early or a request fails.
+    """
+    async def fetch_one(handle):
+        return handle, await fetch(handle=handle, **kwargs)
+
+    pending = [asyncio.ensure_future(fetch_one(handle)) for handle in dict.fromkeys(handles)]
+    try:
+        for next_done in asyncio.as_completed(pending):
+            yield await next_done
+    finally:
+        for task in pending:
+            task.cancel()
+        # Wait for the cancelled tasks to finish and retrieve their exceptions, so none is left
+        # running or logged as never retrieved. The cf_ratelimit slots they reserved when they
+        # started are not given back, later requests still wait for them.
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def fetch_for_handles(fetch, handles, **kwargs):
+    """Like `iter_for_handles` but returns the list of results in the order of `handles`."""
+    results = {}
+    async for handle, result in iter_for_handles(fetch, handles, **kwargs):
+        results[handle] = result
+    return [results[handle] for handle in handles]
+
+
+# Profile pages are not part of the API but are rate limited by CF as well
+_PROFILE_REQUESTS_PER_SECOND = 4
+_profile_request_slots = deque([0] * _PROFILE_REQUESTS_PER_SECOND)
+
+
+async def _wait_for_profile_slot():
+    # Slots are reserved synchronously so concurrent probes stay spaced out
+    now = time.time()
+    next_valid = max(now, 1 + _profile_request_slots[0])
+    _profile_request_slots.append(next_valid)
+    _profile_request_slots.popleft()
+    delay = next_valid - now
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+async def fetch_users_by_handle(handles):
+    """Returns a dict mapping each handle to its `User`, or to None if CF does not know the
+    handle. Handles are queried in as few `user.info` calls as possible, a missing handle is
+    dropped from its chunk and the rest of the chunk is retried.
+    """
+    async def fetch_chunk(handle_chunk):
+        users = {}
         while handle_chunk:
             try:
                 cf_users = await user.info(handles=handle_chunk)
-
-                # Users could still have changed capitalization
-                for handle, cf_user in zip(handle_chunk, cf_users):
-                    assert handle.lower() == cf_user.handle.lower()
-                    if handle != cf_user.handle:
-                        to_fix.append(handle)
-                break
             except HandleNotFoundError as e:
-                to_fix.append(e.handle)
-                handle_chunk.remove(e.handle)
-            time.sleep(1)
-    return to_fix
+                missing = [handle for handle in handle_chunk if handle.lower() == e.handle.lower()]
+                if not missing:
+                    raise
+                for handle in missing:
+                    users[handle] = None
+                    handle_chunk.remove(handle)
+                continue
+            users.update(zip(handle_chunk, cf_users))
+            break
+        return users
+
+    chunk_results = await asyncio.gather(*(fetch_chunk(chunk)
+                                           for chunk in user_info_chunkify(dict.fromkeys(handles))))
+    return {handle: cf_user for users in chunk_results for handle, cf_user in users.items()}
+
+
+async def _needs_fixing(handles):
+    users = await fetch_users_by_handle(handles)
+    for cf_user in users.values():
+        if cf_user is not None:
+            handle_registry.set_canonical(cf_user.handle)
+    # Users could still have changed capitalization
+    return [handle for handle, cf_user in users.items()
+            if cf_user is None or cf_user.handle != handle]
 
 
 async def _resolve_redirect(handle):
     url = PROFILE_BASE_URL + handle
+    await _wait_for_profile_slot()
     async with _session.head(url) as r:
         if r.status == 200:
             return handle
@@ -506,21 +713,33 @@ async def _resolve_redirect(handle):
             f'Something went wrong trying to redirect {url}')
 
 
-async def _resolve_handle_mapping(handles_to_fix):
-    redirections = {}
-    failed = []
-    for handle in handles_to_fix:
-        new_handle = await _resolve_redirect(handle)
-        if not new_handle:
-            redirections[handle] = None
-        else:
-            cf_user, = await user.info(handles=[new_handle])
-            redirections[handle] = cf_user
-        time.sleep(1)
-    return redirections
-
-
-async def resolve_redirects(handles):
+async def _resolve_handle_mapping(handles_to_fix, progress=None):
+    async def probe(handle):
+        try:
+            return handle, await _resolve_redirect(handle)
+        except (aiohttp.ClientError, CodeforcesApiError) as e:
+            logger.warning(f'Could not resolve redirect for {handle}: {e!r}')
+            return handle, None
+
+    new_handles = {}
+    for next_done in asyncio.as_completed([probe(handle) for handle in handles_to_fix]):
+        handle, new_handle = await next_done
+        new_handles[handle] = new_handle
+        if progress is not None:
+            await progress(len(new_handles), len(handles_to_fix))
+
+    # Verify all resolved handles in batched user.info calls
+    resolved = [new_handle for new_handle in new_handles.values() if new_handle]
+    users = await fetch_users_by_handle(resolved) if resolved else {}
+    return {handle: users.get(new_handle) if new_handle else None
+            for handle, new_handle in new_handles.items()}
+
+
+async def resolve_redirects(handles, *, progress=None):
+    """Returns a dict mapping each handle in `handles` that is no longer current to the `User` it
+    now redirects to, or to None if it could not be resolved. If given, the coroutine
+    `progress(done, total)` is awaited after each redirect probe completes.
+    """
     handles_to_fix = await _needs_fixing(handles)
-    handle_mapping = await _resolve_handle_mapping(handles_to_fix)
+    handle_mapping = await _resolve_handle_mapping(handles_to_fix, progress)
     return handle_mapping
@@ -4,8 +4,9 @@ import logging
 import math
 import time
 import datetime
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 import itertools
+import numpy as np
 from discord.ext import commands
 import discord
 
@@ -14,6 +15,7 @@ from tle.util import cache_system2
 from tle.util import codeforces_api as cf
 from tle.util import db
 from tle.util import events
+from tle.util.handledict import handle_registry
 
 logger = logging.getLogger(__name__)
 
@@ -53,13 +55,14 @@ async def initialize(nodb):
         user_db = db.UserDbConn(constants.USER_DB_FILE_PATH)
 
     cache_db = db.CacheDbConn(constants.CACHE_DB_FILE_PATH)
-    cache2 = cache_system2.CacheSystem(cache_db)
+    cache2 = cache_system2.CacheSystem(cache_db, constants.CACHE_SNAPSHOT_DIR)
     await cache2.run()
 
     try:
         with open(constants.CONTEST_WRITERS_JSON_FILE_PATH) as f:
             data = json.load(f)
-        _contest_id_to_writers_map = {contest['id']: [s.lower() for s in contest['writers']] for contest in data}
+        _contest_id_to_writers_map = {contest['id']: frozenset(map(handle_registry.intern, contest['writers']))
+                                      for contest in data}
         logger.info('Contest writers loaded from JSON file')
     except FileNotFoundError:
         logger.warning('JSON file containing contest writers not found')
@@ -95,7 +98,7 @@ def is_contest_writer(contest_id, handle):
     if _contest_id_to_writers_map is None:
         return False
     writers = _contest_id_to_writers_map.get(contest_id)
-    return writers and handle.lower() in writers
+    return writers and handle_registry.get_id(handle) in writers
 
 
 _NONSTANDARD_CONTEST_INDICATORS = [
@@ -104,9 +107,11 @@ _NONSTANDARD_CONTEST_INDICATORS = [
 
 
 def is_nonstandard_contest(contest):
-    return any(string in contest.name.lower() for string in _NONSTANDARD_CONTEST_INDICATORS)
+    return cache2.contest_cache.get_contest_attributes(contest).nonstandard
 
 def is_nonstandard_problem(problem):
+    if problem.nonstandard is not None:
+        return problem.nonstandard
     return (is_nonstandard_contest(cache2.contest_cache.get_contest(problem.contestId)) or
             problem.matches_all_tags(['*special']))
 
@@ -115,19 +120,19 @@ async def get_visited_contests(handles : [str]):
     """ Returns a set of contest ids of contests that any of the given handles
         has at least one non-CE submission.
     """
-    user_submissions = [await cf.user.status(handle=handle) for handle in handles]
     problem_to_contests = cache2.problemset_cache.problem_to_contests
 
     contest_ids = []
-    for sub in itertools.chain.from_iterable(user_submissions):
-        if sub.verdict == 'COMPILATION_ERROR':
-            continue
-        try:
-            contest = cache2.contest_cache.get_contest(sub.problem.contestId)
-            problem_id = (sub.problem.name, contest.startTimeSeconds)
-            contest_ids += problem_to_contests[problem_id]
-        except cache_system2.ContestNotFound:
-            pass
+    async for _, submissions in cf.iter_for_handles(cf.user.status, handles):
+        for sub in submissions:
+            if sub.verdict == 'COMPILATION_ERROR':
+                continue
+            try:
+                contest = cache2.contest_cache.get_contest(sub.problem.contestId)
+                problem_id = (sub.problem.name, contest.startTimeSeconds)
+                contest_ids += problem_to_contests[problem_id]
+            except cache_system2.ContestNotFound:
+                pass
     return set(contest_ids)
 
 # These are special rated-for-all contests which have a combined ranklist for onsite and online
@@ -141,7 +146,25 @@ _RATED_FOR_ONSITE_CONTEST_IDS = [
 
 
 def is_rated_for_onsite_contest(contest):
-    return contest.id in _RATED_FOR_ONSITE_CONTEST_IDS
+    return cache2.contest_cache.get_contest_attributes(contest).rated_for_onsite
+
+
+class ContestAttributes(namedtuple('ContestAttributes', ('normalized_name div_tags nonstandard '
+                                                         'educational rated_for_onsite'))):
+    __slots__ = ()
+
+
+def classify_contest(contest):
+    """Computes the name-derived attributes of a contest. Meant to be run once per contest when
+    the contest cache is loaded, see `ContestCache.get_contest_attributes`."""
+    name = cf.normalize_contest_name(contest.name)
+    lower_name = contest.name.lower()
+    return ContestAttributes(
+        normalized_name=name,
+        div_tags=tuple(tag for tag in cache_system2._DIV_TAGS if tag in name),
+        nonstandard=any(string in lower_name for string in _NONSTANDARD_CONTEST_INDICATORS),
+        educational='educational' in name,
+        rated_for_onsite=contest.id in _RATED_FOR_ONSITE_CONTEST_IDS)
 
 
 class ResolveHandleError(commands.CommandError):
@@ -259,12 +282,10 @@ async def resolve_handles(ctx, converter, handles, *, mincnt=1, maxcnt=5, defaul
     return resolved_handles
 
 def members_to_handles(members: [discord.Member], guild_id):
-    handles = []
-    for member in members:
-        handle = user_db.get_handle(member.id, guild_id)
+    handles = user_db.get_handles([member.id for member in members], guild_id)
+    for member, handle in zip(members, handles):
         if handle is None:
             raise HandleNotRegisteredError(member)
-        handles.append(handle)
     return handles
 
 def filter_flags(args, params):
@@ -376,46 +397,115 @@ class SubFilter:
         accepted submission is kept. The unique id for a problem is (problem name, contest start time).
         """
         submissions.sort(key=lambda sub: sub.creationTimeSeconds)
-        problems = set()
-        solved_subs = []
-
-        for submission in submissions:
-            problem = submission.problem
-            contest = cache2.contest_cache.contest_by_id.get(problem.contestId, None)
-            if submission.verdict == 'OK':
-                # Assume (name, contest start time) is a unique identifier for problems
-                problem_key = (problem.name, contest.startTimeSeconds if contest else 0)
-                if problem_key not in problems:
-                    solved_subs.append(submission)
-                    problems.add(problem_key)
-        return solved_subs
+        columns = SubmissionColumns(submissions)
+        return columns.select(columns.first_solve)
 
     def filter_subs(self, submissions):
-        submissions = SubFilter.filter_solved(submissions)
-        filtered_subs = []
-        for submission in submissions:
-            problem = submission.problem
-            contest = cache2.contest_cache.contest_by_id.get(problem.contestId, None)
-            type_ok = submission.author.participantType in self.types
-            date_ok = self.dlo <= submission.creationTimeSeconds < self.dhi
-            tag_ok = problem.matches_all_tags(self.tags)
-            bantag_ok = not problem.matches_any_tag(self.bantags)
-            index_ok = not self.indices or any(index.lower() == problem.index.lower() for index in self.indices)
-            contest_ok = not self.contests or (contest and contest.matches(self.contests))
-            team_ok = self.team or len(submission.author.members) == 1
-            if self.rated:
-                problem_ok = contest and contest.id < cf.GYM_ID_THRESHOLD and not is_nonstandard_problem(problem)
-                rating_ok = problem.rating and self.rlo <= problem.rating <= self.rhi
-            else:
-                # acmsguru and gym allowed
-                problem_ok = (not contest or contest.id >= cf.GYM_ID_THRESHOLD
-                              or not is_nonstandard_problem(problem))
-                rating_ok = True
-            if type_ok and date_ok and rating_ok and tag_ok and bantag_ok and team_ok and problem_ok and contest_ok and index_ok:
-                filtered_subs.append(submission)
-        return filtered_subs
+        submissions.sort(key=lambda sub: sub.creationTimeSeconds)
+        columns = SubmissionColumns(submissions)
+        return columns.select(self.compile_mask(columns))
+
+    def compile_mask(self, columns):
+        """Returns a boolean array over `columns` selecting the submissions that pass the filter."""
+        mask = columns.first_solve.copy()
+
+        # Types unknown to the API wrapper match no submissions.
+        type_codes = [code for code in map(columns.participant_type_codes.get, self.types)
+                      if code is not None]
+        mask &= np.isin(columns.participant_type, type_codes)
+        mask &= (self.dlo <= columns.time) & (columns.time < self.dhi)
+        if not self.team:
+            mask &= columns.team_size == 1
+
+        if self.tags or self.bantags:
+            tag_ok = [cf.tag_dictionary.mask_matches_all(tag_mask, self.tags) and
+                      not cf.tag_dictionary.mask_matches_any(tag_mask, self.bantags)
+                      for tag_mask in columns.distinct_tag_masks]
+            mask &= np.array(tag_ok, dtype=bool)[columns.tag_key]
+        if self.indices:
+            indices = {index.lower() for index in self.indices}
+            index_ok = [index.lower() in indices for index in columns.distinct_indices]
+            mask &= np.array(index_ok, dtype=bool)[columns.index_key]
+        if self.contests:
+            contest_ids = list(cache2.contest_cache.get_contest_ids_matching(self.contests))
+            mask &= np.isin(columns.contest_id, contest_ids)
+
+        known_contest = columns.contest_id >= 0
+        not_gym = columns.contest_id < cf.GYM_ID_THRESHOLD
+        if self.rated:
+            mask &= known_contest & not_gym & ~columns.nonstandard
+            mask &= (columns.rating > 0) & (self.rlo <= columns.rating) & (columns.rating <= self.rhi)
+        else:
+            # acmsguru and gym allowed
+            mask &= ~known_contest | ~not_gym | ~columns.nonstandard
+        return mask
 
     def filter_rating_changes(self, rating_changes):
         rating_changes = [change for change in rating_changes
                     if self.dlo <= change.ratingUpdateTimeSeconds < self.dhi]
         return rating_changes
+
+
+class SubmissionColumns:
+    """Columnar view of a list of submissions as parallel NumPy arrays, used by `SubFilter`.
+    Problem tags and indices are stored as keys into lists of their distinct values, so
+    predicates on them are evaluated once per distinct value.
+    """
+    def __init__(self, submissions):
+        self.submissions = submissions
+        self.participant_type_codes = {t: code for code, t in enumerate(cf.Party.PARTICIPANT_TYPES)}
+        contest_cache = cache2.contest_cache
+        count = len(submissions)
+        problems = [sub.problem for sub in submissions]
+
+        # contest id -> (start time, nonstandard) of the contests in the cache.
+        contests = {}
+        for contest_id in {problem.contestId for problem in problems}:
+            contest = contest_cache.contest_by_id.get(contest_id)
+            if contest is not None:
+                contests[contest_id] = (contest.startTimeSeconds,
+                                        contest_cache.get_contest_attributes(contest).nonstandard)
+        no_contest = (0, False)
+
+        def column(values, dtype):
+            return np.fromiter(values, dtype=dtype, count=count)
+
+        type_codes = self.participant_type_codes
+        self.time = column((sub.creationTimeSeconds for sub in submissions), np.int64)
+        ok = column((sub.verdict == 'OK' for sub in submissions), bool)
+        self.participant_type = column((type_codes.get(sub.author.participantType, -1)
+                                        for sub in submissions), np.int8)
+        self.team_size = column((len(sub.author.members) for sub in submissions), np.int32)
+        self.rating = column((problem.rating or 0 for problem in problems), np.int32)
+        self.contest_id = column((problem.contestId if problem.contestId in contests else -1
+                                  for problem in problems), np.int64)
+        nonstandard = column((contests.get(problem.contestId, no_contest)[1]
+                              for problem in problems), bool)
+
+        # Assume (name, contest start time) is a unique identifier for problems
+        problem_keys, tag_keys, index_keys = {}, {}, {}
+        problem_key = column((problem_keys.setdefault(
+                                  (problem.name, contests.get(problem.contestId, no_contest)[0]),
+                                  len(problem_keys))
+                              for problem in problems), np.int64)
+        self.tag_key = column((tag_keys.setdefault(cf.tag_dictionary.mask_of(problem.tags),
+                                                   len(tag_keys))
+                               for problem in problems), np.int64)
+        self.index_key = column((index_keys.setdefault(problem.index, len(index_keys))
+                                 for problem in problems), np.int64)
+        self.distinct_tag_masks = list(tag_keys)
+        self.distinct_indices = list(index_keys)
+
+        # Same as is_nonstandard_problem, for submissions whose contest is known.
+        special = [cf.tag_dictionary.mask_matches_all(tag_mask, ['*special'])
+                   for tag_mask in self.distinct_tag_masks]
+        self.nonstandard = nonstandard | np.array(special, dtype=bool)[self.tag_key]
+
+        # First accepted submission of each problem.
+        ok_positions = np.flatnonzero(ok)
+        _, first = np.unique(problem_key[ok_positions], return_index=True)
+        self.first_solve = np.zeros(len(submissions), dtype=bool)
+        self.first_solve[ok_positions[first]] = True
+
+    def select(self, mask):
+        return [self.submissions[i] for i in np.flatnonzero(mask)]
@@ -1,2 +1,3 @@
 from .cache_db_conn import *
 from .user_db_conn import *
+from .api_archive_conn import *
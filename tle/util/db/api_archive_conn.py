@@ -0,0 +1,69 @@
+import json
+import sqlite3
+import zlib
+
+# Parameters that vary between identical requests and must not be part of the key.
+_VOLATILE_PARAMS = ('apiKey', 'time', 'apiSig')
+
+
+class ApiArchiveConn:
+    """Archive of Codeforces API responses keyed by (endpoint, params). Responses are stored
+    zlib-compressed, failed queries are stored with their comment so that they replay as
+    failures too.
+    """
+
+    def __init__(self, db_file):
+        self.conn = sqlite3.connect(db_file)
+        self.create_tables()
+
+    def create_tables(self):
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS api_response ('
+            'path        TEXT NOT NULL,'
+            'params      TEXT NOT NULL,'
+            'ok          INTEGER NOT NULL,'
+            'body        BLOB,'
+            'saved_at    REAL,'
+            'PRIMARY KEY (path, params)'
+            ')'
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(path, data):
+        params = {key: str(value) for key, value in (data or {}).items()
+                  if key not in _VOLATILE_PARAMS}
+        return path, json.dumps(params, sort_keys=True)
+
+    def save_result(self, path, data, result, saved_at):
+        body = zlib.compress(json.dumps(result).encode())
+        self._save(path, data, True, body, saved_at)
+
+    def save_failure(self, path, data, comment, saved_at):
+        self._save(path, data, False, comment.encode(), saved_at)
+
+    def _save(self, path, data, ok, body, saved_at):
+        query = ('INSERT OR REPLACE INTO api_response (path, params, ok, body, saved_at) '
+                 'VALUES (?, ?, ?, ?, ?)')
+        self.conn.execute(query, (*self.make_key(path, data), ok, body, saved_at))
+        self.conn.commit()
+
+    def lookup(self, path, data):
+        """Returns (True, result) or (False, comment) for an archived query, None if the query
+        was never recorded."""
+        query = ('SELECT ok, body '
+                 'FROM api_response '
+                 'WHERE path = ? AND params = ?')
+        res = self.conn.execute(query, self.make_key(path, data)).fetchone()
+        if res is None:
+            return None
+        ok, body = res
+        if ok:
+            return True, json.loads(zlib.decompress(body))
+        return False, body.decode()
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM api_response').fetchone()[0]
+
+    def close(self):
+        self.conn.close()
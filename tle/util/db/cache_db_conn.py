@@ -1,13 +1,23 @@
 import json
 import sqlite3
+from collections import defaultdict
 
 from tle.util import codeforces_api as cf
+from tle.util import metrics
 
 
+@metrics.instrument_db('cache')
 class CacheDbConn:
+    # Version of the schema, stored as the user_version of the database.
+    _SCHEMA_VERSION = 2
+
     def __init__(self, db_file):
         self.conn = sqlite3.connect(db_file)
+        self._tag_id_by_name = {}
+        self._tag_name_by_id = {}
         self.create_tables()
+        self._load_tags()
+        self._migrate()
 
     def create_tables(self):
         # Table for contests from the contest.list endpoint.
@@ -34,11 +44,28 @@ class CacheDbConn:
             'type             TEXT,'
             'points           REAL,'
             'rating           INTEGER,'
-            'tags             TEXT,'
             'PRIMARY KEY (name)'
             ')'
         )
 
+        # Tags of problems, stored once per distinct tag.
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS tag ('
+            'id             INTEGER NOT NULL,'
+            'name           TEXT NOT NULL UNIQUE,'
+            'PRIMARY KEY (id)'
+            ')'
+        )
+        # Tags of the problems in table problem, in the order given by the API.
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS problem_tag ('
+            'problem_name     TEXT NOT NULL,'
+            'position         INTEGER NOT NULL,'
+            'tag_id           INTEGER NOT NULL,'
+            'PRIMARY KEY (problem_name, position)'
+            ')'
+        )
+
         # Table for rating changes fetched from contest.ratingChanges endpoint for every contest.
         self.conn.execute(
             'CREATE TABLE IF NOT EXISTS rating_change ('
@@ -70,18 +97,113 @@ class CacheDbConn:
             'type             TEXT,'
             'points           REAL,'
             'rating           INTEGER,'
-            'tags             TEXT,'
             'PRIMARY KEY (contest_id, [index])'
             ')'
         )
         self.conn.execute('CREATE INDEX IF NOT EXISTS ix_problem2_contest_id '
                           'ON problem2 (contest_id)')
+        # Tags of the problems in table problem2, in the order given by the API.
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS problem2_tag ('
+            'contest_id       INTEGER NOT NULL,'
+            '[index]          TEXT NOT NULL,'
+            'position         INTEGER NOT NULL,'
+            'tag_id           INTEGER NOT NULL,'
+            'PRIMARY KEY (contest_id, [index], position)'
+            ')'
+        )
+
+        # Counter per table, incremented by every write to the table. Used to check whether
+        # snapshots of in-memory caches are still valid.
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS generation ('
+            'name           TEXT NOT NULL,'
+            'value          INTEGER NOT NULL,'
+            'PRIMARY KEY (name)'
+            ')'
+        )
+
+    def _migrate(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < 1:
+            # Tags used to be stored as a JSON list in a tags column of problem and problem2.
+            # Tables created since then have no such column.
+            for table, key_columns, tag_table, tag_key_columns in (
+                    ('problem', 'name', 'problem_tag', 'problem_name'),
+                    ('problem2', 'contest_id, [index]', 'problem2_tag', 'contest_id, [index]')):
+                columns = [row[1] for row in self.conn.execute(f'PRAGMA table_info({table})')]
+                if 'tags' not in columns:
+                    continue
+                query = f'SELECT {key_columns}, tags FROM {table} WHERE tags IS NOT NULL'
+                rows = [(*key, json.loads(tags)) for *key, tags in self.conn.execute(query)]
+                self._save_tags(tag_table, tag_key_columns, rows)
+                self.conn.execute(f'UPDATE {table} SET tags = NULL')
+        if version < 2:
+            # Tags are only read back per problem, problems are filtered by tag in memory.
+            self.conn.execute('DROP INDEX IF EXISTS ix_problem_tag_tag_id')
+            self.conn.execute('DROP INDEX IF EXISTS ix_problem2_tag_tag_id')
+        self.conn.execute(f'PRAGMA user_version = {self._SCHEMA_VERSION}')
+        self.conn.commit()
+
+    def _load_tags(self):
+        for tag_id, name in self.conn.execute('SELECT id, name FROM tag'):
+            self._tag_id_by_name[name] = tag_id
+            self._tag_name_by_id[tag_id] = name
+
+    def _get_tag_id(self, name):
+        tag_id = self._tag_id_by_name.get(name)
+        if tag_id is None:
+            tag_id = self.conn.execute('INSERT INTO tag (name) VALUES (?)', (name,)).lastrowid
+            self._tag_id_by_name[name] = tag_id
+            self._tag_name_by_id[tag_id] = name
+        return tag_id
+
+    def _save_tags(self, tag_table, key_columns, rows):
+        """Replaces the tags of problems given as rows of (*key, tags)."""
+        num_keys = key_columns.count(',') + 1
+        key_condition = ' AND '.join(f'{column.strip()} = ?' for column in key_columns.split(','))
+        self.conn.executemany(f'DELETE FROM {tag_table} WHERE {key_condition}',
+                              [row[:num_keys] for row in rows])
+        tag_rows = [(*row[:num_keys], position, self._get_tag_id(tag))
+                    for row in rows for position, tag in enumerate(row[num_keys])]
+        placeholders = ', '.join('?' * (num_keys + 2))
+        self.conn.executemany(f'INSERT INTO {tag_table} ({key_columns}, position, tag_id) '
+                              f'VALUES ({placeholders})', tag_rows)
+
+    def _fetch_tags(self, query, params=()):
+        """Returns a dict from problem key to its list of tags. `query` must select the key
+        columns followed by the tag id, in order of position."""
+        tags = defaultdict(list)
+        for *key, tag_id in self.conn.execute(query, params):
+            tags[tuple(key)].append(self._tag_name_by_id[tag_id])
+        return tags
+
+    def _bump_generation(self, name):
+        query = ('INSERT INTO generation (name, value) VALUES (?, 1) '
+                 'ON CONFLICT (name) DO UPDATE SET value = value + 1')
+        self.conn.execute(query, (name,))
+
+    def get_generation(self, name):
+        query = 'SELECT value FROM generation WHERE name = ?'
+        res = self.conn.execute(query, (name,)).fetchone()
+        return res[0] if res else 0
 
     def cache_contests(self, contests):
-        query = ('INSERT OR REPLACE INTO contest '
+        # Only rows which change are written, so that the generation of the table is not bumped
+        # by every reload of the contest list.
+        query = ('INSERT INTO contest '
                  '(id, name, start_time, duration, type, phase, prepared_by) '
-                 'VALUES (?, ?, ?, ?, ?, ?, ?)')
+                 'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                 'ON CONFLICT (id) DO UPDATE SET '
+                 '(name, start_time, duration, type, phase, prepared_by) = '
+                 '(excluded.name, excluded.start_time, excluded.duration, excluded.type, '
+                 ' excluded.phase, excluded.prepared_by) '
+                 'WHERE (name, start_time, duration, type, phase, prepared_by) IS NOT '
+                 '(excluded.name, excluded.start_time, excluded.duration, excluded.type, '
+                 ' excluded.phase, excluded.prepared_by)')
         rc = self.conn.executemany(query, contests).rowcount
+        if rc:
+            self._bump_generation('contest')
         self.conn.commit()
         return rc
 
@@ -92,28 +214,28 @@ class CacheDbConn:
         return [cf.Contest._make(contest) for contest in res]
 
     @staticmethod
-    def _squish_tags(problem):
+    def _problem_row(problem):
         return (problem.contestId, problem.problemsetName, problem.index, problem.name,
-                problem.type, problem.points, problem.rating, json.dumps(problem.tags))
+                problem.type, problem.points, problem.rating)
 
     def cache_problems(self, problems):
         query = ('INSERT OR REPLACE INTO problem '
-                 '(contest_id, problemset_name, [index], name, type, points, rating, tags) '
-                 'VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
-        rc = self.conn.executemany(query, list(map(self._squish_tags, problems))).rowcount
+                 '(contest_id, problemset_name, [index], name, type, points, rating) '
+                 'VALUES (?, ?, ?, ?, ?, ?, ?)')
+        rc = self.conn.executemany(query, list(map(self._problem_row, problems))).rowcount
+        self._save_tags('problem_tag', 'problem_name',
+                        [(problem.name, problem.tags) for problem in problems])
+        if rc:
+            self._bump_generation('problem')
         self.conn.commit()
         return rc
 
-    @staticmethod
-    def _unsquish_tags(problem):
-        args, tags = problem[:-1], json.loads(problem[-1])
-        return cf.Problem(*args, tags)
-
     def fetch_problems(self):
-        query = ('SELECT contest_id, problemset_name, [index], name, type, points, rating, tags '
+        query = ('SELECT contest_id, problemset_name, [index], name, type, points, rating '
                  'FROM problem')
         res = self.conn.execute(query).fetchall()
-        return list(map(self._unsquish_tags, res))
+        tags = self._fetch_tags('SELECT problem_name, tag_id FROM problem_tag ORDER BY position')
+        return [cf.Problem(*problem, tuple(tags.get((problem[3],), ()))) for problem in res]
 
     def save_rating_changes(self, changes):
         change_tuples = [(change.contestId,
@@ -126,16 +248,20 @@ class CacheDbConn:
                  '(contest_id, handle, rank, rating_update_time, old_rating, new_rating) '
                  'VALUES (?, ?, ?, ?, ?, ?)')
         rc = self.conn.executemany(query, change_tuples).rowcount
+        if rc:
+            self._bump_generation('rating_change')
         self.conn.commit()
         return rc
 
     def clear_rating_changes(self, contest_id=None):
         if contest_id is None:
             query = 'DELETE FROM rating_change'
-            self.conn.execute(query)
+            rc = self.conn.execute(query).rowcount
         else:
             query = 'DELETE FROM rating_change WHERE contest_id = ?'
-            self.conn.execute(query, (contest_id,))
+            rc = self.conn.execute(query, (contest_id,)).rowcount
+        if rc:
+            self._bump_generation('rating_change')
         self.conn.commit()
 
     def get_users_with_more_than_n_contests(self, time_cutoff, n):
@@ -179,43 +305,51 @@ class CacheDbConn:
         res = self.conn.execute(query, (handle,)).fetchall()
         return [cf.RatingChange._make(change) for change in res]
 
-    def get_all_ratings_before_timestamp(self, timestamp):
-        query = ('SELECT contest_id, "Dummy", handle, rank, rating_update_time, old_rating, new_rating '
-                 'FROM rating_change '
-                 'WHERE rating_update_time < ? '
-                 'GROUP BY handle '
-                 'HAVING MAX(rating_update_time)')
-        res = self.conn.execute(query, (timestamp,)).fetchall()
-        return [cf.RatingChange._make(change) for change in res]
-
     def cache_problemset(self, problemset):
         query = ('INSERT OR REPLACE INTO problem2 '
-                 '(contest_id, problemset_name, [index], name, type, points, rating, tags) '
-                 'VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
-        rc = self.conn.executemany(query, list(map(self._squish_tags, problemset))).rowcount
+                 '(contest_id, problemset_name, [index], name, type, points, rating) '
+                 'VALUES (?, ?, ?, ?, ?, ?, ?)')
+        rc = self.conn.executemany(query, list(map(self._problem_row, problemset))).rowcount
+        self._save_tags('problem2_tag', 'contest_id, [index]',
+                        [(problem.contestId, problem.index, problem.tags)
+                         for problem in problemset])
+        if rc:
+            self._bump_generation('problem2')
         self.conn.commit()
         return rc
 
+    def _make_problems2(self, res, tags):
+        return [cf.Problem(*problem, tuple(tags.get((problem[0], problem[2]), ())))
+                for problem in res]
+
     def fetch_problems2(self):
-        query = ('SELECT contest_id, problemset_name, [index], name, type, points, rating, tags '
+        query = ('SELECT contest_id, problemset_name, [index], name, type, points, rating '
                  'FROM problem2 ')
         res = self.conn.execute(query).fetchall()
-        return list(map(self._unsquish_tags, res))
+        tags = self._fetch_tags('SELECT contest_id, [index], tag_id FROM problem2_tag '
+                                'ORDER BY position')
+        return self._make_problems2(res, tags)
 
     def clear_problemset(self, contest_id=None):
         if contest_id is None:
             query = 'DELETE FROM problem2'
-            self.conn.execute(query)
+            rc = self.conn.execute(query).rowcount
+            self.conn.execute('DELETE FROM problem2_tag')
         else:
             query = 'DELETE FROM problem2 WHERE contest_id = ?'
-            self.conn.execute(query, (contest_id,))
+            rc = self.conn.execute(query, (contest_id,)).rowcount
+            self.conn.execute('DELETE FROM problem2_tag WHERE contest_id = ?', (contest_id,))
+        if rc:
+            self._bump_generation('problem2')
 
     def fetch_problemset(self, contest_id):
-        query = ('SELECT contest_id, problemset_name, [index], name, type, points, rating, tags '
+        query = ('SELECT contest_id, problemset_name, [index], name, type, points, rating '
                  'FROM problem2 '
                  'WHERE contest_id = ?')
         res = self.conn.execute(query, (contest_id,)).fetchall()
-        return list(map(self._unsquish_tags, res))
+        tags = self._fetch_tags('SELECT contest_id, [index], tag_id FROM problem2_tag '
+                                'WHERE contest_id = ? ORDER BY position', (contest_id,))
+        return self._make_problems2(res, tags)
 
     def problemset_empty(self):
         query = 'SELECT 1 FROM problem2'
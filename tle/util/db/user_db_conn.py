@@ -1,17 +1,22 @@
 import sqlite3
 import datetime
+import logging
 import zoneinfo
 import secrets
 from enum import IntEnum
-from collections import namedtuple
+from collections import namedtuple, defaultdict
 
 from discord.ext import commands
 
 from tle.util import codeforces_api as cf, paginator
 from tle.util import codeforces_common as cf_common
+from tle.util import metrics
+from tle.util.handledict import handle_registry
 
 _DEFAULT_VC_RATING = 1500
 
+logger = logging.getLogger(__name__)
+
 class Gitgud(IntEnum):
     GOTGUD = 0
     GITGUD = 1
@@ -54,6 +59,16 @@ class RatedVC(IntEnum):
     ONGOING = 0
     FINISHED = 1
 
+class Leaderboard(IntEnum):
+    VC = 0
+    DUEL = 1
+    GITGUD = 2
+
+# Guild id used for leaderboards that are not guild-specific.
+_GLOBAL_LEADERBOARD = ''
+
+LeaderboardEntry = namedtuple('LeaderboardEntry', 'user_id handle score rating cf_user_cached')
+
 
 class UserDbError(commands.CommandError):
     pass
@@ -72,6 +87,64 @@ class UniqueConstraintFailed(UserDbError):
     pass
 
 
+class HandleDirectory:
+    """In-memory mirror of the user_handle table, with user id -> handle and handle -> user id
+    maps per guild. Kept in sync by the UserDbConn methods that write user_handle.
+    """
+
+    def __init__(self):
+        # guild_id -> {user_id: (handle, active)}
+        self._handles = defaultdict(dict)
+        # guild_id -> {handle id in handle_registry: user_id}
+        self._user_ids = defaultdict(dict)
+
+    def load(self, rows):
+        self._handles.clear()
+        self._user_ids.clear()
+        for user_id, guild_id, handle, active in rows:
+            self.set(guild_id, user_id, handle, active=bool(active))
+
+    def set(self, guild_id, user_id, handle, *, active=True):
+        guild_id, user_id = str(guild_id), int(user_id)
+        old = self._handles[guild_id].get(user_id)
+        if old is not None:
+            self._user_ids[guild_id].pop(handle_registry.intern(old[0]), None)
+        self._handles[guild_id][user_id] = (handle, active)
+        self._user_ids[guild_id][handle_registry.intern(handle)] = user_id
+
+    def remove_handle(self, guild_id, handle):
+        guild_id = str(guild_id)
+        user_id = self._user_ids[guild_id].pop(handle_registry.get_id(handle), None)
+        if user_id is not None:
+            del self._handles[guild_id][user_id]
+
+    def set_active(self, guild_id, user_ids, active):
+        handles = self._handles[str(guild_id)]
+        for user_id in user_ids:
+            user_id = int(user_id)
+            if user_id in handles:
+                handles[user_id] = (handles[user_id][0], active)
+
+    def set_all_inactive(self, guild_id):
+        self.set_active(guild_id, list(self._handles[str(guild_id)]), False)
+
+    def get_handle(self, guild_id, user_id):
+        entry = self._handles[str(guild_id)].get(int(user_id))
+        return entry[0] if entry else None
+
+    def get_handles(self, guild_id, user_ids):
+        handles = self._handles[str(guild_id)]
+        return [handles[int(user_id)][0] if int(user_id) in handles else None
+                for user_id in user_ids]
+
+    def get_user_id(self, guild_id, handle):
+        return self._user_ids[str(guild_id)].get(handle_registry.get_id(handle))
+
+    def get_active(self, guild_id):
+        return [(user_id, handle) for user_id, (handle, active) in self._handles[str(guild_id)].items()
+                if active]
+
+
 def namedtuple_factory(cursor, row):
     """Returns sqlite rows as named tuples."""
     fields = [col[0] for col in cursor.description if col[0].isidentifier()]
@@ -79,6 +152,7 @@ def namedtuple_factory(cursor, row):
     return Row(*row)
 
 
+@metrics.instrument_db('user')
 class UserDbConn:
     role_cache: dict[tuple[int, str], int]
 
@@ -87,7 +161,11 @@ class UserDbConn:
         self.conn.row_factory = namedtuple_factory
         self.role_cache = {}
         self.guild_cache = {}
+        self.handle_directory = HandleDirectory()
         self.create_tables()
+        self.migrate()
+        for name, detail in self.find_table_scans():
+            logger.warning(f'Hot query {name} does a table scan: {detail}')
         self.populate_cache()
 
     def create_tables(self):
@@ -315,6 +393,20 @@ class UserDbConn:
             )
             ''')
 
+        # Materialized rankings, kept in sync by the methods that change the underlying scores.
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS leaderboard (
+                board       INTEGER,
+                guild_id    TEXT,
+                user_id     TEXT,
+                score       INTEGER NOT NULL,
+                num_entries INTEGER NOT NULL,
+                PRIMARY KEY (board, guild_id, user_id)
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS ix_leaderboard_board_guild_score '
+                          'ON leaderboard (board, guild_id, score DESC)')
+
         self.conn.execute('''
             CREATE TABLE IF NOT EXISTS role_reactions (
                 message_id INTEGER,
@@ -384,11 +476,76 @@ class UserDbConn:
         
         
         
+    # Schema migrations, applied in order on top of create_tables. The number of applied
+    # migrations is stored in PRAGMA user_version. Only append to this list.
+    _MIGRATIONS = (
+        '_migration_add_indexes',
+        '_migration_backfill_leaderboards',
+    )
+
+    def migrate(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        for target, name in enumerate(self._MIGRATIONS[version:], start=version + 1):
+            self.conn.commit()
+            self.conn.execute('BEGIN')
+            try:
+                getattr(self, name)()
+                self.conn.execute(f'PRAGMA user_version = {target}')
+            except Exception:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+            logger.info(f'User database migrated to version {target} ({name}).')
+
+    def _migration_add_indexes(self):
+        indexes = [
+            'ix_challenge_user_finish ON challenge (user_id, finish_time, rating_delta)',
+            'ix_challenge_user_status ON challenge (user_id, status)',
+            'ix_challenge_finish ON challenge (finish_time, user_id, rating_delta, issue_time)',
+            'ix_duel_challenger ON duel (challenger, guild_id, status)',
+            'ix_duel_challengee ON duel (challengee, guild_id, status)',
+            'ix_duel_guild_status ON duel (guild_id, status, start_time)',
+            'ix_rated_vc_users_user_vc ON rated_vc_users (user_id, vc_id, rating)',
+            'ix_trainings_user_status ON trainings (user_id, status)',
+            'ix_training_problems_training_status ON training_problems (training_id, status)',
+            'ix_lockout_ongoing_rounds_guild ON lockout_ongoing_rounds (guild)',
+            'ix_gym_sessions_status_datetime ON gym_sessions (status, datetime, user)',
+            'ix_gym_sessions_user_datetime ON gym_sessions (user, datetime)',
+        ]
+        for index in indexes:
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS {index}')
+
+    def _migration_backfill_leaderboards(self):
+        self._rebuild_leaderboards()
+
+    # Queries on hot paths with sample parameters, see find_table_scans.
+    _HOT_QUERIES = (
+        ('howgud', '_HOWGUD_QUERY', (0,)),
+        ('get_gudgitters_timerange', '_GUDGITTERS_TIMERANGE_QUERY', (0, 0)),
+        ('get_duels', '_GET_DUELS_QUERY', (0, 0, '', -1, 0)),
+        ('get_vc_rating', '_GET_VC_RATING_QUERY', ('',)),
+        ('get_incomplete_sessions', '_INCOMPLETE_SESSIONS_QUERY', (0,)),
+    )
+
+    def find_table_scans(self):
+        """Returns (query name, plan detail) pairs for hot queries whose EXPLAIN QUERY PLAN
+        contains a full table scan."""
+        scans = []
+        for name, attr, params in self._HOT_QUERIES:
+            plan = self.conn.execute('EXPLAIN QUERY PLAN ' + getattr(self, attr), params).fetchall()
+            for row in plan:
+                detail = row[-1]
+                if detail.startswith('SCAN') and 'INDEX' not in detail:
+                    scans.append((name, detail))
+        return scans
+
     def populate_cache(self):
         self.role_cache.clear()
         query = 'SELECT message_id, emoji, role_id FROM role_reactions'
         for message_id, emoji, role_id in self.conn.execute(query).fetchall():
             self.role_cache[(message_id, emoji)] = role_id
+        query = 'SELECT user_id, guild_id, handle, active FROM user_handle'
+        self.handle_directory.load(self.conn.execute(query).fetchall())
 
     # Helper functions.
 
@@ -473,11 +630,12 @@ class UserDbConn:
         '''
         return self.conn.execute(query, (timestamp,)).fetchall()
 
+    _GUDGITTERS_TIMERANGE_QUERY = '''
+        SELECT user_id, rating_delta, issue_time FROM challenge WHERE finish_time >= ? AND finish_time <= ? ORDER BY user_id
+    '''
+
     def get_gudgitters_timerange(self, timestampStart, timestampEnd):
-        query = '''
-            SELECT user_id, rating_delta, issue_time FROM challenge WHERE finish_time >= ? AND finish_time <= ? ORDER BY user_id
-        '''
-        return self.conn.execute(query, (timestampStart,timestampEnd)).fetchall()
+        return self.conn.execute(self._GUDGITTERS_TIMERANGE_QUERY, (timestampStart,timestampEnd)).fetchall()
 
     def get_gudgitters(self):
         query = '''
@@ -485,11 +643,12 @@ class UserDbConn:
         '''
         return self.conn.execute(query).fetchall()
 
+    _HOWGUD_QUERY = '''
+        SELECT rating_delta FROM challenge WHERE user_id = ? AND finish_time IS NOT NULL
+    '''
+
     def howgud(self, user_id):
-        query = '''
-            SELECT rating_delta FROM challenge WHERE user_id = ? AND finish_time IS NOT NULL
-        '''
-        return self.conn.execute(query, (user_id,)).fetchall()
+        return self.conn.execute(self._HOWGUD_QUERY, (user_id,)).fetchall()
 
     def get_noguds(self, user_id):
         query = ('SELECT problem_name '
@@ -522,6 +681,7 @@ class UserDbConn:
         if rc != 1:
             self.conn.rollback()
             return 0
+        self._refresh_gitgud_leaderboard(user_id)
         self.conn.commit()
         return 1
 
@@ -544,13 +704,18 @@ class UserDbConn:
         self.conn.commit()
         return 1
 
+    _CACHE_CF_USER_QUERY = ('INSERT OR REPLACE INTO cf_user_cache '
+                            '(handle, first_name, last_name, country, city, organization, contribution, '
+                            '    rating, maxRating, last_online_time, registration_time, friend_of_count, title_photo) '
+                            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)')
+
     def cache_cf_user(self, user):
-        query = ('INSERT OR REPLACE INTO cf_user_cache '
-                 '(handle, first_name, last_name, country, city, organization, contribution, '
-                 '    rating, maxRating, last_online_time, registration_time, friend_of_count, title_photo) '
-                 'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)')
         with self.conn:
-            return self.conn.execute(query, user).rowcount
+            return self.conn.execute(self._CACHE_CF_USER_QUERY, user).rowcount
+
+    def cache_cf_users(self, users):
+        with self.conn:
+            return self.conn.executemany(self._CACHE_CF_USER_QUERY, users).rowcount
 
     def fetch_cf_user(self, handle):
         query = ('SELECT handle, first_name, last_name, country, city, organization, contribution, '
@@ -572,41 +737,44 @@ class UserDbConn:
                  '(user_id, guild_id, handle, active) '
                  'VALUES (?, ?, ?, 1)')
         with self.conn:
-            return self.conn.execute(query, (user_id, guild_id, handle)).rowcount
+            rc = self.conn.execute(query, (user_id, guild_id, handle)).rowcount
+        self.handle_directory.set(guild_id, user_id, handle)
+        return rc
 
     def set_inactive(self, guild_id_user_id_pairs):
         query = ('UPDATE user_handle '
                  'SET active = 0 '
                  'WHERE guild_id = ? AND user_id = ?')
         with self.conn:
-            return self.conn.executemany(query, guild_id_user_id_pairs).rowcount
+            rc = self.conn.executemany(query, guild_id_user_id_pairs).rowcount
+        for guild_id, user_id in guild_id_user_id_pairs:
+            self.handle_directory.set_active(guild_id, [user_id], False)
+        return rc
 
+    @metrics.untimed
     def get_handle(self, user_id, guild_id):
-        query = ('SELECT handle '
-                 'FROM user_handle '
-                 'WHERE user_id = ? AND guild_id = ?')
-        res = self.conn.execute(query, (user_id, guild_id)).fetchone()
-        return res[0] if res else None
+        return self.handle_directory.get_handle(guild_id, user_id)
 
+    @metrics.untimed
+    def get_handles(self, user_ids, guild_id):
+        """Returns the handles of the given users in the guild, None for users without one."""
+        return self.handle_directory.get_handles(guild_id, user_ids)
+
+    @metrics.untimed
     def get_user_id(self, handle, guild_id):
-        query = ('SELECT user_id '
-                 'FROM user_handle '
-                 'WHERE UPPER(handle) = UPPER(?) AND guild_id = ?')
-        res = self.conn.execute(query, (handle, guild_id)).fetchone()
-        return int(res[0]) if res else None
+        return self.handle_directory.get_user_id(guild_id, handle)
 
     def remove_handle(self, handle, guild_id):
         query = ('DELETE FROM user_handle '
                  'WHERE UPPER(handle) = UPPER(?) AND guild_id = ?')
         with self.conn:
-            return self.conn.execute(query, (handle, guild_id)).rowcount
+            rc = self.conn.execute(query, (handle, guild_id)).rowcount
+        self.handle_directory.remove_handle(guild_id, handle)
+        return rc
 
+    @metrics.untimed
     def get_handles_for_guild(self, guild_id):
-        query = ('SELECT user_id, handle '
-                 'FROM user_handle '
-                 'WHERE guild_id = ? AND active = 1')
-        res = self.conn.execute(query, (guild_id,)).fetchall()
-        return [(int(user_id), handle) for user_id, handle in res]
+        return self.handle_directory.get_active(guild_id)
 
     def get_cf_users_for_guild(self, guild_id):
         query = ('SELECT u.user_id, c.handle, c.first_name, c.last_name, c.country, c.city, '
@@ -809,19 +977,25 @@ class UserDbConn:
             return 0
 
         if dtype == DuelType.OFFICIAL or dtype == DuelType.ADJOFFICIAL:
-            self.update_duel_rating(winner_id, guild_id, +delta)
-            self.update_duel_rating(loser_id, guild_id, -delta)
+            self._update_duel_rating(winner_id, guild_id, +delta)
+            self._update_duel_rating(loser_id, guild_id, -delta)
+        self._refresh_duel_leaderboard(winner_id, guild_id)
+        self._refresh_duel_leaderboard(loser_id, guild_id)
 
         self.conn.commit()
         return 1
 
     def update_duel_rating(self, userid, guild_id, delta):
+        with self.conn:
+            rc = self._update_duel_rating(userid, guild_id, delta)
+            self._refresh_duel_leaderboard(userid, guild_id)
+        return rc
+
+    def _update_duel_rating(self, userid, guild_id, delta):
         query = '''
             UPDATE duelist SET rating = rating + ? WHERE user_id = ? AND guild_id = ?
         '''
-        rc = self.conn.execute(query, (delta, userid, guild_id)).rowcount
-        self.conn.commit()
-        return rc
+        return self.conn.execute(query, (delta, userid, guild_id)).rowcount
 
     def get_duel_wins(self, userid, guild_id):
         query = f'''
@@ -830,11 +1004,13 @@ class UserDbConn:
         '''
         return self.conn.execute(query, (userid, userid, guild_id)).fetchall()
 
-    def get_duels(self, userid, guild_id):
-        query = f'''
-            SELECT id, start_time, finish_time, problem_name, challenger, challengee, winner FROM duel WHERE (challengee = ? OR challenger = ?) AND guild_id = ? AND status == {Duel.COMPLETE} ORDER BY start_time DESC
-        '''
-        return self.conn.execute(query, (userid, userid, guild_id)).fetchall()
+    _GET_DUELS_QUERY = f'''
+        SELECT id, start_time, finish_time, problem_name, challenger, challengee, winner FROM duel WHERE (challengee = ? OR challenger = ?) AND guild_id = ? AND status == {Duel.COMPLETE} ORDER BY start_time DESC
+        LIMIT ? OFFSET ?
+    '''
+
+    def get_duels(self, userid, guild_id, *, limit=-1, offset=0):
+        return self.conn.execute(self._GET_DUELS_QUERY, (userid, userid, guild_id, limit, offset)).fetchall()
 
     def get_duel_problem_names(self, userid, guild_id):
         query = f'''
@@ -979,6 +1155,7 @@ class UserDbConn:
         '''
         self.conn.execute(inactive_query, (id,))
         self.conn.commit()
+        self.handle_directory.set_all_inactive(id)
 
     def update_status(self, guild_id: str, active_ids: list):
         placeholders = ', '.join(['?'] * len(active_ids))
@@ -991,6 +1168,7 @@ class UserDbConn:
         '''.format(placeholders)
         rc = self.conn.execute(active_query, (*active_ids, guild_id)).rowcount
         self.conn.commit()
+        self.handle_directory.set_active(guild_id, active_ids, True)
         return rc
 
     # Rated VC stuff
@@ -1051,13 +1229,15 @@ class UserDbConn:
 
         with self.conn:
             self.conn.execute(query, (vc_id, user_id, rating))
+            self._refresh_vc_leaderboard(user_id)
+
+    _GET_VC_RATING_QUERY = ('SELECT MAX(vc_id) AS latest_vc_id, rating '
+                            'FROM rated_vc_users '
+                            'WHERE user_id = ? AND rating IS NOT NULL'
+                            )
 
     def get_vc_rating(self, user_id: str, default_if_not_exist: bool = True):
-        query = ('SELECT MAX(vc_id) AS latest_vc_id, rating '
-                 'FROM rated_vc_users '
-                 'WHERE user_id = ? AND rating IS NOT NULL'
-                 )
-        rating = self._fetchone(query, params=(user_id, ), row_factory=namedtuple_factory).rating
+        rating = self._fetchone(self._GET_VC_RATING_QUERY, params=(user_id, ), row_factory=namedtuple_factory).rating
         if rating is None:
             if default_if_not_exist:
                 return _DEFAULT_VC_RATING
@@ -1097,7 +1277,98 @@ class UserDbConn:
         query = ('DELETE FROM rated_vc_users '
                  'WHERE user_id = ? AND vc_id = ? ')
         with self.conn:
-            return self.conn.execute(query, (user_id, vc_id)).rowcount
+            rc = self.conn.execute(query, (user_id, vc_id)).rowcount
+            self._refresh_vc_leaderboard(user_id)
+            return rc
+
+    # Leaderboards
+
+    def _refresh_vc_leaderboard(self, user_id):
+        self.conn.execute('DELETE FROM leaderboard WHERE board = ? AND guild_id = ? AND user_id = ?',
+                          (Leaderboard.VC, _GLOBAL_LEADERBOARD, user_id))
+        query = '''
+            INSERT INTO leaderboard (board, guild_id, user_id, score, num_entries)
+            SELECT ?, ?, user_id, rating,
+                (SELECT COUNT(*) FROM rated_vc_users WHERE user_id = ? AND rating IS NOT NULL)
+            FROM rated_vc_users
+            WHERE user_id = ? AND rating IS NOT NULL
+            ORDER BY vc_id DESC LIMIT 1
+        '''
+        self.conn.execute(query, (Leaderboard.VC, _GLOBAL_LEADERBOARD, user_id, user_id))
+
+    def _refresh_duel_leaderboard(self, user_id, guild_id):
+        query = f'''
+            INSERT OR REPLACE INTO leaderboard (board, guild_id, user_id, score, num_entries)
+            SELECT ?, guild_id, user_id, rating,
+                (SELECT COUNT(*) FROM duel WHERE (challenger = ? OR challengee = ?) AND guild_id = ?
+                 AND status = {Duel.COMPLETE})
+            FROM duelist
+            WHERE user_id = ? AND guild_id = ?
+        '''
+        self.conn.execute(query, (Leaderboard.DUEL, user_id, user_id, guild_id, user_id, guild_id))
+
+    def _refresh_gitgud_leaderboard(self, user_id):
+        query = '''
+            INSERT OR REPLACE INTO leaderboard (board, guild_id, user_id, score, num_entries)
+            SELECT ?, ?, user_id, score, num_completed
+            FROM user_challenge
+            WHERE user_id = ?
+        '''
+        self.conn.execute(query, (Leaderboard.GITGUD, _GLOBAL_LEADERBOARD, user_id))
+
+    def rebuild_leaderboards(self):
+        """Recomputes all leaderboards from the underlying tables."""
+        with self.conn:
+            self._rebuild_leaderboards()
+
+    def _rebuild_leaderboards(self):
+        vc_query = '''
+            INSERT INTO leaderboard (board, guild_id, user_id, score, num_entries)
+            SELECT ?, ?, r.user_id, r.rating, c.cnt
+            FROM rated_vc_users AS r
+            JOIN (SELECT user_id, MAX(vc_id) AS vc_id, COUNT(*) AS cnt
+                  FROM rated_vc_users WHERE rating IS NOT NULL GROUP BY user_id) AS c
+            ON r.user_id = c.user_id AND r.vc_id = c.vc_id
+        '''
+        duel_query = f'''
+            INSERT INTO leaderboard (board, guild_id, user_id, score, num_entries)
+            SELECT ?, d.guild_id, d.user_id, d.rating,
+                (SELECT COUNT(*) FROM duel WHERE (challenger = d.user_id OR challengee = d.user_id)
+                 AND guild_id = d.guild_id AND status = {Duel.COMPLETE})
+            FROM duelist AS d
+        '''
+        gitgud_query = '''
+            INSERT INTO leaderboard (board, guild_id, user_id, score, num_entries)
+            SELECT ?, ?, user_id, score, num_completed
+            FROM user_challenge
+        '''
+        self.conn.execute('DELETE FROM leaderboard')
+        self.conn.execute(vc_query, (Leaderboard.VC, _GLOBAL_LEADERBOARD))
+        self.conn.execute(duel_query, (Leaderboard.DUEL,))
+        self.conn.execute(gitgud_query, (Leaderboard.GITGUD, _GLOBAL_LEADERBOARD))
+
+    def get_leaderboard(self, board, guild_id, *, active_only=False, limit=-1, offset=0):
+        """Returns LeaderboardEntry rows for users who have at least one entry on the board,
+        highest score first. `handle` is the user's handle in the guild or None, and `rating` is
+        its cached Codeforces rating. If `active_only` is set only users with an active handle in
+        the guild are returned.
+        """
+        scope = guild_id if board == Leaderboard.DUEL else _GLOBAL_LEADERBOARD
+        query = f'''
+            SELECT lb.user_id, u.handle, lb.score, c.rating, c.handle IS NOT NULL AS cf_user_cached
+            FROM leaderboard AS lb
+            LEFT JOIN user_handle AS u
+            ON u.user_id = lb.user_id AND u.guild_id = ?
+            LEFT JOIN cf_user_cache AS c
+            ON c.handle = u.handle
+            WHERE lb.board = ? AND lb.guild_id = ? AND lb.num_entries > 0
+            {'AND u.active = 1' if active_only else ''}
+            ORDER BY lb.score DESC
+            LIMIT ? OFFSET ?
+        '''
+        res = self.conn.execute(query, (guild_id, board, scope, limit, offset)).fetchall()
+        return [LeaderboardEntry(int(user_id), handle, score, rating, bool(cached))
+                for user_id, handle, score, rating, cached in res]
 
     def set_training_channel(self, guild_id, channel_id):
         query = ('INSERT OR REPLACE INTO training_settings '
@@ -1381,14 +1652,22 @@ class UserDbConn:
         Round = namedtuple('Round', 'guild users rating points time problems status duration repeat times')
         return [Round(data[1], data[2], data[3], data[4], data[5], data[6], data[7], data[8], data[9], data[10]) for data in res]
 
-    def get_recent_rounds(self, guild, user=None):
+    def get_num_recent_rounds(self, guild, user=None):
+        query = '''
+                    SELECT COUNT(*) AS num_rounds FROM lockout_finished_rounds
+                    WHERE guild = ? AND users LIKE ?
+                '''
+        return self.conn.execute(query, (guild, '%' if user is None else f'%{user}%')).fetchone()[0]
+
+    def get_recent_rounds(self, guild, user=None, *, limit=-1, offset=0):
         query = f'''
                     SELECT * FROM lockout_finished_rounds 
                     WHERE guild = ? AND users LIKE ?
                     ORDER BY end_time DESC
+                    LIMIT ? OFFSET ?
                 '''
         cur = self.conn.cursor()
-        cur.execute(query, (guild, '%' if user is None else f'%{user}%'))
+        cur.execute(query, (guild, '%' if user is None else f'%{user}%', limit, offset))
         res = cur.fetchall()
         cur.close()
         Round = namedtuple('Round', 'guild users rating points time problems status duration repeat times end_time')
@@ -1412,6 +1691,7 @@ class UserDbConn:
             self.conn.execute(query, (message_id, emoji))
         self.role_cache.pop((message_id, emoji), None)
 
+    @metrics.untimed
     def get_role_reaction(self, message_id: int, emoji: str):
         return self.role_cache.get((message_id, emoji))
     
@@ -1494,6 +1774,7 @@ class UserDbConn:
             ORDER BY datetime DESC
         '''
         return self.conn.execute(query, (member_id,))
+    @metrics.untimed
     def skip_days(self, timestamp : int, n : int, tz : str):
     
         dt = datetime.datetime.fromtimestamp(timestamp, tz=zoneinfo.ZoneInfo(tz)) + datetime.timedelta(days=7*n)
@@ -1639,6 +1920,7 @@ class UserDbConn:
         self.conn.execute(query, (id,))
         self.update_record(exercise[0])
         return True
+    @metrics.untimed
     def daytime_to_datetime(self, day : int, time : int, n : int, tz : str):
         now = datetime.datetime.now(tz=zoneinfo.ZoneInfo(tz))
         dt = now.date() + datetime.timedelta(days=(day - now.weekday())%7 + 7*n)
@@ -1731,12 +2013,13 @@ class UserDbConn:
         self.guild_cache[guild_id] = val
         return val
 
+    _INCOMPLETE_SESSIONS_QUERY = '''
+        SELECT user FROM gym_sessions
+        WHERE status = "unresponded" AND datetime < ?
+    '''
+
     def get_incomplete_sessions(self):
-        query = '''
-            SELECT user FROM gym_sessions
-            WHERE status = "unresponded" AND datetime < ?
-        '''
-        vals = self.conn.execute(query, (int(datetime.datetime.now().timestamp()-3600),)).fetchall()
+        vals = self.conn.execute(self._INCOMPLETE_SESSIONS_QUERY, (int(datetime.datetime.now().timestamp()-3600),)).fetchall()
         query = '''
             UPDATE gym_sessions
             SET status = "skipped|Did not start on time"
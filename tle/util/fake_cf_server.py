@@ -0,0 +1,68 @@
+"""Local stand-in for codeforces.com serving API responses from an archive recorded with
+CF_API_ARCHIVE_MODE=record. Point the bot at it with CF_API_BASE_URL, e.g.
+
+    python -m tle.util.fake_cf_server data/db/api_archive.db --port 8910 --latency 0.2
+    CF_API_BASE_URL=http://localhost:8910/api/ python -m tle
+"""
+import argparse
+import asyncio
+import logging
+import random
+
+from aiohttp import web
+
+from tle.util.db.api_archive_conn import ApiArchiveConn
+
+logger = logging.getLogger(__name__)
+
+
+def make_app(archive, *, latency=0, jitter=0, limit_error_rate=0):
+    async def handle_api(request):
+        delay = max(0, latency + random.uniform(-jitter, jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        if random.random() < limit_error_rate:
+            return web.json_response({'status': 'FAILED', 'comment': 'Call limit exceeded'},
+                                     status=503)
+
+        path = request.match_info['path']
+        data = dict(request.query)
+        if request.method == 'POST':
+            data.update(await request.post())
+        archived = archive.lookup(path, data)
+        if archived is None:
+            logger.warning(f'Query {path} with {data} is missing from the archive')
+            return web.json_response({'status': 'FAILED',
+                                      'comment': f'{path}: query is missing from the archive'},
+                                     status=400)
+        ok, payload = archived
+        if not ok:
+            return web.json_response({'status': 'FAILED', 'comment': payload}, status=400)
+        return web.json_response({'status': 'OK', 'result': payload})
+
+    app = web.Application()
+    app.router.add_route('*', '/api/{path}', handle_api)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve recorded Codeforces API responses')
+    parser.add_argument('archive', help='path to an API archive database')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8910)
+    parser.add_argument('--latency', type=float, default=0, help='seconds added to each response')
+    parser.add_argument('--jitter', type=float, default=0, help='max random deviation of latency')
+    parser.add_argument('--limit-error-rate', type=float, default=0,
+                        help='fraction of queries failing with a call limit error')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    archive = ApiArchiveConn(args.archive)
+    logger.info(f'Serving {archive.count()} archived responses')
+    app = make_app(archive, latency=args.latency, jitter=args.jitter,
+                   limit_error_rate=args.limit_error_rate)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ import discord
 import time
 import matplotlib.font_manager
 import matplotlib
+import seaborn as sns
 matplotlib.use('agg') # Explicitly set the backend to avoid issues
 
 from tle import constants
@@ -17,6 +18,14 @@ rating_color_cycler = cycler('color', ['#5d4dff',
                                        '#b99d27',
                                        '#cb2aff'])
 
+plt.rcParams['figure.figsize'] = 7.0, 3.5
+sns.set()
+sns.set_style('darkgrid', {
+    'axes.edgecolor': '#A0A0C5',
+    'axes.spines.top': False,
+    'axes.spines.right': False,
+})
+
 fontprop = matplotlib.font_manager.FontProperties(fname=constants.NOTO_SANS_CJK_REGULAR_FONT_PATH)
 
 
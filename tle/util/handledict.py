@@ -1,33 +1,100 @@
 """
-    A case insensitive dictionay with bare minimum functions required for handling usernames.
+    A case insensitive dictionay with bare minimum functions required for handling usernames,
+    and the registry of handles it is keyed on.
 """
 
 
+class HandleRegistry:
+    """Process-wide table of Codeforces handles, which are unique ignoring case. Each handle is
+    interned once with an integer id and a canonical-case string, so that caches can key on ids
+    and share a single copy of each handle.
+
+    Ids are never reused, so the registry only grows. Only long-lived data interns handles: the
+    rating changes cache, contest writers, registered handles of guild members and users fetched
+    from the API. The registry is bounded by the number of rated Codeforces users plus the
+    handles the bot has seen registered. Transient data such as ranklists must not intern their
+    handles.
+    """
+
+    def __init__(self):
+        # lower-cased handle -> id
+        self._ids = {}
+        # id -> canonical-case handle
+        self._handles = []
+
+    def intern(self, handle):
+        """Returns the id of `handle`, registering it if it is new. The case of the first
+        registered spelling is kept as canonical."""
+        key = handle.lower()
+        handle_id = self._ids.get(key)
+        if handle_id is None:
+            handle_id = self._ids[key] = len(self._handles)
+            self._handles.append(handle)
+        return handle_id
+
+    def set_canonical(self, handle):
+        """Registers `handle` with its case as canonical, e.g. as returned by the API."""
+        handle_id = self.intern(handle)
+        if self._handles[handle_id] != handle:
+            self._handles[handle_id] = handle
+        return handle_id
+
+    def get_id(self, handle):
+        """Returns the id of `handle` or None if it was never registered."""
+        return self._ids.get(handle.lower())
+
+    def handle(self, handle_id):
+        return self._handles[handle_id]
+
+    def canonical(self, handle):
+        return self._handles[self.intern(handle)]
+
+    def __len__(self):
+        return len(self._handles)
+
+
+handle_registry = HandleRegistry()
+
+
 class HandleDict:
     def __init__(self):
         self._store = {}
 
     @staticmethod
-    def _getlower(key):
-        return key.lower() if type(key) == str else key
+    def _get_id(key):
+        # Keys which are not strings are used as they are, wrapped so they do not clash with
+        # handle ids.
+        if type(key) != str:
+            return (key,)
+        handle_id = handle_registry.get_id(key)
+        if handle_id is None:
+            raise KeyError(key)
+        return handle_id
 
     def __setitem__(self, key, value):
-        # Use the lowercased key for lookups, but store the actual
+        # Use the handle id for lookups, but store the actual
         # key alongside the value.
-        self._store[self._getlower(key)] = (key, value)
+        store_key = handle_registry.intern(key) if type(key) == str else (key,)
+        self._store[store_key] = (key, value)
 
     def __getitem__(self, key):
-        return self._store[self._getlower(key)][1]
+        return self._store[self._get_id(key)][1]
+
+    def __contains__(self, key):
+        try:
+            return self._get_id(key) in self._store
+        except KeyError:
+            return False
 
     # get correct handle irrespective of the input case of the handle (if the handle is present)
     def get_correct_handle(self, key):
         try:
-            return self._store[self._getlower(key)][0]
+            return self._store[self._get_id(key)][0]
         except KeyError:
             return ""
 
     def __delitem__(self, key):
-        del self._store[self._getlower(key)]
+        del self._store[self._get_id(key)]
 
     def __iter__(self):
         return (cased_key for cased_key, mapped_value in self._store.values())
@@ -0,0 +1,191 @@
+"""Deferred imports and cog loading to keep bot startup fast."""
+import ast
+import asyncio
+import importlib
+import logging
+import time
+import types
+
+from discord.ext import commands
+
+from tle.util import metrics
+
+logger = logging.getLogger(__name__)
+
+_COMMAND_DECORATORS = {'command', 'group', 'hybrid_command', 'hybrid_group'}
+
+
+class LazyModule(types.ModuleType):
+    """Module proxy that imports the real module on first attribute access, after importing the
+    modules in `after`."""
+
+    def __init__(self, name, after=()):
+        super().__init__(name)
+        self.__dict__['_module'] = None
+        self.__dict__['_after'] = after
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            begin = time.perf_counter()
+            for name in self.__dict__['_after']:
+                importlib.import_module(name)
+            module = self.__dict__['_module'] = importlib.import_module(self.__name__)
+            logger.info(f'Lazily imported {self.__name__} in {time.perf_counter() - begin:.2f}s')
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+def lazy_import(name, *, after=()):
+    return LazyModule(name, after)
+
+
+def find_commands(path):
+    """Returns the names and aliases of the top level commands defined in cogs in the source
+    file at `path`, without importing it."""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=str(path))
+    names = []
+    for cls in tree.body:
+        if not isinstance(cls, ast.ClassDef):
+            continue
+        for func in cls.body:
+            if not isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            for decorator in func.decorator_list:
+                if not (isinstance(decorator, ast.Call) and
+                        isinstance(decorator.func, ast.Attribute) and
+                        decorator.func.attr in _COMMAND_DECORATORS and
+                        isinstance(decorator.func.value, ast.Name) and
+                        decorator.func.value.id == 'commands'):
+                    continue
+                kwargs = {kw.arg: kw.value for kw in decorator.keywords}
+                name = kwargs.get('name')
+                names.append(name.value if isinstance(name, ast.Constant) else func.name)
+                aliases = kwargs.get('aliases')
+                if isinstance(aliases, (ast.List, ast.Tuple)):
+                    names += [alias.value for alias in aliases.elts
+                              if isinstance(alias, ast.Constant)]
+    return names
+
+
+async def _stub_callback(ctx):
+    # Never called, _StubCommand.invoke runs the real command instead.
+    pass
+
+
+class _StubCommand(commands.Command):
+    """Hidden placeholder for a command of a deferred extension. Invoking it loads the extension
+    and invokes the real command in its place, so that checks and hooks only run for the real
+    command."""
+
+    def __init__(self, loader, extension, name):
+        super().__init__(_stub_callback, name=name, hidden=True, ignore_extra=True)
+        self.loader = loader
+        self.extension = extension
+
+    async def invoke(self, ctx):
+        try:
+            await self.loader.ensure_loaded(self.extension)
+        except Exception as e:
+            raise commands.CommandInvokeError(e) from e
+        command = ctx.bot.get_command(ctx.invoked_with)
+        if command is None or isinstance(command, _StubCommand):
+            raise commands.CommandNotFound(f'Command "{ctx.invoked_with}" is not found')
+        # The view is still positioned after the command name, as the real command expects.
+        ctx.command = command
+        await command.invoke(ctx)
+
+
+class LazyCogLoader:
+    """Loads extensions either immediately or on demand. A deferred extension gets hidden stub
+    commands with the names of its commands. Invoking a stub loads the extension and then
+    invokes the real command.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.load_times = {}
+        self._stubs = {}
+        self._loading = {}
+        self._started = False
+        self._missed_ready = []
+
+    async def load(self, extension):
+        begin = time.perf_counter()
+        cogs_before = set(self.bot.cogs)
+        await self.bot.load_extension(extension)
+        elapsed = time.perf_counter() - begin
+        self.load_times[extension] = elapsed
+        metrics.cog_load_seconds.observe(elapsed, extension=extension)
+        if self.bot.is_ready():
+            # The extension missed on_ready, run its handlers once the bot is initialized.
+            new_cogs = [self.bot.cogs[name] for name in set(self.bot.cogs) - cogs_before]
+            if self._started:
+                self._dispatch_ready(new_cogs)
+            else:
+                self._missed_ready += new_cogs
+
+    @staticmethod
+    def _dispatch_ready(cogs):
+        for cog in cogs:
+            for event, listener in cog.get_listeners():
+                if event == 'on_ready':
+                    asyncio.create_task(listener())
+
+    def defer(self, extension, path):
+        stubs = []
+        for name in find_commands(path):
+            stub = _StubCommand(self, extension, name)
+            try:
+                self.bot.add_command(stub)
+            except commands.CommandRegistrationError:
+                logger.warning(f'Cannot add stub for command {name} of {extension}')
+                continue
+            stubs.append(stub)
+        self._stubs[extension] = stubs
+
+    async def ensure_loaded(self, extension):
+        if extension not in self._stubs:
+            return
+        task = self._loading.get(extension)
+        if task is None:
+            task = self._loading[extension] = asyncio.create_task(self._load_deferred(extension))
+        await asyncio.shield(task)
+
+    async def _load_deferred(self, extension):
+        stubs = self._stubs[extension]
+        # The real commands take the names of the stubs.
+        for stub in stubs:
+            self.bot.remove_command(stub.name)
+        try:
+            await self.load(extension)
+        except BaseException:
+            # Restore the stubs so that the commands keep reporting the error and a later
+            # invocation retries the load.
+            for stub in stubs:
+                try:
+                    self.bot.add_command(stub)
+                except commands.CommandRegistrationError:
+                    logger.warning(f'Cannot restore stub for command {stub.name} of {extension}')
+            del self._loading[extension]
+            raise
+        del self._stubs[extension]
+
+    async def start(self):
+        """Called once the bot is initialized. Runs the on_ready handlers of extensions loaded
+        in the meantime and then loads all deferred extensions, one at a time."""
+        self._started = True
+        self._dispatch_ready(self._missed_ready)
+        self._missed_ready = []
+        for extension in list(self._stubs):
+            try:
+                await self.ensure_loaded(extension)
+            except Exception:
+                logger.exception(f'Failed to load deferred extension {extension}')
+
+    def report(self):
+        slowest = sorted(self.load_times.items(), key=lambda item: -item[1])
+        return ', '.join(f'{extension} {elapsed:.2f}s' for extension, elapsed in slowest)
@@ -0,0 +1,218 @@
+"""In-process counters and histograms for the bot's hot paths, rendered in the Prometheus text
+exposition format by `render` and summarized by `;meta stats`.
+"""
+import contextlib
+import functools
+import inspect
+import math
+import threading
+import time
+
+_DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = []
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"'
+                              for (name, _), value in zip(pairs, escaped)) + '}'
+
+    def render(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.kind}'
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self):
+        yield from super().render()
+        for key, value in self.items():
+            yield f'{self.name}{self._format_labels(key)} {value}'
+
+
+class HistogramSeries:
+    __slots__ = ('bucket_counts', 'count', 'sum', 'max')
+
+    def __init__(self, num_buckets):
+        self.bucket_counts = [0] * num_buckets
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=_DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = HistogramSeries(len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series.bucket_counts[i] += 1
+                    break
+            series.count += 1
+            series.sum += value
+            series.max = max(series.max, value)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observes the time spent in the block. A `status` label, if declared and not given, is
+        set to ok or to the name of the exception raised."""
+        begin = time.perf_counter()
+        status = 'ok'
+        try:
+            yield
+        except BaseException as e:
+            status = type(e).__name__
+            raise
+        finally:
+            if 'status' in self.labelnames:
+                labels.setdefault('status', status)
+            self.observe(time.perf_counter() - begin, **labels)
+
+    def items(self):
+        with self._lock:
+            return list(self._series.items())
+
+    def render(self):
+        yield from super().render()
+        for key, series in self.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series.bucket_counts):
+                cumulative += count
+                yield f'{self.name}_bucket{self._format_labels(key, [("le", str(bound))])} {cumulative}'
+            yield f'{self.name}_bucket{self._format_labels(key, [("le", "+Inf")])} {series.count}'
+            yield f'{self.name}_sum{self._format_labels(key)} {series.sum}'
+            yield f'{self.name}_count{self._format_labels(key)} {series.count}'
+
+
+def render():
+    """Returns all metrics in the Prometheus text exposition format."""
+    lines = [line for metric in _registry for line in metric.render()]
+    return '\n'.join(lines) + '\n'
+
+
+command_seconds = Histogram('tle_command_seconds', 'Time taken by bot commands.',
+                            ('command', 'status'))
+api_seconds = Histogram('tle_cf_api_seconds', 'Round trip time of Codeforces API queries.',
+                        ('endpoint', 'status'))
+api_response_bytes = Counter('tle_cf_api_response_bytes_total',
+                             'Bytes received from the Codeforces API.', ('endpoint',))
+api_ratelimit_wait_seconds = Histogram('tle_cf_api_ratelimit_wait_seconds',
+                                       'Time Codeforces API queries waited for a rate limit slot.')
+db_query_seconds = Histogram('tle_db_query_seconds', 'Time taken by database methods.',
+                             ('db', 'method', 'status'))
+task_seconds = Histogram('tle_task_seconds', 'Time taken by each iteration of a task.',
+                         ('task', 'status'))
+cog_load_seconds = Histogram('tle_cog_load_seconds',
+                             'Time taken to import and set up each extension.', ('extension',))
+outbox_queue_seconds = Histogram('tle_outbox_queue_seconds',
+                                 'Time outgoing messages waited in the per-channel queue.',
+                                 ('priority',))
+
+
+def instrument_bot(bot):
+    """Records the time taken by every command invocation of `bot`. Uses event listeners, so
+    that global before and after invoke hooks are left to the bot."""
+    async def start_timer(ctx):
+        ctx.metrics_begin = time.perf_counter()
+
+    def stop_timer(ctx, status):
+        begin = getattr(ctx, 'metrics_begin', None)
+        if begin is not None and ctx.command is not None:
+            command_seconds.observe(time.perf_counter() - begin,
+                                    command=ctx.command.qualified_name, status=status)
+
+    async def on_command_completion(ctx):
+        stop_timer(ctx, 'ok')
+
+    async def on_command_error(ctx, error):
+        stop_timer(ctx, 'failed')
+
+    bot.add_listener(start_timer, 'on_command')
+    bot.add_listener(on_command_completion)
+    bot.add_listener(on_command_error)
+
+
+def untimed(method):
+    """Marks a method of a database connection class which does not query the database, so that
+    `instrument_db` leaves it alone."""
+    method._metrics_untimed = True
+    return method
+
+
+def instrument_db(db_name):
+    """Class decorator recording the time taken by every public method of a database connection
+    class in `db_query_seconds`, except those marked with `untimed`."""
+    def decorator(cls):
+        for name, method in list(vars(cls).items()):
+            if (name.startswith('_') or not inspect.isfunction(method) or
+                    getattr(method, '_metrics_untimed', False)):
+                continue
+            setattr(cls, name, _timed_method(method, db_name))
+        return cls
+    return decorator
+
+
+def _timed_method(method, db_name):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with db_query_seconds.time(db=db_name, method=method.__name__):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def summarize(histogram, label, *, limit=None):
+    """Returns (label value, count, mean, max) of the series of `histogram` aggregated by
+    `label`, busiest first by total time."""
+    ix = histogram.labelnames.index(label)
+    totals = {}
+    for key, series in histogram.items():
+        count, total, max_ = totals.get(key[ix], (0, 0.0, 0.0))
+        totals[key[ix]] = (count + series.count, total + series.sum, max(max_, series.max))
+    rows = sorted(totals.items(), key=lambda item: -item[1][1])[:limit]
+    return [(value, count, total / count if count else math.nan, max_)
+            for value, (count, total, max_) in rows]
@@ -0,0 +1,135 @@
+"""Queue for outgoing Discord messages. Messages are sent by one worker per channel, replies to
+commands before broadcasts. Embeds which are queued together with `send_many` are packed into as
+few messages as possible to make fewer requests against the per-channel rate limits.
+"""
+import asyncio
+import collections
+import enum
+import logging
+import time
+
+from tle.util import metrics
+
+logger = logging.getLogger(__name__)
+
+# Discord's limits for the embeds of one message.
+_MAX_EMBEDS = 10
+_MAX_EMBED_CHARS = 6000
+
+
+class Priority(enum.IntEnum):
+    INTERACTIVE = 0
+    BROADCAST = 1
+
+
+class _Item:
+    __slots__ = ('content', 'embeds', 'kwargs', 'future', 'enqueue_time')
+
+    def __init__(self, content, embeds, kwargs, future):
+        self.content = content
+        self.embeds = embeds
+        self.kwargs = kwargs
+        self.future = future
+        self.enqueue_time = time.perf_counter()
+
+
+def pack_embeds(embeds):
+    """Splits `embeds` into lists of consecutive embeds which fit in one message. An embed which
+    is over the limits on its own is put in a list by itself."""
+    packed, num_chars = [], 0
+    for embed in embeds:
+        size = len(embed)
+        if (packed and len(packed[-1]) < _MAX_EMBEDS and
+                num_chars + size <= _MAX_EMBED_CHARS):
+            packed[-1].append(embed)
+            num_chars += size
+        else:
+            packed.append([embed])
+            num_chars = size
+    return packed
+
+
+class Outbox:
+    def __init__(self):
+        # channel id -> deque of items per priority
+        self._queues = {}
+        self._workers = {}
+
+    def queued(self, channel):
+        return sum(map(len, self._queues.get(channel.id, ())))
+
+    async def send(self, channel, content=None, *, embed=None, embeds=None,
+                   priority=Priority.BROADCAST, **kwargs):
+        """Queues a message for `channel`, which may be any discord.abc.Messageable with an id,
+        and returns the sent message. Other keyword arguments are passed to channel.send.
+        """
+        embeds = list(embeds or ())
+        if embed is not None:
+            embeds.append(embed)
+        [future] = self._enqueue(channel, [(content, embeds)], kwargs, priority)
+        return await future
+
+    async def send_many(self, channel, content=None, embeds=(), *, priority=Priority.BROADCAST):
+        """Queues `content` followed by `embeds` for `channel` and returns the sent messages.
+        The embeds are packed into as few messages as possible, the first of which has the
+        content. The messages are sent one after another, with no other message of the same
+        priority in between.
+        """
+        packed = pack_embeds(embeds)
+        if content is not None:
+            if packed:
+                messages = [(content, packed[0])] + [(None, chunk) for chunk in packed[1:]]
+            else:
+                messages = [(content, [])]
+        else:
+            messages = [(None, chunk) for chunk in packed]
+        if not messages:
+            return []
+        logger.debug(f'Packed {len(embeds)} embeds into {len(messages)} messages to channel '
+                     f'{channel.id}')
+        return list(await asyncio.gather(*self._enqueue(channel, messages, {}, priority)))
+
+    def _enqueue(self, channel, messages, kwargs, priority):
+        loop = asyncio.get_running_loop()
+        queues = self._queues.get(channel.id)
+        if queues is None:
+            queues = self._queues[channel.id] = [collections.deque() for _ in Priority]
+        futures = []
+        for content, embeds in messages:
+            future = loop.create_future()
+            queues[priority].append(_Item(content, embeds, kwargs, future))
+            futures.append(future)
+        if channel.id not in self._workers:
+            self._workers[channel.id] = asyncio.create_task(self._run(channel))
+        return futures
+
+    async def _run(self, channel):
+        queues = self._queues[channel.id]
+        try:
+            while True:
+                priority = next((priority for priority in Priority if queues[priority]), None)
+                if priority is None:
+                    break
+                item = queues[priority].popleft()
+                metrics.outbox_queue_seconds.observe(time.perf_counter() - item.enqueue_time,
+                                                     priority=priority.name.lower())
+                kwargs = dict(item.kwargs)
+                if item.embeds:
+                    kwargs['embeds'] = item.embeds
+                try:
+                    message = await channel.send(item.content, **kwargs)
+                except Exception as e:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                else:
+                    if not item.future.done():
+                        item.future.set_result(message)
+        finally:
+            del self._workers[channel.id]
+            del self._queues[channel.id]
+            for queue in queues:
+                for item in queue:
+                    item.future.cancel()
+
+
+outbox = Outbox()
@@ -1,17 +1,85 @@
 import asyncio
+import collections
 import functools
+import heapq
+import logging
+
+import discord
+
+from tle.util.outbox import outbox, Priority
+
+logger = logging.getLogger(__name__)
 
 _REACT_FIRST = '\N{BLACK LEFT-POINTING DOUBLE TRIANGLE WITH VERTICAL BAR}'
 _REACT_PREV = '\N{BLACK LEFT-POINTING TRIANGLE}'
 _REACT_NEXT = '\N{BLACK RIGHT-POINTING TRIANGLE}'
 _REACT_LAST = '\N{BLACK RIGHT-POINTING DOUBLE TRIANGLE WITH VERTICAL BAR}'
 
+# Number of rendered pages kept by LazyPages.
+_PAGE_CACHE_SIZE = 8
+# Number of paginated messages that react to reactions at once. Past this, the ones closest to
+# expiring stop early.
+_MAX_LIVE_PAGINATORS = 500
+
 
 def chunkify(sequence, chunk_size):
     """Utility method to split a sequence into fixed size chunks."""
     return [sequence[i: i + chunk_size] for i in range(0, len(sequence), chunk_size)]
 
 
+def num_chunks(length, chunk_size):
+    return -(-length // chunk_size)
+
+
+class LazyPages:
+    """Sequence of `num_pages` pages which are rendered by `page_factory(page_index)` when first
+    shown. The most recently shown pages are kept so that paging back and forth does not render
+    them again.
+    """
+
+    def __init__(self, page_factory, num_pages, cache_size=_PAGE_CACHE_SIZE):
+        self.page_factory = page_factory
+        self.num_pages = num_pages
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()
+
+    @classmethod
+    def from_chunks(cls, sequence, chunk_size, make_page):
+        """Pages of fixed size chunks of `sequence`, rendered by `make_page(chunk)`."""
+        def page_factory(page_index):
+            start = page_index * chunk_size
+            return make_page(sequence[start: start + chunk_size])
+        return cls(page_factory, num_chunks(len(sequence), chunk_size))
+
+    @classmethod
+    def from_query(cls, fetch, num_rows, rows_per_page, make_page):
+        """Pages of rows from a data source which is read one page at a time, such as a query
+        with LIMIT and OFFSET. `fetch(limit, offset)` returns the rows of a page, which are
+        rendered by `make_page(rows)`.
+        """
+        def page_factory(page_index):
+            return make_page(fetch(rows_per_page, page_index * rows_per_page))
+        return cls(page_factory, num_chunks(num_rows, rows_per_page))
+
+    def __len__(self):
+        return self.num_pages
+
+    def __getitem__(self, page_index):
+        if not -self.num_pages <= page_index < self.num_pages:
+            raise IndexError(page_index)
+        page_index %= self.num_pages
+        try:
+            self._cache.move_to_end(page_index)
+            return self._cache[page_index]
+        except KeyError:
+            pass
+        page = self.page_factory(page_index)
+        self._cache[page_index] = page
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return page
+
+
 class PaginatorError(Exception):
     pass
 
@@ -25,8 +93,11 @@ class InsufficientPermissionsError(PaginatorError):
 
 
 class Paginated:
-    def __init__(self, pages):
+    def __init__(self, pages=None, *, page_factory=None, num_pages=None, set_pagenum_footers=False):
+        if pages is None:
+            pages = LazyPages(page_factory, num_pages)
         self.pages = pages
+        self.set_pagenum_footers = set_pagenum_footers
         self.cur_page = None
         self.message = None
         self.reaction_map = {
@@ -36,9 +107,15 @@ class Paginated:
             _REACT_LAST: functools.partial(self.show_page, len(pages))
         }
 
+    def get_page(self, page_num):
+        content, embed = self.pages[page_num - 1]
+        if len(self.pages) > 1 and self.set_pagenum_footers:
+            embed.set_footer(text=f'Page {page_num} / {len(self.pages)}')
+        return content, embed
+
     async def show_page(self, page_num):
         if 1 <= page_num <= len(self.pages):
-            content, embed = self.pages[page_num - 1]
+            content, embed = self.get_page(page_num)
             await self.message.edit(content=content, embed=embed)
             self.cur_page = page_num
 
@@ -49,40 +126,144 @@ class Paginated:
         await self.show_page(self.cur_page + 1)
 
     async def paginate(self, bot, channel, wait_time, delete_after:float = None):
-        content, embed = self.pages[0]
-        self.message = await channel.send(content, embed=embed, delete_after=delete_after)
+        content, embed = self.get_page(1)
+        self.message = await outbox.send(channel, content, embed=embed, delete_after=delete_after,
+                                         priority=Priority.INTERACTIVE)
 
         if len(self.pages) == 1:
             # No need to paginate.
             return
 
         self.cur_page = 1
+        get_registry(bot).add(self, wait_time)
         for react in self.reaction_map.keys():
             await self.message.add_reaction(react)
 
-        def check(reaction, user):
-            return (bot.user != user and
-                    reaction.message.id == self.message.id and
-                    reaction.emoji in self.reaction_map)
+    async def close(self):
+        try:
+            await self.message.clear_reactions()
+        except discord.HTTPException as e:
+            # The message may have been deleted meanwhile.
+            logger.debug(f'Could not clear reactions of paginated message: {e!r}')
+
+
+class PaginatorRegistry:
+    """Paginated messages which respond to reactions, by message id. Reactions are dispatched
+    from a single on_raw_reaction_add listener. A paginator expires `wait_time` seconds after it
+    was last used, and expiry times are kept in a heap served by one timer.
+    """
 
+    def __init__(self, bot, max_size=_MAX_LIVE_PAGINATORS):
+        self.bot = bot
+        self.max_size = max_size
+        # message id -> [paginated, wait_time, expiry]
+        self._live = {}
+        # (expiry, message id), stale if the paginator was closed or used after being pushed.
+        self._expiries = []
+        self._timer = None
+        self._timer_when = None
+        # Keep references to the close tasks so that they are not garbage collected.
+        self._closing = set()
+
+    def __len__(self):
+        return len(self._live)
+
+    def __contains__(self, message_id):
+        return message_id in self._live
+
+    def add(self, paginated, wait_time):
+        while len(self._live) >= self.max_size:
+            self._close(self._pop_earliest())
+        self._live[paginated.message.id] = [paginated, wait_time, None]
+        self._extend(paginated.message.id)
+
+    def _extend(self, message_id):
+        entry = self._live[message_id]
+        loop = asyncio.get_running_loop()
+        entry[2] = expiry = loop.time() + entry[1]
+        heapq.heappush(self._expiries, (expiry, message_id))
+        if len(self._expiries) > 2 * len(self._live) + 16:
+            # Drop stale entries.
+            self._expiries = [(expiry, message_id) for message_id, (_, _, expiry) in self._live.items()]
+            heapq.heapify(self._expiries)
+        self._schedule(loop)
+
+    def _pop_earliest(self):
+        """Removes the paginator with the earliest expiry and returns its message id."""
         while True:
-            try:
-                reaction, user = await bot.wait_for('reaction_add', timeout=wait_time, check=check)
-                await reaction.remove(user)
-                await self.reaction_map[reaction.emoji]()
-            except asyncio.TimeoutError:
-                await self.message.clear_reactions()
-                break
+            expiry, message_id = heapq.heappop(self._expiries)
+            entry = self._live.get(message_id)
+            if entry is not None and entry[2] == expiry:
+                return message_id
+
+    def _close(self, message_id):
+        paginated = self._live.pop(message_id)[0]
+        task = asyncio.create_task(paginated.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def _schedule(self, loop):
+        if not self._expiries:
+            return
+        when = self._expiries[0][0]
+        if self._timer is not None:
+            if self._timer_when <= when:
+                return
+            self._timer.cancel()
+        self._timer = loop.call_at(when, self._on_timer)
+        self._timer_when = when
+
+    def _on_timer(self):
+        self._timer = None
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        while self._expiries and self._expiries[0][0] <= now:
+            expiry, message_id = heapq.heappop(self._expiries)
+            entry = self._live.get(message_id)
+            if entry is not None and entry[2] == expiry:
+                self._close(message_id)
+        self._schedule(loop)
+
+    async def on_raw_reaction_add(self, payload):
+        entry = self._live.get(payload.message_id)
+        if entry is None or payload.user_id == self.bot.user.id:
+            return
+        paginated = entry[0]
+        action = paginated.reaction_map.get(str(payload.emoji))
+        if action is None:
+            return
+        self._extend(payload.message_id)
+        try:
+            await paginated.message.remove_reaction(payload.emoji, discord.Object(id=payload.user_id))
+            await action()
+        except discord.HTTPException as e:
+            logger.info(f'Failed to turn page of paginated message: {e!r}')
+
+
+_registry = None
+
+
+def get_registry(bot):
+    """Returns the registry of paginated messages, which is set up on first use."""
+    global _registry
+    if _registry is None:
+        _registry = PaginatorRegistry(bot)
+        bot.add_listener(_registry.on_raw_reaction_add)
+    return _registry
 
 
-def paginate(bot, channel, pages, *, wait_time, set_pagenum_footers=False, delete_after:float = None):
+def paginate(bot, channel, pages=None, *, page_factory=None, num_pages=None, wait_time,
+             set_pagenum_footers=False, delete_after:float = None):
+    """Sends the pages to the channel and lets users page through them with reactions. Instead
+    of a list of (content, embed) pages, `page_factory(page_index)` may be given with
+    `num_pages`, in which case pages are only rendered when they are shown.
+    """
+    if pages is None:
+        pages = LazyPages(page_factory, num_pages)
     if not pages:
         raise NoPagesError()
     permissions = channel.permissions_for(channel.guild.me)
     if not permissions.manage_messages:
         raise InsufficientPermissionsError('Permission to manage messages required')
-    if len(pages) > 1 and set_pagenum_footers:
-        for i, (content, embed) in enumerate(pages):
-            embed.set_footer(text=f'Page {i + 1} / {len(pages)}')
-    paginated = Paginated(pages)
+    paginated = Paginated(pages, set_pagenum_footers=set_pagenum_footers)
     asyncio.create_task(paginated.paginate(bot, channel, wait_time, delete_after))
@@ -1,8 +1,7 @@
 from discord.ext import commands
 
 from tle.util.ranklist.rating_calculator import CodeforcesRatingCalculator
-from tle.util.handledict import HandleDict
-from tle.util.codeforces_api import make_from_dict, RanklistRow
+from tle.util.ranklist.standings import Standings, StandingsByKey
 
 
 class RanklistError(commands.CommandError):
@@ -30,21 +29,19 @@ class DeltasNotPresentError(RanklistError):
 
 class Ranklist:
     def __init__(self, contest, problems, standings, fetch_time, *, is_rated):
+        """`standings` is a Standings or a list of cf.RanklistRow."""
         self.contest = contest
         self.problems = problems
-        self.standings = standings
         self.fetch_time = fetch_time
         self.is_rated = is_rated
         self.delta_by_handle = None
         self.deltas_status = None
-        self.standing_by_id = None
-        self._create_inverse_standings()
+        self._set_standings(standings if isinstance(standings, Standings)
+                            else Standings(standings))
 
-    def _create_inverse_standings(self):
-        self.standing_by_id = HandleDict()
-        for row in self.standings:
-            id_ = self.get_ranklist_lookup_key(row)
-            self.standing_by_id[id_] = row
+    def _set_standings(self, standings):
+        self.standings = standings
+        self.standing_by_id = StandingsByKey(standings)
 
     def remove_unofficial_contestants(self):
         """
@@ -55,23 +52,24 @@ class Ranklist:
         if self.delta_by_handle is None:
             raise DeltasNotPresentError(self.contest)
 
-        official_standings = []
+        official_indices = []
+        official_ranks = []
         current_rated_rank = 1
         last_rated_rank = 0
         last_rated_score = (-1, -1)
-        for contestant in self.standings:
-            handle = self.get_ranklist_lookup_key(contestant)
+        standings = self.standings
+        for ix, (handle, points, penalty) in enumerate(zip(standings.keys, standings.points.tolist(),
+                                                          standings.penalties.tolist())):
             if handle in self.delta_by_handle:
-                current_score = (contestant.points, contestant.penalty)
-                standings_row = self.standing_by_id[handle]._asdict()
-                standings_row['rank'] = current_rated_rank if current_score != last_rated_score else last_rated_rank
-                official_standings.append(make_from_dict(RanklistRow, standings_row))
-                last_rated_rank = standings_row['rank']
+                current_score = (points, penalty)
+                rank = current_rated_rank if current_score != last_rated_score else last_rated_rank
+                official_indices.append(ix)
+                official_ranks.append(rank)
+                last_rated_rank = rank
                 last_rated_score = current_score
                 current_rated_rank += 1
 
-        self.standings = official_standings
-        self._create_inverse_standings()
+        self._set_standings(standings.take(official_indices, official_ranks))
 
     def set_deltas(self, delta_by_handle):
         if not self.is_rated:
@@ -82,8 +80,9 @@ class Ranklist:
     def predict(self, current_rating):
         if not self.is_rated:
             raise ContestNotRatedError(self.contest)
-        standings = [(id_, row.points, row.penalty, current_rating[id_])
-                     for id_, row in self.standing_by_id.items() if id_ in current_rating]
+        keys, points, penalties = self.standings.keys, self.standings.points, self.standings.penalties
+        standings = [(keys[ix], float(points[ix]), int(penalties[ix]), current_rating[keys[ix]])
+                     for ix in self.standings.lookup_indices() if keys[ix] in current_rating]
         if standings:
             self.delta_by_handle = CodeforcesRatingCalculator(standings).calculate_rating_changes()
         self.deltas_status = 'Predicted'
@@ -0,0 +1,238 @@
+import numpy as np
+
+from tle.util import codeforces_api as cf
+
+# Stands for None in integer columns.
+_NONE = -1
+_RESULT_TYPES = ('PRELIMINARY', 'FINAL')
+_PARTICIPANT_TYPE_CODES = {t: code for code, t in enumerate(cf.Party.PARTICIPANT_TYPES)}
+
+
+def _int_or_none(value):
+    return None if value == _NONE else int(value)
+
+
+class Standings:
+    """Columnar storage of the rows of a contest ranklist. Ranks, points and penalties are
+    parallel arrays, problem results are matrices with a row per contestant and a column per
+    problem, and member handles are indices into a table of the distinct handles of the standings.
+    Rows are materialized on access as StandingsRow views, which behave like cf.RanklistRow.
+    """
+
+    def __init__(self, rows=()):
+        rows = list(rows)
+        num_problems = len(rows[0].problemResults) if rows else 0
+        self.contest_id = rows[0].party.contestId if rows else None
+
+        self.ranks = np.array([row.rank for row in rows], dtype=np.int64)
+        self.points = np.array([row.points for row in rows], dtype=np.float64)
+        self.penalties = np.array([row.penalty for row in rows], dtype=np.int64)
+
+        member_handles = []
+        # The handles are kept per standings rather than in handledict.handle_registry, which
+        # would otherwise grow with every ranklist that is fetched.
+        self.handle_table = []
+        handle_ids = {}
+        self.member_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        participant_types, team_ids, ghosts, rooms, start_times = [], [], [], [], []
+        self.team_names = {}
+        # Participant types unknown to the API wrapper, stored with code _NONE.
+        self.other_participant_types = {}
+        for ix, row in enumerate(rows):
+            party = row.party
+            for member in party.members:
+                handle_id = handle_ids.get(member.handle)
+                if handle_id is None:
+                    handle_id = handle_ids[member.handle] = len(self.handle_table)
+                    self.handle_table.append(member.handle)
+                member_handles.append(handle_id)
+            self.member_offsets[ix + 1] = len(member_handles)
+            participant_type = _PARTICIPANT_TYPE_CODES.get(party.participantType, _NONE)
+            if participant_type == _NONE:
+                self.other_participant_types[ix] = party.participantType
+            participant_types.append(participant_type)
+            team_ids.append(_NONE if party.teamId is None else party.teamId)
+            if party.teamName is not None:
+                self.team_names[ix] = party.teamName
+            ghosts.append(bool(party.ghost))
+            rooms.append(_NONE if party.room is None else party.room)
+            start_times.append(_NONE if party.startTimeSeconds is None else party.startTimeSeconds)
+        self.member_handles = np.array(member_handles, dtype=np.int32)
+        self.participant_types = np.array(participant_types, dtype=np.int8)
+        self.team_ids = np.array(team_ids, dtype=np.int64)
+        self.ghosts = np.array(ghosts, dtype=bool)
+        self.rooms = np.array(rooms, dtype=np.int64)
+        self.start_times = np.array(start_times, dtype=np.int64)
+
+        shape = len(rows), num_problems
+        self.result_points = np.zeros(shape, dtype=np.float64)
+        self.result_penalties = np.full(shape, _NONE, dtype=np.int64)
+        self.rejected_attempts = np.zeros(shape, dtype=np.int64)
+        self.result_types = np.zeros(shape, dtype=np.int8)
+        self.best_submission_times = np.full(shape, _NONE, dtype=np.int64)
+        for ix, row in enumerate(rows):
+            for jx, result in enumerate(row.problemResults):
+                self.result_points[ix, jx] = result.points
+                if result.penalty is not None:
+                    self.result_penalties[ix, jx] = result.penalty
+                self.rejected_attempts[ix, jx] = result.rejectedAttemptCount
+                self.result_types[ix, jx] = _RESULT_TYPES.index(result.type)
+                if result.bestSubmissionTimeSeconds is not None:
+                    self.best_submission_times[ix, jx] = result.bestSubmissionTimeSeconds
+
+        self._build_index()
+
+    def _build_index(self):
+        # The lookup key of a row is its team name, or the handle of its only member.
+        self.keys = [self.team_names.get(ix) or self.handle_table[self.member_handles[offset]]
+                     for ix, offset in enumerate(self.member_offsets[:-1].tolist())]
+        self._index = {key.lower(): ix for ix, key in enumerate(self.keys)}
+
+    def __len__(self):
+        return len(self.ranks)
+
+    def __getitem__(self, ix):
+        if not -len(self) <= ix < len(self):
+            raise IndexError(ix)
+        return StandingsRow(self, ix % len(self))
+
+    def __iter__(self):
+        return (StandingsRow(self, ix) for ix in range(len(self)))
+
+    def index_of(self, key):
+        """Returns the index of the row with lookup key `key`, ignoring case. Raises KeyError if
+        there is none."""
+        return self._index[key.lower()]
+
+    def lookup_indices(self):
+        """Returns the indices of the rows found by lookup key. If several rows have the same key
+        only the last one is found."""
+        return list(self._index.values())
+
+    def take(self, indices, ranks):
+        """Returns new standings with the rows at `indices`, given the new `ranks`."""
+        indices = np.asarray(indices, dtype=np.int64)
+        taken = Standings.__new__(Standings)
+        taken.contest_id = self.contest_id
+        taken.handle_table = self.handle_table
+        taken.ranks = np.array(ranks, dtype=np.int64)
+        for name in ('points', 'penalties', 'participant_types', 'team_ids', 'ghosts', 'rooms',
+                     'start_times', 'result_points', 'result_penalties', 'rejected_attempts',
+                     'result_types', 'best_submission_times'):
+            setattr(taken, name, getattr(self, name)[indices])
+        member_counts = np.diff(self.member_offsets)[indices]
+        taken.member_offsets = np.concatenate(([0], np.cumsum(member_counts)))
+        taken.member_handles = np.array(
+            [handle_id for ix in indices.tolist()
+             for handle_id in self.member_handles[self.member_offsets[ix]:
+                                                  self.member_offsets[ix + 1]].tolist()],
+            dtype=np.int32)
+        taken.team_names = {new_ix: self.team_names[ix]
+                            for new_ix, ix in enumerate(indices.tolist()) if ix in self.team_names}
+        taken.other_participant_types = {
+            new_ix: self.other_participant_types[ix]
+            for new_ix, ix in enumerate(indices.tolist()) if ix in self.other_participant_types}
+        taken._build_index()
+        return taken
+
+
+class StandingsRow:
+    """A view of one row of Standings with the interface of cf.RanklistRow."""
+    __slots__ = ('_standings', '_ix')
+
+    _fields = cf.RanklistRow._fields
+
+    def __init__(self, standings, ix):
+        self._standings = standings
+        self._ix = ix
+
+    @property
+    def party(self):
+        s, ix = self._standings, self._ix
+        members = [cf.Member(s.handle_table[handle_id]) for handle_id in
+                   s.member_handles[s.member_offsets[ix]:s.member_offsets[ix + 1]].tolist()]
+        return cf.Party(contestId=s.contest_id,
+                        members=members,
+                        participantType=s.other_participant_types.get(ix) or
+                                        cf.Party.PARTICIPANT_TYPES[s.participant_types[ix]],
+                        teamId=_int_or_none(s.team_ids[ix]),
+                        teamName=s.team_names.get(ix),
+                        ghost=bool(s.ghosts[ix]),
+                        room=_int_or_none(s.rooms[ix]),
+                        startTimeSeconds=_int_or_none(s.start_times[ix]))
+
+    @property
+    def rank(self):
+        return int(self._standings.ranks[self._ix])
+
+    @property
+    def points(self):
+        return float(self._standings.points[self._ix])
+
+    @property
+    def penalty(self):
+        return int(self._standings.penalties[self._ix])
+
+    @property
+    def problemResults(self):
+        s, ix = self._standings, self._ix
+        return [cf.ProblemResult(points=points,
+                                 penalty=_int_or_none(penalty),
+                                 rejectedAttemptCount=rejected,
+                                 type=_RESULT_TYPES[type_],
+                                 bestSubmissionTimeSeconds=_int_or_none(best_time))
+                for points, penalty, rejected, type_, best_time in zip(
+                    s.result_points[ix].tolist(), s.result_penalties[ix].tolist(),
+                    s.rejected_attempts[ix].tolist(), s.result_types[ix].tolist(),
+                    s.best_submission_times[ix].tolist())]
+
+    def _asdict(self):
+        return {field: getattr(self, field) for field in self._fields}
+
+    def _replace(self, **kwargs):
+        return cf.RanklistRow(**{**self._asdict(), **kwargs})
+
+    def __iter__(self):
+        return (getattr(self, field) for field in self._fields)
+
+    def __eq__(self, other):
+        return tuple(self) == tuple(other)
+
+    # Unhashable like cf.RanklistRow, whose party holds a list of members.
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(cf.RanklistRow(*self))
+
+
+class StandingsByKey:
+    """Read-only mapping from the lookup key of each row of Standings, ignoring case, to the
+    row. Has the interface of the HandleDict it replaces."""
+
+    def __init__(self, standings):
+        self._standings = standings
+
+    def __getitem__(self, key):
+        return self._standings[self._standings.index_of(key)]
+
+    def __contains__(self, key):
+        try:
+            self._standings.index_of(key)
+            return True
+        except KeyError:
+            return False
+
+    def get_correct_handle(self, key):
+        try:
+            return self._standings.keys[self._standings.index_of(key)]
+        except KeyError:
+            return ""
+
+    def __iter__(self):
+        return iter(self._standings.keys)
+
+    def __len__(self):
+        return len(self._standings)
+
+    def items(self):
+        return zip(self._standings.keys, self._standings)
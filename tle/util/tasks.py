@@ -4,6 +4,7 @@ import logging
 from discord.ext import commands
 
 import tle.util.codeforces_common as cf_common
+from tle.util import metrics
 
 
 class TaskError(commands.CommandError):
@@ -157,10 +158,11 @@ class Task:
 
     async def _execute_func(self, arg):
         try:
-            if self.instance is not None:
-                await self.func(self.instance, arg)
-            else:
-                await self.func(arg)
+            with metrics.task_seconds.time(task=self.name):
+                if self.instance is not None:
+                    await self.func(self.instance, arg)
+                else:
+                    await self.func(arg)
         except asyncio.CancelledError:
             raise
         except Exception as ex: